@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import os
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from fastapi import Request, responses
+from service.tracing import span
+
+try:
+    import brotli
+except ImportError:  # only gzip is offered
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+
+# Cache-Control of each kind of response. Searches change when iTunes adds
+# results, album track lists and lyrics practically never change.
+SEARCH_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=3600"
+ALBUM_TRACKS_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800"
+LYRICS_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800"
+# Aggregates of the catalog change as it grows, they are rebuilt every minute
+ANALYTICS_CACHE_CONTROL = "public, max-age=60"
+# Lyrics searches find more songs as lyrics are fetched
+LYRICS_SEARCH_CACHE_CONTROL = "public, max-age=60"
+# Empty results are usually upstream failures, don't let caches keep them
+NO_CACHE = "no-cache"
+
+
+@dataclass(slots=True)
+class CachedBody:
+    """A response body with its validators and compressed variants."""
+
+    body: bytes
+    media_type: str
+    etag: str
+    last_modified: str
+    # content-encoding -> compressed body, filled on first use
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+    def encode(self, encoding: str) -> bytes:
+        if encoding not in self.encoded:
+            with span(f"response.{encoding}"):
+                self.encoded[encoding] = self.compress(encoding)
+        return self.encoded[encoding]
+
+    def compress(self, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(self.body, quality=5)
+        return gzip.compress(self.body, compresslevel=6)
+
+
+def make_body(body: bytes, media_type: str = "application/json") -> CachedBody:
+    """Wraps a response body with a strong ETag derived from its content."""
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    return CachedBody(
+        body=body,
+        media_type=media_type,
+        etag=f'"{digest}"',
+        last_modified=formatdate(usegmt=True),
+    )
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    # Picks brotli or gzip from an Accept-Encoding header, honoring q=0
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        q = params.strip().removeprefix("q=")
+        if params and q.replace(".", "", 1).isdigit() and float(q) == 0:
+            continue
+        accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def variant_etag(etag: str, encoding: str | None) -> str:
+    # Each encoding is a different representation and gets its own strong ETag
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def not_modified(request: Request, cached: CachedBody) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(
+        variant_etag(cached.etag, encoding) in tags for encoding in (None, "gzip", "br")
+    )
+
+
+def http_response(
+    request: Request, cached: CachedBody, cache_control: str
+) -> responses.Response:
+    """Builds a response with caching headers, compressed when the client accepts it.
+
+    Requests whose If-None-Match matches the body's ETag get an empty
+    304 Not Modified response.
+
+    Args:
+        request (Request): the incoming request
+        cached (CachedBody): the response body
+        cache_control (str): Cache-Control header of the response
+
+    Returns:
+        responses.Response: the response
+    """
+    encoding = None
+    if len(cached.body) >= COMPRESS_MIN_SIZE:
+        encoding = negotiate(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": variant_etag(cached.etag, encoding),
+        "Last-Modified": cached.last_modified,
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if not_modified(request, cached):
+        return responses.Response(status_code=304, headers=headers)
+    if encoding is None:
+        return responses.Response(
+            content=cached.body, media_type=cached.media_type, headers=headers
+        )
+    headers["Content-Encoding"] = encoding
+    return responses.Response(
+        content=cached.encode(encoding), media_type=cached.media_type, headers=headers
+    )
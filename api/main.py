@@ -1,20 +1,56 @@
 import logging
+import math
+import os
 import re
+import time
 import requests
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from typing import Optional
 from fastapi import FastAPI, HTTPException, Request, responses, templating, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from model.artist import Artist
 from model.album import Album
+from model.serialization import dumps
 from service.itunes import (
-    search_artists,
-    search_albums,
+    find_artists,
+    find_albums,
+    hydrate_artists,
+    hydrate_albums,
+    load_artists,
+    load_albums,
+    load_tracks,
     search_tracks,
     search_tracks_by_album,
+    stream_hydrated_albums,
 )
 
-from service.lyrics import router as lyrics_router
+from api.httpcache import (
+    ALBUM_TRACKS_CACHE_CONTROL,
+    ANALYTICS_CACHE_CONTROL,
+    LYRICS_CACHE_CONTROL,
+    LYRICS_SEARCH_CACHE_CONTROL,
+    NO_CACHE,
+    SEARCH_CACHE_CONTROL,
+    http_response,
+    make_body,
+)
+from api.response_cache import cache_response, cached_response, response_cache
+from service.filecache import cache_stats, refresh_stats
+import service.lyrics as lyrics
+import service.snapshot as snapshot
+from service.httpclient import open_client, close_client
+from service.metrics import CallbackMetric, http_duration, http_requests, registry
+from service.itunes import limiter
+from service.ratelimit import RateLimited
+from service.tracing import TRACING_ENABLED, record_slow_request, server_timing, trace
+from service.pagination import decode_cursor, paginate, paginate_cursor
+from service.batch import resolve_albums, resolve_artists, resolve_tracks
+from service.concurrency import fan_out
+import service.analytics as analytics
+from service.searchindex import parse_query
 
 """
 This is the main entry point for the application.
@@ -33,9 +69,21 @@ logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(name)s - %(mess
 
 # Define a regex pattern for name normalization
 NAME_PATTERN = r"([A-Za-z]{2,20})[^A-Za-z]*([A-Za-z]{0,20})"
+# Albums, artists and track names a single batch request may ask for
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "100"))
 
 templates = templating.Jinja2Templates(directory="templates")
-app = FastAPI()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client is shared by every upstream call
+    open_client()
+    yield
+    close_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount(
     "/static",
@@ -43,8 +91,111 @@ app.mount(
     name="static",
 )
 
-# Include the lyrics router
-app.include_router(lyrics_router)
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    # Requests are counted by route template, not path, to bound the series
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        http_requests.inc(route, request.method, str(status))
+        http_duration.observe(route, value=time.perf_counter() - started)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Spans of the request are summed up in Server-Timing, streamed bodies
+    # are timed up to their first chunk
+    if not TRACING_ENABLED:
+        return await call_next(request)
+    with trace(request.url.path) as root:
+        response = await call_next(request)
+    response.headers["Server-Timing"] = server_timing(root)
+    record_slow_request(root, f"{request.method} {request.url}")
+    return response
+
+
+def cache_counters() -> dict[str, dict]:
+    # Hit and miss counters of every cache tier
+    stats = cache_stats()
+    return {
+        "memory": stats["memory"],
+        "store": stats["store"],
+        "responses": response_cache.stats(),
+        "lyrics": lyrics.lyrics_cache.stats(),
+        "snapshot": snapshot.current.stats(),
+    }
+
+
+def hit_ratios():
+    for name, stats in cache_counters().items():
+        lookups = stats["hits"] + stats["misses"]
+        if lookups:
+            yield {"cache": name}, stats["hits"] / lookups
+
+
+for counter in ("hits", "misses"):
+    registry.register(
+        CallbackMetric(
+            f"cache_{counter}_total",
+            f"Cache {counter}, by cache tier",
+            lambda counter=counter: [
+                ({"cache": name}, stats[counter])
+                for name, stats in cache_counters().items()
+            ],
+            type="counter",
+        )
+    )
+registry.register(
+    CallbackMetric("cache_hit_ratio", "Share of cache lookups that hit", hit_ratios)
+)
+registry.register(
+    CallbackMetric(
+        "cache_refreshes_total",
+        "Stale cached results served and their background refreshes, by event",
+        lambda: [({"event": name}, value) for name, value in refresh_stats.items()],
+        type="counter",
+    )
+)
+registry.register(
+    CallbackMetric(
+        "upstream_queue_depth",
+        "Calls waiting for the iTunes rate limiter, by priority",
+        lambda: [
+            ({"priority": name}, queue["depth"])
+            for name, queue in limiter.stats()["queues"].items()
+        ],
+    )
+)
+registry.register(
+    CallbackMetric(
+        "upstream_throttled_total",
+        "Responses throttled by iTunes",
+        lambda: [({}, limiter.throttled_count)],
+        type="counter",
+    )
+)
+
+
+# Upstream calls that don't fit in the iTunes rate limit
+@app.exception_handler(RateLimited)
+def rate_limited(request: Request, exc: RateLimited):
+    return responses.JSONResponse(
+        {"detail": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+def check_cursor(cursor: str | None):
+    # Malformed cursors are client errors, expired ones start a new search
+    if cursor and decode_cursor(cursor) is None:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
 
 
 @app.get("/", response_class=responses.HTMLResponse)
@@ -60,6 +211,7 @@ async def home(request: Request):
 # API route to get a list of albums for an artist
 @app.get("/artist/{name}")
 def get_artist(
+    request: Request,
     name: str,
     page: int = Query(1, ge=1),
     page_size: int = Query(
@@ -68,42 +220,168 @@ def get_artist(
         le=20,
     ),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor of a previous page"),
 ):
     if match := re.search(NAME_PATTERN, name.strip().lower()):
         artist_name = " ".join(match.groups())
-        # Fetch more results than page_size to support pagination
-        artists = search_artists(artist_name, page_size * 2)
-
-        total_count = len(artists)
-        total_pages = -(-total_count // page_size)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-
-        total_albums = (len(artist.albums) for artist in artists)
-
-        paginated_artist = artists[start_idx:end_idx]
-        return {
-            "artist": paginated_artist,
-            "pagination": {
-                "total": total_albums,  # Use total_albums instead of total_count
-                "page": page,
-                "page_size": page_size,
-                "total_pages": total_pages,
-            },
-        }
+        check_cursor(cursor)
+        key = ("artist", artist_name, limit, page, page_size, cursor)
+        if response := cached_response(request, key, SEARCH_CACHE_CONTROL):
+            return response
+
+        # Later pages are served from the snapshot of the first one
+        if cursor and (
+            result := paginate_cursor("artists", cursor, page_size, load_artists)
+        ):
+            paginated_artist, pagination = result
+            return cache_response(
+                request,
+                key,
+                {"artist": paginated_artist, "pagination": pagination},
+                SEARCH_CACHE_CONTROL,
+            )
+
+        artists = find_artists(artist_name, limit)
+
+        # Only the albums of the artists on this page are looked up
+        paginated_artist, pagination = paginate("artists", artists, page, page_size)
+        return cache_response(
+            request,
+            key,
+            {"artist": hydrate_artists(paginated_artist), "pagination": pagination},
+            SEARCH_CACHE_CONTROL,
+        )
     else:
         raise HTTPException(status_code=400, detail=f"Invalid artist name: {name}")
 
 
+# API route to inspect the hit/miss/eviction counters of the caches
+@app.get("/cache/stats")
+def get_cache_stats():
+    return {
+        **cache_stats(),
+        "responses": response_cache.stats(),
+        "snapshot": snapshot.current.stats(),
+    }
+
+
+# API route exposing the metrics in the Prometheus text format
+@app.get("/metrics")
+def get_metrics():
+    return responses.Response(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# API route to inspect the iTunes rate limiter queues and throttling
+@app.get("/upstream/stats")
+def get_upstream_stats():
+    return limiter.stats()
+
+
 # Here we can add more API routes for other functionality, like:
-# - API route to get a list of albums for a genre
-# - API route to get a list of albums for a year
-# - API route to get a list of albums for a decade
+# API routes listing and aggregating every album of the catalog, by genre,
+# year, decade or artist, see service/analytics.py
+@app.exception_handler(analytics.AnalyticsUnavailable)
+def analytics_unavailable(request: Request, exc: analytics.AnalyticsUnavailable):
+    return responses.JSONResponse({"detail": str(exc)}, status_code=503)
+
+
+def analytics_response(request: Request, content) -> responses.Response:
+    return http_response(request, make_body(dumps(content)), ANALYTICS_CACHE_CONTROL)
+
+
+@app.get("/analytics/albums")
+def get_analytics_albums(
+    request: Request,
+    genre: Optional[str] = Query(None, description="Genre, case insensitive"),
+    year: Optional[int] = Query(None, description="Release year"),
+    decade: Optional[int] = Query(
+        None, description="First year of the decade, like 1990", multiple_of=10
+    ),
+    artist_id: Optional[int] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    view = analytics.columns()
+    album_ids, total = view.album_ids_where(
+        view.mask(genre, year, decade, artist_id), offset, limit
+    )
+    return analytics_response(
+        request,
+        {
+            "albums": analytics.albums_by_id(album_ids),
+            "total": total,
+            "offset": offset,
+        },
+    )
+
+
+@app.get("/analytics/genres")
+def get_analytics_genres(
+    request: Request,
+    year: Optional[int] = Query(None, description="Release year"),
+    decade: Optional[int] = Query(None, multiple_of=10),
+    artist_id: Optional[int] = Query(None),
+):
+    view = analytics.columns()
+    counts = view.genre_decade_counts(view.mask(None, year, decade, artist_id))
+    return analytics_response(request, {"genres": counts})
+
+
+@app.get("/analytics/durations")
+def get_analytics_durations(
+    request: Request,
+    by: str = Query("album", pattern="^(album|artist)$"),
+    order: str = Query("total", pattern="^(total|average)$"),
+    genre: Optional[str] = Query(None, description="Genre, case insensitive"),
+    year: Optional[int] = Query(None, description="Release year"),
+    decade: Optional[int] = Query(None, multiple_of=10),
+    artist_id: Optional[int] = Query(None),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Albums or artists with the longest total or average track duration."""
+    view = analytics.columns()
+    selected = view.mask(genre, year, decade, artist_id)
+    if by == "artist":
+        artists = view.artist_durations(selected, limit, order == "average")
+        return analytics_response(request, {"artists": artists})
+
+    albums = view.album_durations(selected, limit, order == "average")
+    # Titles are read for the returned albums only
+    found = analytics.albums_by_id([x["album_id"] for x in albums])
+    for row, album in zip(albums, found):
+        row.update(title=album.title, artist_name=album.artist_name)
+    return analytics_response(request, {"albums": albums})
+
+
+def filter_albums(
+    albums: list[Album], release_year: Optional[int], genre: Optional[str]
+) -> list[Album]:
+    # Keeps the albums released in release_year and whose genre contains genre
+    filtered_albums: list[Album] = []
+    for album in albums:
+        # Release year filter (using release date)
+        if release_year:
+            release_date = album.release_date
+            album_year = int(release_date.split("-")[0]) if release_date else None
+            if not album_year or album_year != release_year:
+                continue
+
+        # Genre filter
+        if genre:
+            album_genre = album.genre.lower()
+            if genre.lower() not in album_genre:
+                continue
+
+        filtered_albums.append(album)
+    return filtered_albums
 
 
 # - API route to get a list of albums by name
 @app.get("/albums/")
 def get_albums(
+    request: Request,
     album_name: str,
     release_year: Optional[int] = Query(
         None, description="Release year in YYYY format", ge=1900, le=2024
@@ -112,6 +390,7 @@ def get_albums(
     limit: int = Query(10, description="Maximum number of results", ge=1, le=100),
     page: int = Query(1, ge=1),
     page_size: int = Query(3, ge=1, le=20),
+    cursor: Optional[str] = Query(None, description="Cursor of a previous page"),
 ):
     """
     Search for albums with optional filtering and pagination.
@@ -123,6 +402,7 @@ def get_albums(
         max_duration: Maximum track duration (in seconds)
         genre: Exact genre match
         limit: Maximum number of results to return
+        cursor: Cursor returned with a previous page of the same search
 
     Returns:
         List of matching albums
@@ -139,89 +419,276 @@ def get_albums(
     normalized_name = " ".join(name_match.groups())
     # print(f"Normalized Name: {normalized_name}")
 
-    # Search albums from iTunes API
+    check_cursor(cursor)
+    key = (
+        "albums",
+        normalized_name,
+        release_year,
+        genre.lower() if genre else None,
+        limit,
+        page,
+        page_size,
+        cursor,
+    )
+    if response := cached_response(request, key, SEARCH_CACHE_CONTROL):
+        return response
+
+    # Later pages are served from the snapshot of the first one
+    if cursor and (result := paginate_cursor("albums", cursor, page_size, load_albums)):
+        paginated_albums, pagination = result
+        return cache_response(
+            request,
+            key,
+            {"albums": paginated_albums, "pagination": pagination},
+            SEARCH_CACHE_CONTROL,
+        )
+
+    # Search albums from iTunes API, without their tracks
     try:
-        albums = search_albums(normalized_name, limit)
+        albums = find_albums(normalized_name, limit)
         # print(f"Albums Retrieved: {albums}")
+    except RateLimited:
+        raise
     except requests.RequestException as e:
         raise HTTPException(
             status_code=500, detail=f"Error searching iTunes API: {str(e)}"
         )
 
-    # Filter albums based on additional criteria
-    filtered_albums: list[Album] = []
-    for album in albums:
-        # print(f"Processing Album: {album}")
-        # Release year filter (using release date)
-        if release_year:
-            release_date = album.release_date
-            print(f"Release Date: {release_date}")
-            album_year = int(release_date.split("-")[0]) if release_date else None
-            print(f"Album Year: {album_year}")
-            if not album_year or album_year != release_year:
-                continue
+    filtered_albums = filter_albums(albums, release_year, genre)
 
-        # Genre filter
-        if genre:
-            album_genre = album.genre.lower()
-            # print(f"Album Genre: {album_genre}")
-            if genre.lower() not in album_genre:
-                continue
+    paginated_albums, pagination = paginate("albums", filtered_albums, page, page_size)
+    # Only the tracks of the albums on this page are looked up
+    try:
+        paginated_albums = hydrate_albums(paginated_albums)
+    except RateLimited:
+        raise
+    except requests.RequestException as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error searching iTunes API: {str(e)}"
+        )
+    return cache_response(
+        request,
+        key,
+        {"albums": paginated_albums, "pagination": pagination},
+        SEARCH_CACHE_CONTROL,
+    )
 
-        filtered_albums.append(album)
 
-    total_count = len(filtered_albums)
-    total_pages = -(-total_count // page_size)
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
+# - API route to stream the albums found by name, as soon as their tracks are loaded
+@app.get("/albums/stream")
+def stream_albums(
+    album_name: str,
+    release_year: Optional[int] = Query(
+        None, description="Release year in YYYY format", ge=1900, le=2024
+    ),
+    genre: Optional[str] = Query(None, description="Genre of the album"),
+    limit: int = Query(10, description="Maximum number of results", ge=1, le=100),
+):
+    """
+    Search for albums, streamed as newline-delimited JSON.
 
-    paginated_albums = filtered_albums[start_idx:end_idx]
+    Each album is written on its own line as soon as its tracks are loaded,
+    in the order they become available. A failed lookup ends the stream
+    with an {"error": ...} line.
 
-    return {
-        "albums": paginated_albums,
-        "pagination": {
-            "total": total_count,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": total_pages,
-        },
-    }
+    Args:
+        album_name: Name of the album to search
+        release_year: Filter by exact release year
+        genre: Exact genre match
+        limit: Maximum number of results to return
+
+    Returns:
+        Stream of matching albums
+    """
+    name_match = re.search(NAME_PATTERN, album_name.strip().lower())
+    if not name_match:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid album name format: {album_name}"
+        )
+    normalized_name = " ".join(name_match.groups())
+
+    # The search itself fails before anything is sent
+    try:
+        albums = find_albums(normalized_name, limit)
+    except RateLimited:
+        raise
+    except requests.RequestException as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error searching iTunes API: {str(e)}"
+        )
+    filtered_albums = filter_albums(albums, release_year, genre)
+
+    def lines():
+        try:
+            for album in stream_hydrated_albums(filtered_albums):
+                yield dumps(album) + b"\n"
+        except requests.RequestException as e:
+            logging.error(f"Error streaming albums: {e}")
+            yield dumps({"error": f"Error searching iTunes API: {str(e)}"}) + b"\n"
+
+    return responses.StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": NO_CACHE},
+    )
 
 
 # - API route to get a list of tracks by name
 @app.get("/tracks/{track_name}")
 def get_tracks(
+    request: Request,
     track_name: str,
     page: int = Query(1, ge=1),
     page_size: int = Query(3, ge=1, le=20),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor of a previous page"),
 ):
     if match := re.search(NAME_PATTERN, track_name.strip().lower()):
-        tracks = search_tracks(track_name, page_size * 2)
-
-        total_count = len(tracks)
-        total_pages = -(-total_count // page_size)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
+        check_cursor(cursor)
+        key = ("tracks", track_name.strip().lower(), page, page_size, cursor)
+        if response := cached_response(request, key, SEARCH_CACHE_CONTROL):
+            return response
+
+        # Later pages are served from the snapshot of the first one
+        if cursor and (
+            result := paginate_cursor("tracks", cursor, page_size, load_tracks)
+        ):
+            paginated_tracks, pagination = result
+            return cache_response(
+                request,
+                key,
+                {"tracks": paginated_tracks, "pagination": pagination},
+                SEARCH_CACHE_CONTROL,
+            )
 
-        paginated_tracks = tracks[start_idx:end_idx]
+        tracks = search_tracks(track_name, page_size * 2)
 
-        return {
-            "tracks": paginated_tracks,
-            "pagination": {
-                "total": total_count,
-                "page": page,
-                "page_size": page_size,
-                "total_pages": total_pages,
-            },
-        }
+        paginated_tracks, pagination = paginate("tracks", tracks, page, page_size)
+        return cache_response(
+            request,
+            key,
+            {"tracks": paginated_tracks, "pagination": pagination},
+            SEARCH_CACHE_CONTROL,
+        )
     else:
         raise HTTPException(status_code=400, detail=f"Invalid track name: {track_name}")
 
 
 #  - API route to get a list of tracks by album
 @app.get("/albums/{albumId}/tracks")
-def get_tracks_by_album(albumId: str):
+def get_tracks_by_album(request: Request, albumId: str):
+    key = ("album-tracks", albumId)
+    if response := cached_response(request, key, ALBUM_TRACKS_CACHE_CONTROL):
+        return response
+
     # Here we would call the AlbumService to get a list of tracks
     tracks = search_tracks_by_album(albumId)
-    return tracks
+    return cache_response(request, key, tracks, ALBUM_TRACKS_CACHE_CONTROL)
+
+
+@dataclass
+class BatchRequest:
+    album_ids: list[str] = field(default_factory=list)
+    artists: list[str] = field(default_factory=list)
+    tracks: list[str] = field(default_factory=list)
+    # Artists or tracks returned for each name
+    limit: int = 3
+
+
+#  - API route resolving many albums, artists and track names at once
+@app.post("/batch")
+def post_batch(request: Request, batch: BatchRequest):
+    size = len(batch.album_ids) + len(batch.artists) + len(batch.tracks)
+    if size > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: {size}, at most {BATCH_MAX_ITEMS} per batch",
+        )
+    if not 1 <= batch.limit <= 20:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 20")
+
+    # Invalid items get their error, the others are resolved
+    content: dict[str, dict] = {"albums": {}, "artists": {}, "tracks": {}}
+    album_ids, artists, tracks = {}, {}, {}
+    for album_id in batch.album_ids:
+        if album_id.strip().isdigit():
+            album_ids[album_id] = int(album_id)
+        else:
+            content["albums"][album_id] = {"error": f"Invalid album id: {album_id}"}
+    for name in batch.artists:
+        if match := re.search(NAME_PATTERN, name.strip().lower()):
+            artists[name] = " ".join(match.groups())
+        else:
+            content["artists"][name] = {"error": f"Invalid artist name: {name}"}
+    for name in batch.tracks:
+        if re.search(NAME_PATTERN, name.strip().lower()):
+            tracks[name] = name.strip().lower()
+        else:
+            content["tracks"][name] = {"error": f"Invalid track name: {name}"}
+
+    # Albums, artists and tracks are resolved at the same time
+    albums_found, artists_found, tracks_found = fan_out(
+        lambda resolve: resolve(),
+        [
+            lambda: resolve_albums(album_ids),
+            lambda: resolve_artists(artists, batch.limit),
+            lambda: resolve_tracks(tracks, batch.limit),
+        ],
+    )
+    content["albums"].update(albums_found)
+    content["artists"].update(artists_found)
+    content["tracks"].update(tracks_found)
+    return http_response(request, make_body(dumps(content)), NO_CACHE)
+
+
+# API route to search the lyrics fetched so far
+@app.get("/lyrics/search")
+async def search_lyrics(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+):
+    if not parse_query(q):
+        raise HTTPException(status_code=400, detail=f"Invalid lyrics query: {q}")
+    # The index is synced from SQLite, keep it off the event loop
+    results = await run_in_threadpool(lyrics.search_lyrics, q, limit)
+    return http_response(
+        request,
+        make_body(dumps({"query": q, "results": results})),
+        LYRICS_SEARCH_CACHE_CONTROL,
+    )
+
+
+# API route to fetch and display lyrics for a song
+@app.get("/lyrics/{artist}/{song}", response_class=responses.HTMLResponse)
+async def get_lyrics(request: Request, artist: str, song: str):
+    try:
+        # The upstream call blocks, keep it off the event loop
+        text = await run_in_threadpool(lyrics.fetch_lyrics, artist, song)
+        if text is None:
+            raise HTTPException(status_code=404, detail="No lyrics found.")
+
+        # Render lyrics in a simple HTML template
+        page = templates.TemplateResponse(
+            "lyrics.html",
+            {
+                "request": request,
+                "artist": artist,
+                "song": song,
+                # Replace newlines with HTML line breaks
+                "lyrics": text.replace("\n", "<br>"),
+            },
+        )
+        # Lyrics don't change, let browsers revalidate them with the ETag
+        return http_response(
+            request, make_body(page.body, "text/html"), LYRICS_CACHE_CONTROL
+        )
+
+    except HTTPException:
+        raise
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error fetching lyrics: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch lyrics.")
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred.")
@@ -0,0 +1,56 @@
+import os
+from typing import Any, Hashable
+from fastapi import Request, responses
+from api.httpcache import NO_CACHE, http_response, make_body
+from model.serialization import dumps
+from service.memcache import MemoryCache
+from service.tracing import span
+
+# Seconds to keep serialized responses, shorter than the pagination
+# snapshots so cached cursors stay valid
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+
+# Serialized JSON bodies, with their ETags, keyed by route and normalized
+# query parameters
+response_cache = MemoryCache(ttl=RESPONSE_CACHE_TTL)
+
+
+def cached_response(
+    request: Request, key: Hashable, cache_control: str
+) -> responses.Response | None:
+    """Returns the stored response for key, or None if it is not cached.
+
+    A request whose If-None-Match matches the stored ETag gets a 304
+    without the body.
+    """
+    cached = response_cache.get(key)
+    return None if cached is None else http_response(request, cached, cache_control)
+
+
+def cache_response(
+    request: Request, key: Hashable, content: Any, cache_control: str
+) -> responses.Response:
+    """Serializes a response body once and stores it for later requests.
+
+    Args:
+        request (Request): the incoming request
+        key (Hashable): route name and normalized query parameters
+        content (Any): response content, models and dicts/lists of them
+        cache_control (str): Cache-Control header of the response
+
+    Returns:
+        responses.Response: the JSON response
+    """
+    with span("response.encode"):
+        cached = make_body(dumps(content))
+    # Don't cache empty results, they are usually upstream failures
+    if not has_results(content):
+        return http_response(request, cached, NO_CACHE)
+    response_cache.set(key, cached)
+    return http_response(request, cached, cache_control)
+
+
+def has_results(content: Any) -> bool:
+    if isinstance(content, dict) and "pagination" in content:
+        return content["pagination"]["total"] > 0
+    return bool(content)
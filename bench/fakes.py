@@ -0,0 +1,285 @@
+"""Local stand-ins for the iTunes Search API and lyrics.ovh.
+
+FakeUpstream serves the /search and /lookup endpoints of iTunes and the
+/v1/{artist}/{title} endpoint of lyrics.ovh (see apiary.apib) from a
+FakeCatalog, with configurable latency and error rate, and counts the calls
+it receives. Catalogs are either generated or loaded from a fixture file of
+iTunes result rows.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "amber blue broken city cold crystal dancing dark dream echo electric empty "
+    "falling fire ghost golden heart highway island light lonely lost midnight "
+    "moon neon night ocean paper rain red river satellite shadow silver sky "
+    "summer sun thunder velvet waves wild winter wire young"
+).split()
+GENRES = ("Rock", "Pop", "Jazz", "Alternative", "Electronic", "Hip-Hop/Rap")
+
+
+def words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).title()
+
+
+def tokens(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class FakeCatalog:
+    """Artists, albums and tracks as iTunes result rows, with lyrics."""
+
+    def __init__(self, rows: list[dict], lyrics: dict[tuple[str, str], str]):
+        self.artists: dict[int, dict] = {}
+        self.albums: dict[int, dict] = {}
+        self.tracks: dict[int, dict] = {}
+        self.albums_by_artist: dict[int, list[dict]] = {}
+        self.tracks_by_album: dict[int, list[dict]] = {}
+        for row in rows:
+            kind = row.get("wrapperType")
+            if kind == "artist":
+                self.artists[row["artistId"]] = row
+            elif kind == "collection":
+                self.albums[row["collectionId"]] = row
+                self.albums_by_artist.setdefault(row["artistId"], []).append(row)
+            elif kind == "track":
+                self.tracks[row["trackId"]] = row
+                self.tracks_by_album.setdefault(row["collectionId"], []).append(row)
+        # Lyrics keyed by lowercase (artist, title)
+        self.lyrics = {(a.lower(), t.lower()): text for (a, t), text in lyrics.items()}
+
+    @classmethod
+    def generate(
+        cls,
+        n_artists: int = 50,
+        albums_per_artist: int = 6,
+        tracks_per_album: int = 10,
+        seed: int = 0,
+    ) -> "FakeCatalog":
+        """Generates a catalog of made-up artists, albums and tracks."""
+        rng = random.Random(seed)
+        rows: list[dict] = []
+        lyrics: dict[tuple[str, str], str] = {}
+        for a in range(1, n_artists + 1):
+            artist_id = 1000 + a
+            artist_name = f"The {words(rng, 2)}"
+            genre = rng.choice(GENRES)
+            rows.append(
+                {
+                    "wrapperType": "artist",
+                    "artistType": "Artist",
+                    "artistId": artist_id,
+                    "artistName": artist_name,
+                    "primaryGenreName": genre,
+                }
+            )
+            for b in range(1, albums_per_artist + 1):
+                album_id = artist_id * 100 + b
+                album_name = words(rng, rng.randint(1, 3))
+                release_date = f"{rng.randint(1965, 2023)}-01-01T08:00:00Z"
+                rows.append(
+                    {
+                        "wrapperType": "collection",
+                        "collectionType": "Album",
+                        "collectionId": album_id,
+                        "collectionName": album_name,
+                        "artistId": artist_id,
+                        "artistName": artist_name,
+                        "artworkUrl100": f"https://example.com/{album_id}/100x100bb.jpg",
+                        "primaryGenreName": genre,
+                        "releaseDate": release_date,
+                    }
+                )
+                for n in range(1, tracks_per_album + 1):
+                    track_name = words(rng, rng.randint(1, 3))
+                    rows.append(
+                        {
+                            "wrapperType": "track",
+                            "kind": "song",
+                            "trackId": album_id * 100 + n,
+                            "trackName": track_name,
+                            "artistId": artist_id,
+                            "artistName": artist_name,
+                            "collectionId": album_id,
+                            "collectionName": album_name,
+                            "discNumber": 1,
+                            "trackNumber": n,
+                            "trackTimeMillis": rng.randint(120000, 360000),
+                            "previewUrl": f"https://example.com/{album_id}/{n}.m4a",
+                            "primaryGenreName": genre,
+                            "releaseDate": release_date,
+                        }
+                    )
+                    # Some songs have no lyrics
+                    if rng.random() < 0.8:
+                        lyrics[(artist_name, track_name)] = "\n".join(
+                            words(rng, 6) for _ in range(12)
+                        )
+        return cls(rows, lyrics)
+
+    @classmethod
+    def load(cls, path: str) -> "FakeCatalog":
+        """Loads a fixture file.
+
+        The file holds {"results": [...], "lyrics": [...]}: iTunes result rows
+        (as returned by /search and /lookup) and {"artist", "title", "lyrics"}
+        objects.
+        """
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        lyrics = {
+            (x["artist"], x["title"]): x["lyrics"] for x in data.get("lyrics", [])
+        }
+        return cls(data["results"], lyrics)
+
+    def search(self, term: str, entity: str, limit: int) -> list[dict]:
+        # Rows whose names contain every word of the term
+        wanted = set(tokens(term))
+        if entity == "musicArtist":
+            rows, fields = self.artists.values(), ("artistName",)
+        elif entity == "album":
+            rows, fields = self.albums.values(), ("collectionName", "artistName")
+        else:
+            rows, fields = self.tracks.values(), ("trackName", "artistName")
+        found = []
+        for row in rows:
+            if wanted <= set(tokens(" ".join(row[f] for f in fields))):
+                found.append(row)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def lookup(self, ids: list[int], entity: str) -> list[dict]:
+        # Each entity, followed by its albums or tracks
+        rows = []
+        for x in ids:
+            if entity == "song" and x in self.albums:
+                rows.append(self.albums[x])
+                rows.extend(self.tracks_by_album.get(x, []))
+            elif x in self.artists:
+                rows.append(self.artists[x])
+                if entity == "album":
+                    rows.extend(self.albums_by_artist.get(x, []))
+        return rows
+
+    def names(self) -> dict[str, list]:
+        """Artist names, album titles, track names, album ids, songs and genres."""
+        return {
+            "artists": [row["artistName"] for row in self.artists.values()],
+            "albums": [row["collectionName"] for row in self.albums.values()],
+            "tracks": [row["trackName"] for row in self.tracks.values()],
+            "album_ids": list(self.albums),
+            "songs": [
+                (row["artistName"], row["trackName"]) for row in self.tracks.values()
+            ],
+            "genres": sorted(
+                {row.get("primaryGenreName") for row in self.albums.values()} - {None}
+            ),
+        }
+
+
+class FakeUpstream:
+    """HTTP server standing in for iTunes and lyrics.ovh on a local port.
+
+    Every call waits `latency` seconds (plus or minus half of it) and fails
+    with a 503 with probability `error_rate`.
+    """
+
+    def __init__(
+        self, catalog: FakeCatalog, latency: float = 0.0, error_rate: float = 0.0
+    ):
+        self.catalog = catalog
+        self.latency = latency
+        self.error_rate = error_rate
+        # endpoint -> number of calls
+        self.calls: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeUpstream":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeUpstream":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def call_counts(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self.calls)
+
+    def respond(self, path: str, query: dict[str, str]) -> tuple[int, dict]:
+        """Answers a request to the fake APIs, with (status, JSON body)."""
+        with self._lock:
+            endpoint = "lyrics" if path.startswith("/v1/") else path.strip("/")
+            self.calls[endpoint] += 1
+            delay = self.latency * self._rng.uniform(0.5, 1.5)
+            failed = self._rng.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            return 503, {"error": "Service unavailable"}
+
+        if path == "/search":
+            rows = self.catalog.search(
+                query.get("term", ""),
+                query.get("entity", "musicArtist"),
+                int(query.get("limit", 50)),
+            )
+        elif path == "/lookup":
+            ids = [int(x) for x in query.get("id", "").split(",") if x.isdigit()]
+            rows = self.catalog.lookup(ids, query.get("entity", ""))
+        elif path.startswith("/v1/"):
+            parts = path.split("/")
+            if len(parts) != 4:
+                return 404, {"error": "No lyrics found"}
+            artist, title = (urllib.parse.unquote(x).lower() for x in parts[2:])
+            lyrics = self.catalog.lyrics.get((artist, title))
+            if lyrics is None:
+                return 404, {"error": "No lyrics found"}
+            return 200, {"lyrics": lyrics}
+        else:
+            return 404, {"error": "Not found"}
+        return 200, {"resultCount": len(rows), "results": rows}
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                query = dict(urllib.parse.parse_qsl(url.query))
+                status, data = upstream.respond(url.path, query)
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
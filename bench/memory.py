@@ -0,0 +1,82 @@
+"""Measures the memory used per track by the model classes.
+
+Run with: python -m bench.memory [number of albums]
+"""
+
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from model.track import Track
+from model.tracklist import TrackList
+
+TRACKS_PER_ALBUM = 12
+
+
+@dataclass
+class DictTrack:
+    # The Track model before it was slotted and interned
+    id: int
+    name: str
+    artist_id: int
+    artist_name: str
+    album_id: int
+    album_name: str
+    disc: int
+    number: int
+    release_date: str
+    genre: str
+    time_millis: int
+    preview_url: str | None = None
+
+
+def track_fields(album: int, number: int) -> dict:
+    # Every string is a new object, like the ones decoded from iTunes JSON
+    return {
+        "id": album * 100 + number,
+        "name": f"Track number {number} of album {album}",
+        "artist_id": album // 10,
+        "artist_name": f"Artist {album // 10}".upper().title(),
+        "album_id": album,
+        "album_name": f"Album {album}".upper().title(),
+        "disc": 1,
+        "number": number,
+        "release_date": f"{1960 + album % 60}-01-01T08:00:00Z".upper(),
+        "genre": "ROCK".title(),
+        "time_millis": 180000 + number,
+        "preview_url": f"https://audio-ssl.itunes.apple.com/preview/{album}/{number}.m4a",
+    }
+
+
+def measure(build) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    albums = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del albums
+    return after - before
+
+
+def main(n_albums: int):
+    n_tracks = n_albums * TRACKS_PER_ALBUM
+    builds = {
+        "dataclass with __dict__": lambda: [
+            [DictTrack(**track_fields(a, n)) for n in range(TRACKS_PER_ALBUM)]
+            for a in range(n_albums)
+        ],
+        "slotted, interned Track": lambda: [
+            [Track(**track_fields(a, n)) for n in range(TRACKS_PER_ALBUM)]
+            for a in range(n_albums)
+        ],
+        "TrackList": lambda: [
+            TrackList(Track(**track_fields(a, n)) for n in range(TRACKS_PER_ALBUM))
+            for a in range(n_albums)
+        ],
+    }
+    print(f"{n_tracks} tracks in {n_albums} albums")
+    for name, build in builds.items():
+        print(f"{name:>25}: {measure(build) / n_tracks:8.1f} bytes per track")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
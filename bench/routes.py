@@ -0,0 +1,268 @@
+"""Benchmarks every API route against local stand-ins of iTunes and lyrics.ovh.
+
+The app runs in-process on a local port with an empty, temporary catalog.
+Each route is driven twice: a cold pass querying every name once, then a
+warm pass of random repeats. For every pass it reports the latency
+percentiles, throughput, errors and the upstream calls it made, so
+regressions in latency or in the number of iTunes calls show up before
+they reach production.
+
+Run with: python -m bench.routes [-h] [--requests N] [--latency MS] ...
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+import requests
+import uvicorn
+import service.catalog as catalog
+import service.filecache as filecache
+import service.itunes as itunes
+import service.lyrics as lyrics
+import service.snapshot as snapshot
+from api.main import app
+from bench.fakes import FakeCatalog, FakeUpstream
+from service.ratelimit import RateLimiter
+from service.singleflight import SingleFlight
+
+
+def percentile(values: list[float], p: float) -> float:
+    # Nearest-rank percentile of unsorted values
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def quote(value) -> str:
+    return urllib.parse.quote(str(value), safe="")
+
+
+def batches(names: dict[str, list], size: int = 5) -> list[dict]:
+    """Bodies of POST /batch, a few album ids, artists and tracks in each."""
+    return [
+        {
+            "album_ids": [str(x) for x in names["album_ids"][i : i + size]],
+            "artists": names["artists"][i : i + size],
+            "tracks": names["tracks"][i : i + size],
+        }
+        for i in range(0, len(names["album_ids"]), size)
+    ]
+
+
+def route_paths(names: dict[str, list]) -> dict[str, tuple[list, Callable]]:
+    """Names to query on every route, with the path for a name.
+
+    The path comes with a JSON body for the POST routes. Lyrics and analytics
+    are searched last, over what the other routes loaded.
+    """
+    return {
+        "/": ([None], lambda _: "/"),
+        "/artist/{name}": (names["artists"], lambda x: f"/artist/{quote(x)}"),
+        "/albums/": (names["albums"], lambda x: f"/albums/?album_name={quote(x)}"),
+        "/albums/stream": (
+            names["albums"],
+            lambda x: f"/albums/stream?album_name={quote(x)}",
+        ),
+        "/tracks/{track_name}": (names["tracks"], lambda x: f"/tracks/{quote(x)}"),
+        "/albums/{albumId}/tracks": (
+            names["album_ids"],
+            lambda x: f"/albums/{x}/tracks",
+        ),
+        "/lyrics/{artist}/{song}": (
+            names["songs"],
+            lambda x: f"/lyrics/{quote(x[0])}/{quote(x[1])}",
+        ),
+        "POST /batch": (batches(names), lambda x: ("/batch", x)),
+        "/lyrics/search": (
+            names["tracks"],
+            lambda x: f"/lyrics/search?q={quote(x)}",
+        ),
+        "/analytics/albums": (
+            names["genres"],
+            lambda x: f"/analytics/albums?genre={quote(x)}",
+        ),
+        "/analytics/genres": (
+            list(range(1960, 2030, 10)),
+            lambda x: f"/analytics/genres?decade={x}",
+        ),
+        "/analytics/durations": (
+            [
+                (by, order)
+                for by in ("album", "artist")
+                for order in ("total", "average")
+            ],
+            lambda x: f"/analytics/durations?by={x[0]}&order={x[1]}",
+        ),
+        "/cache/stats": ([None], lambda _: "/cache/stats"),
+        "/upstream/stats": ([None], lambda _: "/upstream/stats"),
+        "/metrics": ([None], lambda _: "/metrics"),
+    }
+
+
+class App:
+    """The API served by uvicorn on a local port, in a background thread."""
+
+    def __init__(self, app):
+        self._sock = socket.socket()
+        # Accepted connections inherit it, uvicorn doesn't set it on given sockets
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        config = uvicorn.Config(app, log_level="warning", lifespan="on")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(
+            target=self._server.run, kwargs={"sockets": [self._sock]}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._sock.getsockname()
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "App":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
+
+
+def drive(
+    base_url: str, paths: list[str | tuple[str, dict]], concurrency: int
+) -> tuple[list[float], int, float]:
+    """Requests the paths from concurrent clients, posting those with a body.
+
+    Returns:
+        tuple[list[float], int, float]: latencies in seconds, number of
+            errors and elapsed seconds
+    """
+    local = threading.local()
+
+    def get(path: str | tuple[str, dict]) -> tuple[float, bool]:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            # Reading the whole body includes the streamed routes' time
+            if isinstance(path, tuple):
+                path, body = path
+                res = local.session.post(base_url + path, json=body, timeout=60)
+            else:
+                res = local.session.get(base_url + path, timeout=60)
+            ok = res.status_code < 400 or res.status_code == 404
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(get, paths))
+    elapsed = time.perf_counter() - start
+    return [t for t, _ in results], sum(1 for _, ok in results if not ok), elapsed
+
+
+def run(args) -> list[dict]:
+    logging.getLogger().setLevel(logging.WARNING)
+    fake_catalog = (
+        FakeCatalog.load(args.fixtures)
+        if args.fixtures
+        else FakeCatalog.generate(seed=args.seed)
+    )
+    names = fake_catalog.names()
+    # Start from a throwaway catalog, away from ./appcache
+    tmp = Path(tempfile.mkdtemp(prefix="bench-"))
+    catalog.store = catalog.CatalogStore(tmp / "catalog.db")
+    snapshot.current = snapshot.CatalogSnapshot(tmp / "catalog.snap")
+    filecache.flight = SingleFlight(tmp / "locks")
+    # The stand-in doesn't throttle, don't slow the benchmark down either
+    itunes.limiter = RateLimiter(rate_per_minute=0)
+
+    rng = random.Random(args.seed)
+    results = []
+    with FakeUpstream(
+        fake_catalog, args.latency / 1000, args.error_rate
+    ) as upstream, App(app) as server:
+        # Point the services to the stand-ins
+        itunes.ITUNES_URL = upstream.url
+        lyrics.LYRICS_URL = f"{upstream.url}/v1"
+        for route, (values, path) in route_paths(names).items():
+            values = values[: args.requests]
+            passes = {
+                "cold": [path(x) for x in values],
+                "warm": [path(rng.choice(values)) for _ in range(args.requests)],
+            }
+            for name, paths in passes.items():
+                before = upstream.call_counts()
+                latencies, errors, elapsed = drive(server.url, paths, args.concurrency)
+                after = upstream.call_counts()
+                calls = {k: after[k] - before.get(k, 0) for k in after}
+                results.append(
+                    {
+                        "route": route,
+                        "pass": name,
+                        "requests": len(paths),
+                        "errors": errors,
+                        "p50_ms": percentile(latencies, 50) * 1000,
+                        "p95_ms": percentile(latencies, 95) * 1000,
+                        "p99_ms": percentile(latencies, 99) * 1000,
+                        "throughput": len(paths) / elapsed if elapsed else 0.0,
+                        "upstream_calls": sum(calls.values()),
+                        "upstream": {k: v for k, v in calls.items() if v},
+                    }
+                )
+    return results
+
+
+def report(results: list[dict]):
+    print(
+        f"{'route':<28}{'pass':<6}{'reqs':>6}{'errs':>6}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'req/s':>9}{'upstream':>10}"
+    )
+    for r in results:
+        print(
+            f"{r['route']:<28}{r['pass']:<6}{r['requests']:>6}{r['errors']:>6}"
+            f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+            f"{r['throughput']:>9.1f}{r['upstream_calls']:>10}"
+        )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m bench.routes")
+    parser.add_argument("--requests", type=int, default=50, help="requests per pass")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument(
+        "--latency", type=float, default=50, help="upstream latency in milliseconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of failed upstream calls"
+    )
+    parser.add_argument(
+        "--fixtures", help="fixture file, a generated catalog by default"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,9 +1,10 @@
 from dataclasses import dataclass, field
 from typing import List
+from model.interning import intern
 from model.track import Track
 
 
-@dataclass
+@dataclass(slots=True)
 class Album:
     id: int
     artist_id: int
@@ -13,3 +14,8 @@ class Album:
     image_url: str
     genre: str
     tracks: List[Track] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.artist_name = intern(self.artist_name)
+        self.release_date = intern(self.release_date)
+        self.genre = intern(self.genre)
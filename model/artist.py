@@ -1,15 +1,19 @@
-import json
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field
 from typing import List
 from model.album import Album
+from model.interning import intern
+from model.serialization import dumps
 
 
-@dataclass
+@dataclass(slots=True)
 class Artist:
     id: int
     name: str
     # artist_view_url: str
     albums: List[Album] = field(default_factory=list)
 
+    def __post_init__(self):
+        self.name = intern(self.name)
+
     def __str__(self):
-        return json.dumps(asdict(self), indent=2)
+        return dumps(self).decode()
@@ -0,0 +1,6 @@
+import sys
+
+
+def intern(value: str | None) -> str | None:
+    """Returns the shared copy of a string, so repeated values are stored once."""
+    return sys.intern(value) if isinstance(value, str) else value
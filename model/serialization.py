@@ -0,0 +1,81 @@
+from collections.abc import Sequence
+from dataclasses import fields, is_dataclass
+from json.encoder import encode_basestring
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # fall back on the pure Python writer below
+    orjson = None  # type: ignore[assignment]
+
+# Field names of each model class, looked up once per class
+_field_names: dict[type, tuple[str, ...]] = {}
+
+
+def dumps(value: Any) -> bytes:
+    """Encodes models, and dicts and lists of them, into compact JSON bytes.
+
+    Models are written field by field, without building intermediate dicts
+    like dataclasses.asdict or FastAPI's jsonable_encoder do. orjson is used
+    when it is installed.
+
+    Args:
+        value (Any): value to encode
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    out: list[str] = []
+    _write(value, out)
+    return "".join(out).encode()
+
+
+def _default(value: Any) -> Any:
+    # orjson handles dataclasses itself, other sequences (like TrackList) become lists
+    if isinstance(value, Sequence):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _write(value: Any, out: list[str]):
+    if isinstance(value, str):
+        out.append(encode_basestring(value))
+    elif value is None:
+        out.append("null")
+    elif value is True:
+        out.append("true")
+    elif value is False:
+        out.append("false")
+    elif isinstance(value, (int, float)):
+        out.append(repr(value))
+    elif is_dataclass(value):
+        names = _field_names.get(type(value))
+        if names is None:
+            names = _field_names[type(value)] = tuple(f.name for f in fields(value))
+        out.append("{")
+        for i, name in enumerate(names):
+            out.append(',"' if i else '"')
+            out.append(name)
+            out.append('":')
+            _write(getattr(value, name), out)
+        out.append("}")
+    elif isinstance(value, dict):
+        out.append("{")
+        for i, (key, item) in enumerate(value.items()):
+            if i:
+                out.append(",")
+            out.append(encode_basestring(str(key)))
+            out.append(":")
+            _write(item, out)
+        out.append("}")
+    elif isinstance(value, Sequence):
+        out.append("[")
+        for i, item in enumerate(value):
+            if i:
+                out.append(",")
+            _write(item, out)
+        out.append("]")
+    else:
+        raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
@@ -1,7 +1,8 @@
 from dataclasses import dataclass
+from model.interning import intern
 
 
-@dataclass
+@dataclass(slots=True)
 class Track:
     id: int
     name: str
@@ -16,6 +17,13 @@ class Track:
     time_millis: int
     preview_url: str | None = None
 
+    def __post_init__(self):
+        # Every track of an album repeats these, keep a single copy of each
+        self.artist_name = intern(self.artist_name)
+        self.album_name = intern(self.album_name)
+        self.release_date = intern(self.release_date)
+        self.genre = intern(self.genre)
+
     def formatted_time(self) -> str:
         minutes, seconds = divmod(self.time_millis // 1000, 60)
         return f"{minutes}:{seconds:02d}"
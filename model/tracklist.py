@@ -0,0 +1,119 @@
+from array import array
+from typing import Iterable, Iterator, Sequence, overload
+from model.track import Track
+
+
+def pack(values: Iterable[str]) -> tuple[bytes, array]:
+    # Concatenates strings into one buffer, with the offset where each ends
+    buffer = bytearray()
+    ends = array("I")
+    for value in values:
+        buffer += value.encode()
+        ends.append(len(buffer))
+    return bytes(buffer), ends
+
+
+def unpack(packed: tuple[bytes, array], i: int) -> str:
+    buffer, ends = packed
+    start = ends[i - 1] if i > 0 else 0
+    return buffer[start : ends[i]].decode()
+
+
+class TrackList(Sequence[Track]):
+    """Read-only, column oriented list of tracks.
+
+    Numbers are packed into arrays, track names and preview URLs are packed
+    into UTF-8 buffers, and the strings every track of an album repeats
+    (artist, album, release date, genre) are stored once in a string table.
+    This takes a fraction of the memory of a list of Track objects.
+    Tracks are rebuilt on access, so they support the whole Track API.
+    """
+
+    __slots__ = (
+        "_ids",
+        "_artist_ids",
+        "_album_ids",
+        "_discs",
+        "_numbers",
+        "_time_millis",
+        "_names",
+        "_preview_urls",
+        "_strings",
+        "_artist_names",
+        "_album_names",
+        "_release_dates",
+        "_genres",
+    )
+
+    def __init__(self, tracks: Iterable[Track] = ()):
+        tracks = list(tracks)
+        self._ids = array("q", (t.id for t in tracks))
+        self._artist_ids = array("q", (t.artist_id for t in tracks))
+        self._album_ids = array("q", (t.album_id for t in tracks))
+        self._discs = array("h", (t.disc for t in tracks))
+        self._numbers = array("h", (t.number for t in tracks))
+        self._time_millis = array("q", (t.time_millis for t in tracks))
+        self._names = pack(t.name for t in tracks)
+        # No preview is stored as an empty string
+        self._preview_urls = pack(t.preview_url or "" for t in tracks)
+
+        # Repeated strings are replaced by their position in the string table
+        self._strings: list[str] = []
+        codes: dict[str, int] = {}
+
+        def encode(values: Iterable[str]) -> array:
+            column = array("I")
+            for value in values:
+                if value not in codes:
+                    codes[value] = len(self._strings)
+                    self._strings.append(value)
+                column.append(codes[value])
+            return column
+
+        self._artist_names = encode(t.artist_name for t in tracks)
+        self._album_names = encode(t.album_name for t in tracks)
+        self._release_dates = encode(t.release_date for t in tracks)
+        self._genres = encode(t.genre for t in tracks)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @overload
+    def __getitem__(self, i: int) -> Track: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[Track]: ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("track index out of range")
+        strings = self._strings
+        return Track(
+            id=self._ids[i],
+            name=unpack(self._names, i),
+            artist_id=self._artist_ids[i],
+            artist_name=strings[self._artist_names[i]],
+            album_id=self._album_ids[i],
+            album_name=strings[self._album_names[i]],
+            disc=self._discs[i],
+            number=self._numbers[i],
+            release_date=strings[self._release_dates[i]],
+            genre=strings[self._genres[i]],
+            time_millis=self._time_millis[i],
+            preview_url=unpack(self._preview_urls, i) or None,
+        )
+
+    def __iter__(self) -> Iterator[Track]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def total_millis(self) -> int:
+        """Total duration of the tracks, without building Track objects."""
+        return sum(self._time_millis)
+
+    def to_list(self) -> list[Track]:
+        return list(self)
@@ -0,0 +1,328 @@
+"""Aggregates over the whole catalog, computed on NumPy columns.
+
+A CatalogColumns view holds one array per album attribute (id, artist,
+release year, genre code, number of tracks, total duration), sorted from
+the newest release to the oldest, so listings and aggregates are masks,
+bincounts and partitions over arrays instead of loops over Album objects.
+Track durations are summed per album when the view is built.
+
+The view is rebuilt from the catalog in the background once it is older
+than ANALYTICS_MAX_AGE and the catalog has been written since, and requests
+keep using the previous one meanwhile.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from model.album import Album
+from service import catalog
+
+try:
+    import numpy as np
+except ImportError:  # the analytics routes answer 503
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds after which the view is rebuilt to include the newer catalog rows
+ANALYTICS_MAX_AGE = float(os.environ.get("ANALYTICS_MAX_AGE", "60"))
+
+
+class AnalyticsUnavailable(Exception):
+    """Raised when NumPy is not installed."""
+
+
+def decade_label(decade: int) -> str:
+    return f"{decade}s"
+
+
+@dataclass
+class CatalogColumns:
+    """Columns of the cached albums, newest release first.
+
+    Releases without a date have year 0, albums whose track list was never
+    fetched have 0 tracks and are left out of the duration aggregates.
+    """
+
+    album_ids: "np.ndarray"
+    artist_ids: "np.ndarray"
+    # Dense artist number of each album, indexing artist_index
+    artist_codes: "np.ndarray"
+    artist_index: "np.ndarray"
+    years: "np.ndarray"
+    genre_codes: "np.ndarray"
+    track_counts: "np.ndarray"
+    durations: "np.ndarray"
+    # Genre names by code, and code by lowercase name
+    genres: list[str]
+    genre_lookup: dict[str, int]
+    artist_names: dict[int, str]
+    built_at: float
+    # Number of the last catalog write included
+    seq: int
+
+    @classmethod
+    def build(cls, store: catalog.CatalogStore) -> "CatalogColumns":
+        """Reads every album and track duration of the catalog into columns."""
+        if np is None:
+            raise AnalyticsUnavailable("Analytics need NumPy")
+        # Rows written after this number are left for the next rebuild
+        seq = store.last_seq()
+        conn = store.connection()
+        albums = conn.execute(
+            "SELECT id, artist_id, artist_name, release_date, genre FROM album "
+            "ORDER BY id"
+        ).fetchall()
+        # Tracks seen in searches don't make up complete albums
+        tracks = conn.execute(
+            "SELECT track.album_id, track.time_millis FROM track "
+            "JOIN album ON album.id = track.album_id "
+            "WHERE album.tracks_loaded_at IS NOT NULL"
+        ).fetchall()
+
+        n = len(albums)
+        album_ids = np.fromiter((r[0] for r in albums), np.int64, n)
+        artist_ids = np.fromiter((r[1] for r in albums), np.int64, n)
+        years = np.fromiter((year_of(r[3]) for r in albums), np.int16, n)
+        # Genres are told apart regardless of case, named as first seen
+        names: dict[str, str] = {}
+        for r in albums:
+            names.setdefault((r[4] or "").lower(), r[4] or "")
+        genre_keys, genre_codes = np.unique(
+            np.array([(r[4] or "").lower() for r in albums], dtype=object),
+            return_inverse=True,
+        )
+
+        # Album of every track, by binary search of the sorted album ids
+        track_albums = np.fromiter((r[0] for r in tracks), np.int64, len(tracks))
+        millis = np.fromiter((r[1] or 0 for r in tracks), np.int64, len(tracks))
+        positions = np.searchsorted(album_ids, track_albums)
+        known = positions < n
+        known[known] = album_ids[positions[known]] == track_albums[known]
+        track_counts = np.bincount(positions[known], minlength=n).astype(np.int32)
+        durations = np.bincount(
+            positions[known], weights=millis[known], minlength=n
+        ).astype(np.int64)
+
+        artist_index, artist_codes = np.unique(artist_ids, return_inverse=True)
+        # Newest releases first, then by id
+        order = np.lexsort((album_ids, -years.astype(np.int32)))
+        genres = [names[key] for key in genre_keys]
+        return cls(
+            album_ids=album_ids[order],
+            artist_ids=artist_ids[order],
+            artist_codes=artist_codes[order],
+            artist_index=artist_index,
+            years=years[order],
+            genre_codes=genre_codes[order].astype(np.int32),
+            track_counts=track_counts[order],
+            durations=durations[order],
+            genres=genres,
+            genre_lookup={key: code for code, key in enumerate(genre_keys)},
+            artist_names={r[1]: r[2] for r in albums},
+            built_at=time.time(),
+            seq=seq,
+        )
+
+    def mask(
+        self,
+        genre: str | None = None,
+        year: int | None = None,
+        decade: int | None = None,
+        artist_id: int | None = None,
+    ) -> "np.ndarray":
+        """Selects the albums matching every given filter.
+
+        Args:
+            genre (str | None): genre name, case insensitive
+            year (int | None): release year
+            decade (int | None): first year of the release decade, like 1990
+            artist_id (int | None): artist of the albums
+
+        Returns:
+            np.ndarray: boolean mask over the album columns
+        """
+        selected = np.ones(len(self.album_ids), dtype=bool)
+        if genre is not None:
+            code = self.genre_lookup.get(genre.strip().lower())
+            if code is None:
+                return np.zeros(len(self.album_ids), dtype=bool)
+            selected &= self.genre_codes == code
+        if year is not None:
+            selected &= self.years == year
+        if decade is not None:
+            selected &= (self.years >= decade) & (self.years < decade + 10)
+        if artist_id is not None:
+            selected &= self.artist_ids == artist_id
+        return selected
+
+    def album_ids_where(
+        self, selected: "np.ndarray", offset: int, limit: int
+    ) -> tuple[list[int], int]:
+        """Returns a page of the selected album ids, newest first, and their total."""
+        positions = np.flatnonzero(selected)
+        page = self.album_ids[positions[offset : offset + limit]]
+        return page.tolist(), len(positions)
+
+    def genre_decade_counts(self, selected: "np.ndarray") -> dict[str, dict[str, int]]:
+        """Counts the selected albums per genre and release decade.
+
+        Returns:
+            dict[str, dict[str, int]]: genre -> decade label -> number of albums
+        """
+        dated = selected & (self.years > 0)
+        decades = self.years[dated] // 10 * 10
+        if not len(decades):
+            return {}
+        first = int(decades.min())
+        n_decades = (int(decades.max()) - first) // 10 + 1
+        # One bin per (genre, decade) pair
+        bins = self.genre_codes[dated] * n_decades + (decades - first) // 10
+        counts = np.bincount(bins, minlength=len(self.genres) * n_decades).reshape(
+            len(self.genres), n_decades
+        )
+        result: dict[str, dict[str, int]] = {}
+        for code, row in enumerate(counts):
+            for i in np.flatnonzero(row):
+                decade = decade_label(first + 10 * int(i))
+                result.setdefault(self.genres[code], {})[decade] = int(row[i])
+        return result
+
+    def album_durations(
+        self, selected: "np.ndarray", limit: int, by_average: bool = False
+    ) -> list[dict]:
+        """Returns the selected albums with the longest total or average track duration."""
+        selected = selected & (self.track_counts > 0)
+        positions = np.flatnonzero(selected)
+        totals = self.durations[positions]
+        averages = totals / self.track_counts[positions]
+        top = top_n(averages if by_average else totals, limit)
+        return [
+            {
+                "album_id": int(self.album_ids[positions[i]]),
+                "artist_id": int(self.artist_ids[positions[i]]),
+                "tracks": int(self.track_counts[positions[i]]),
+                "total_millis": int(totals[i]),
+                "average_millis": round(float(averages[i])),
+            }
+            for i in top
+        ]
+
+    def artist_durations(
+        self, selected: "np.ndarray", limit: int, by_average: bool = False
+    ) -> list[dict]:
+        """Returns the artists with the longest total or average track duration."""
+        selected = selected & (self.track_counts > 0)
+        codes = self.artist_codes[selected]
+        n = len(self.artist_index)
+        tracks = np.bincount(codes, weights=self.track_counts[selected], minlength=n)
+        totals = np.bincount(codes, weights=self.durations[selected], minlength=n)
+        albums = np.bincount(codes, minlength=n)
+        present = np.flatnonzero(albums)
+        averages = totals[present] / tracks[present]
+        top = top_n(averages if by_average else totals[present], limit)
+        result = []
+        for i in top:
+            code = present[i]
+            artist_id = int(self.artist_index[code])
+            result.append(
+                {
+                    "artist_id": artist_id,
+                    "artist_name": self.artist_names.get(artist_id),
+                    "albums": int(albums[code]),
+                    "tracks": int(tracks[code]),
+                    "total_millis": int(totals[code]),
+                    "average_millis": round(float(averages[i])),
+                }
+            )
+        return result
+
+
+def year_of(release_date: str | None) -> int:
+    # iTunes release dates look like 1971-09-09T07:00:00Z
+    try:
+        return int(release_date[:4]) if release_date else 0
+    except ValueError:
+        return 0
+
+
+def top_n(values: "np.ndarray", n: int) -> "np.ndarray":
+    # Positions of the n largest values, largest first, without a full sort
+    if n <= 0 or not len(values):
+        return np.array([], dtype=np.int64)
+    if n < len(values):
+        candidates = np.argpartition(-values, n - 1)[:n]
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.argsort(-values[candidates], kind="stable")]
+
+
+_view: CatalogColumns | None = None
+_build_lock = threading.Lock()
+# Rebuilds run one at a time on their own thread, apart from cache refreshes
+_rebuilder = ThreadPoolExecutor(1, thread_name_prefix="analytics-rebuild")
+_pending: Future | None = None
+_pending_lock = threading.Lock()
+
+
+def albums_by_id(album_ids: list[int]) -> list[Album]:
+    # The albums of a page of ids, without their tracks
+    return catalog.store.get_albums(album_ids, with_tracks=False) or []
+
+
+def rebuild() -> CatalogColumns:
+    """Builds the view from the catalog and makes it current.
+
+    A view is only renewed, not rebuilt, when the catalog hasn't been
+    written since it was built.
+    """
+    global _view
+    view = _view
+    if view is not None and catalog.store.last_seq() == view.seq:
+        _view = replace(view, built_at=time.time())
+        return _view
+    started = time.perf_counter()
+    view = CatalogColumns.build(catalog.store)
+    _view = view
+    logger.info(
+        f"Built the analytics view of {len(view.album_ids)} albums "
+        f"in {time.perf_counter() - started:.3f}s"
+    )
+    return view
+
+
+def rebuild_in_background() -> Future:
+    """Schedules a rebuild of the view, unless one is already pending."""
+    global _pending
+    with _pending_lock:
+        if _pending is None or _pending.done():
+            _pending = _rebuilder.submit(rebuild_logged)
+        return _pending
+
+
+def rebuild_logged():
+    try:
+        rebuild()
+    except Exception as e:
+        logger.error(f"Rebuilding the analytics view failed: {e}")
+
+
+def columns() -> CatalogColumns:
+    """Returns the current view, rebuilt in the background once it is stale.
+
+    Raises:
+        AnalyticsUnavailable: if NumPy is not installed
+    """
+    if np is None:
+        raise AnalyticsUnavailable("Analytics need NumPy")
+    view = _view
+    if view is None:
+        # Only the first request waits for the view to be built
+        with _build_lock:
+            return _view or rebuild()
+    if time.time() - view.built_at > ANALYTICS_MAX_AGE:
+        rebuild_in_background()
+    return view
@@ -0,0 +1,122 @@
+import logging
+import requests
+from typing import Callable
+from model.artist import Artist
+from service import itunes
+from service.concurrency import fan_out
+from service.ratelimit import RateLimited
+
+logger = logging.getLogger(__name__)
+
+
+def item_error(e: Exception) -> dict:
+    # Failed items report their error, the rest of the batch is still served
+    error: dict = {"error": f"Error searching iTunes API: {e}"}
+    if isinstance(e, RateLimited):
+        error["retry_after"] = round(e.retry_after, 1)
+    return error
+
+
+def try_each(fn: Callable, keys: list) -> list[tuple[object, Exception | None]]:
+    # Runs fn for every key concurrently, with the error of each failed call
+    def attempt(key):
+        try:
+            return fn(key), None
+        except requests.RequestException as e:
+            return None, e
+
+    return fan_out(attempt, keys)
+
+
+def resolve_albums(album_ids: dict[str, int]) -> dict[str, dict]:
+    """Looks up the tracks of many albums at once.
+
+    Albums in the catalog are read from it, the others are looked up on
+    iTunes in as few batched calls as possible. When that fails, the albums
+    are looked up one by one so that only the failing ones report an error.
+
+    Args:
+        album_ids (dict[str, int]): album ids as requested -> album id
+
+    Returns:
+        dict[str, dict]: album ids as requested -> {"tracks": [...]} or
+            {"error": ...}
+    """
+    ids = list(dict.fromkeys(album_ids.values()))
+    try:
+        found = [(tracks, None) for tracks in itunes.get_tracks_by_albums(ids)]
+    except requests.RequestException as e:
+        logger.error(f"Batch lookup of {len(ids)} albums failed: {e}")
+        found = try_each(lambda x: itunes.get_tracks_by_albums([x])[0], ids)
+    tracks_by_id = dict(zip(ids, found))
+
+    results = {}
+    for key, album_id in album_ids.items():
+        tracks, error = tracks_by_id[album_id]
+        if error is not None:
+            results[key] = item_error(error)
+        elif not tracks:
+            # iTunes has no such album, or one without tracks
+            results[key] = {"error": f"Album not found: {key}"}
+        else:
+            results[key] = {"tracks": tracks}
+    return results
+
+
+def resolve_artists(names: dict[str, str], limit: int) -> dict[str, dict]:
+    """Searches many artists at once, with their albums.
+
+    The searches run concurrently, then the albums of every artist found
+    are looked up together. When that fails, the artists are returned
+    without their albums.
+
+    Args:
+        names (dict[str, str]): names as requested -> normalized name
+        limit (int): maximum number of artists per name
+
+    Returns:
+        dict[str, dict]: names as requested -> {"artists": [...]} or
+            {"error": ...}
+    """
+    terms = list(dict.fromkeys(names.values()))
+    found = dict(zip(terms, try_each(lambda x: itunes.find_artists(x, limit), terms)))
+
+    # The same artist may be found by several names
+    unique: dict[int, Artist] = {}
+    for artists, _ in found.values():
+        for artist in artists or []:
+            unique.setdefault(artist.id, artist)
+    try:
+        hydrated = {x.id: x for x in itunes.hydrate_artists(list(unique.values()))}
+    except requests.RequestException as e:
+        logger.error(f"Batch lookup of the albums of {len(unique)} artists failed: {e}")
+        hydrated = unique
+
+    results = {}
+    for key, term in names.items():
+        artists, error = found[term]
+        if error is not None:
+            results[key] = item_error(error)
+        else:
+            results[key] = {"artists": [hydrated[x.id] for x in artists]}
+    return results
+
+
+def resolve_tracks(queries: dict[str, str], limit: int) -> dict[str, dict]:
+    """Searches many tracks at once.
+
+    Args:
+        queries (dict[str, str]): track names as requested -> search terms
+        limit (int): maximum number of tracks per name
+
+    Returns:
+        dict[str, dict]: track names as requested -> {"tracks": [...]} or
+            {"error": ...}
+    """
+    terms = list(dict.fromkeys(queries.values()))
+    found = dict(zip(terms, try_each(lambda x: itunes.search_tracks(x, limit), terms)))
+    results = {}
+    for key, term in queries.items():
+        tracks, error = found[term]
+        results[key] = {"tracks": tracks} if error is None else item_error(error)
+    return results
@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from typing import Callable, Generic, Hashable, Iterable, TypeVar
+from service.concurrency import fan_out
+from service.ratelimit import BACKGROUND, current_priority, priority
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# How long a single lookup waits for other callers to join its batch
+BATCH_WINDOW = int(os.environ.get("ITUNES_BATCH_WINDOW_MS", "10")) / 1000
+# The iTunes lookup endpoint accepts a comma separated list of ids,
+# keep batches small enough for the URL and the response to stay reasonable
+MAX_BATCH_SIZE = int(os.environ.get("ITUNES_MAX_BATCH_SIZE", "50"))
+
+
+class LookupBatcher(Generic[K, V]):
+    """Collects keys requested by concurrent callers and loads them together.
+
+    Every key waits at most `window` seconds (or until `max_batch_size` keys
+    are pending) before a single call to `fetch` loads the whole batch. The
+    result of `fetch` is split back to each caller by key, keys missing from
+    it resolve to `default()`. Callers asking for a key that is pending or
+    already being fetched share its result.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[list[K]], dict[K, V]],
+        default: Callable[[], V],
+        window: float = BATCH_WINDOW,
+        max_batch_size: int = MAX_BATCH_SIZE,
+    ):
+        self.fetch = fetch
+        self.default = default
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: dict[K, Future] = {}
+        # The pending batch is fetched with the highest priority of its callers
+        self._priority = BACKGROUND
+        self._inflight: dict[K, Future] = {}
+        self._timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, key: K) -> Future:
+        """Queues a key for the next batch.
+
+        Args:
+            key (K): key to load
+
+        Returns:
+            Future: resolves to the value loaded for key
+        """
+        batch = None
+        with self._lock:
+            # Callers asking for a key that is already queued share its future
+            if key in self._pending:
+                return self._pending[key]
+            if key in self._inflight:
+                return self._inflight[key]
+            future: Future = Future()
+            self._pending[key] = future
+            self._priority = min(self._priority, current_priority())
+            if len(self._pending) >= self.max_batch_size:
+                batch, level = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._run(batch, level)
+        return future
+
+    def flush(self):
+        """Loads every pending key right away."""
+        with self._lock:
+            batch, level = self._take()
+        if batch:
+            self._run(batch, level)
+
+    def load(self, key: K) -> V:
+        """Loads a single key, batched with other concurrent callers."""
+        return self.submit(key).result()
+
+    def load_many(self, keys: Iterable[K]) -> list[V]:
+        """Loads several keys without waiting for the batch window.
+
+        Keys are split into batches of at most `max_batch_size` which are
+        fetched concurrently.
+
+        Args:
+            keys (Iterable[K]): keys to load
+
+        Returns:
+            list[V]: the values, in the same order as keys
+        """
+        keys = list(keys)
+        chunks = [
+            keys[i : i + self.max_batch_size]
+            for i in range(0, len(keys), self.max_batch_size)
+        ]
+        results = fan_out(self._load_chunk, chunks)
+        return [value for chunk in results for value in chunk]
+
+    def _load_chunk(self, keys: list[K]) -> list[V]:
+        futures = [self.submit(key) for key in keys]
+        self.flush()
+        return [future.result() for future in futures]
+
+    def _take(self) -> tuple[dict[K, Future], int]:
+        # Must be called with the lock held
+        batch, self._pending = self._pending, {}
+        level, self._priority = self._priority, BACKGROUND
+        self._inflight.update(batch)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch, level
+
+    def _run(self, batch: dict[K, Future], level: int):
+        results: dict[K, V] = {}
+        error: Exception | None = None
+        try:
+            with priority(level):
+                results = self.fetch(list(batch))
+        except Exception as e:
+            logger.error(f"Batch lookup of {len(batch)} keys failed: {e}")
+            error = e
+        with self._lock:
+            for key in batch:
+                self._inflight.pop(key, None)
+        for key, future in batch.items():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[key] if key in results else self.default())
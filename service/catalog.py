@@ -0,0 +1,485 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import fields
+from pathlib import Path
+from typing import Iterable
+from model.artist import Artist
+from model.album import Album
+from model.track import Track
+from service.searchindex import CatalogIndex
+
+logger = logging.getLogger(__name__)
+
+# Location of the SQLite catalog shared by every worker process
+CATALOG_PATH = Path(os.environ.get("CATALOG_PATH", "./appcache/catalog.db"))
+
+ALBUM_COLUMNS = [f.name for f in fields(Album) if f.name != "tracks"]
+TRACK_COLUMNS = [f.name for f in fields(Track)]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS artist (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    -- JSON list of the artist's album ids, NULL until they have been fetched
+    album_ids TEXT,
+    -- set when the album list of the artist was last fetched
+    albums_loaded_at REAL,
+    updated_at REAL NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS album (
+    id INTEGER PRIMARY KEY,
+    {", ".join(c for c in ALBUM_COLUMNS if c != "id")},
+    -- set once the complete track list of the album has been fetched
+    tracks_loaded_at REAL,
+    updated_at REAL NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS album_artist_id ON album (artist_id);
+CREATE TABLE IF NOT EXISTS track (
+    id INTEGER PRIMARY KEY,
+    {", ".join(c for c in TRACK_COLUMNS if c != "id")},
+    updated_at REAL NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS track_album_id ON track (album_id);
+CREATE INDEX IF NOT EXISTS track_artist_id ON track (artist_id);
+-- Number of the last write transaction, rows store the number of the one
+-- that wrote them
+CREATE TABLE IF NOT EXISTS sequence (value INTEGER NOT NULL);
+INSERT INTO sequence SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM sequence);
+CREATE INDEX IF NOT EXISTS artist_seq ON artist (seq);
+CREATE INDEX IF NOT EXISTS album_seq ON album (seq);
+CREATE INDEX IF NOT EXISTS track_seq ON track (seq);
+CREATE TABLE IF NOT EXISTS query (
+    kind TEXT NOT NULL,
+    -- normalized search terms
+    term TEXT NOT NULL,
+    -- largest limit searched, smaller limits are served the first ids
+    "limit" INTEGER NOT NULL,
+    -- JSON list of the result ids, in iTunes order
+    ids TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, term)
+);
+CREATE TABLE IF NOT EXISTS lyrics (
+    id INTEGER PRIMARY KEY,
+    -- normalized artist and song names, the lookup key
+    artist TEXT NOT NULL,
+    song TEXT NOT NULL,
+    -- names as first requested, for display
+    artist_name TEXT NOT NULL,
+    song_name TEXT NOT NULL,
+    text TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    seq INTEGER NOT NULL,
+    UNIQUE (artist, song)
+);
+CREATE INDEX IF NOT EXISTS lyrics_seq ON lyrics (seq);
+CREATE TABLE IF NOT EXISTS snapshot (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    -- JSON list of the ordered result ids a paginated response pages over
+    ids TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Column holding when the children of a row were fetched, per table
+LOADED_AT = {"artist": "albums_loaded_at", "album": "tracks_loaded_at"}
+
+
+def upsert_sql(table: str, columns: list[str]) -> str:
+    # INSERT that updates every column of an existing row with the same id
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != "id")
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}, updated_at, seq) "
+        f"VALUES ({', '.join('?' * len(columns))}, ?, ?) "
+        f"ON CONFLICT (id) DO UPDATE SET {updates}, updated_at = excluded.updated_at, "
+        "seq = excluded.seq"
+    )
+
+
+def next_seq(conn: sqlite3.Connection) -> int:
+    # Taking a number starts the write transaction, and SQLite has a single
+    # writer, so numbers grow in commit order (unlike updated_at)
+    return conn.execute(
+        "UPDATE sequence SET value = value + 1 RETURNING value"
+    ).fetchone()[0]
+
+
+class CatalogStore:
+    """SQLite store of every artist, album and track received from iTunes.
+
+    The database runs in WAL mode so several worker processes can read it
+    while one of them writes. Each thread gets its own connection. Names are
+    also kept in an in-process search index to answer searches locally.
+    """
+
+    def __init__(self, path: Path = CATALOG_PATH):
+        self.path = Path(path)
+        self.index = CatalogIndex()
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def upsert_artists(self, artists: Iterable[Artist]):
+        now = time.time()
+        with self.connection() as conn:
+            seq = next_seq(conn)
+            conn.executemany(
+                "INSERT INTO artist (id, name, updated_at, seq) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET name = excluded.name, "
+                "updated_at = excluded.updated_at, seq = excluded.seq",
+                [(artist.id, artist.name, now, seq) for artist in artists],
+            )
+
+    def upsert_albums(self, albums: Iterable[Album]):
+        with self.connection() as conn:
+            self._write_albums(conn, albums, time.time(), next_seq(conn))
+
+    def upsert_tracks(self, tracks: Iterable[Track]):
+        with self.connection() as conn:
+            self._write_tracks(conn, tracks, time.time(), next_seq(conn))
+
+    def set_artist_albums(self, artist_id: int, albums: list[Album]):
+        """Stores the complete album list of an artist, in one transaction."""
+        name = albums[0].artist_name if albums else ""
+        now = time.time()
+        with self.connection() as conn:
+            seq = next_seq(conn)
+            self._write_albums(conn, albums, now, seq)
+            conn.execute(
+                "INSERT INTO artist (id, name, album_ids, albums_loaded_at, updated_at, "
+                "seq) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                "album_ids = excluded.album_ids, "
+                "albums_loaded_at = excluded.albums_loaded_at, "
+                "updated_at = excluded.updated_at, seq = excluded.seq",
+                (artist_id, name, json.dumps([a.id for a in albums]), now, now, seq),
+            )
+
+    def set_album_tracks(self, album: Album, tracks: list[Track]):
+        """Stores an album together with its complete track list, in one
+        transaction, so readers never see it marked loaded without its tracks.
+        """
+        now = time.time()
+        with self.connection() as conn:
+            seq = next_seq(conn)
+            self._write_albums(conn, [album], now, seq)
+            self._write_tracks(conn, tracks, now, seq)
+            conn.execute(
+                "UPDATE album SET tracks_loaded_at = ? WHERE id = ?", (now, album.id)
+            )
+
+    def _write_albums(
+        self, conn: sqlite3.Connection, albums: Iterable[Album], now: float, seq: int
+    ):
+        conn.executemany(
+            upsert_sql("album", ALBUM_COLUMNS),
+            [[getattr(a, c) for c in ALBUM_COLUMNS] + [now, seq] for a in albums],
+        )
+
+    def _write_tracks(
+        self, conn: sqlite3.Connection, tracks: Iterable[Track], now: float, seq: int
+    ):
+        conn.executemany(
+            upsert_sql("track", TRACK_COLUMNS),
+            [[getattr(t, c) for c in TRACK_COLUMNS] + [now, seq] for t in tracks],
+        )
+
+    def loaded_at(self, table: str, row_id: int) -> float | None:
+        """Returns when the albums of an artist or the tracks of an album were
+        last fetched, or None if they never were.
+
+        Args:
+            table (str): artist or album
+            row_id (int): id of the artist or album
+        """
+        row = (
+            self.connection()
+            .execute(f"SELECT {LOADED_AT[table]} FROM {table} WHERE id = ?", (row_id,))
+            .fetchone()
+        )
+        return None if row is None else row[0]
+
+    def get_artist(self, artist_id: int) -> Artist | None:
+        """Returns an artist without albums, or None if it is not cached."""
+        rows = self._select("artist", "id", [artist_id])
+        return None if rows is None else Artist(rows[0]["id"], rows[0]["name"])
+
+    def get_artists(
+        self, artist_ids: list[int], with_albums: bool = True
+    ) -> list[Artist] | None:
+        """Returns the artists (with their albums), or None if any is not cached."""
+        rows = self._select("artist", "id", artist_ids)
+        if rows is None:
+            return None
+        if not with_albums:
+            return [Artist(row["id"], row["name"]) for row in rows]
+        if any(row["album_ids"] is None for row in rows):
+            return None
+        artists = []
+        for row in rows:
+            albums = self.get_albums(json.loads(row["album_ids"]), with_tracks=False)
+            if albums is None:
+                return None
+            artists.append(Artist(row["id"], row["name"], albums))
+        return artists
+
+    def get_albums(
+        self, album_ids: list[int], with_tracks: bool = True
+    ) -> list[Album] | None:
+        """Returns the albums (with their tracks), or None if any is not cached."""
+        rows = self._select("album", "id", album_ids)
+        if rows is None:
+            return None
+        if with_tracks and any(row["tracks_loaded_at"] is None for row in rows):
+            return None
+        albums = [Album(**{c: row[c] for c in ALBUM_COLUMNS}) for row in rows]
+        if with_tracks:
+            tracks = self.get_tracks_by_albums(album_ids)
+            for album in albums:
+                album.tracks = tracks.get(album.id, [])
+        return albums
+
+    def get_artist_albums(self, artist_id: int) -> list[Album] | None:
+        """Returns the albums of an artist, or None if they are not cached."""
+        row = (
+            self.connection()
+            .execute("SELECT album_ids FROM artist WHERE id = ?", (artist_id,))
+            .fetchone()
+        )
+        if row is None or row["album_ids"] is None:
+            return None
+        return self.get_albums(json.loads(row["album_ids"]), with_tracks=False)
+
+    def get_album_tracks(self, album_id: int) -> list[Track] | None:
+        """Returns the tracks of an album, or None if they are not cached."""
+        entry = self.get_album_tracks_entry(album_id)
+        return None if entry is None else entry[0]
+
+    def get_album_tracks_entry(self, album_id: int) -> tuple[list[Track], float] | None:
+        """Returns the tracks of an album and the time they were fetched, or None."""
+        row = (
+            self.connection()
+            .execute("SELECT tracks_loaded_at FROM album WHERE id = ?", (album_id,))
+            .fetchone()
+        )
+        if row is None or row["tracks_loaded_at"] is None:
+            return None
+        tracks = self.get_tracks_by_albums([album_id]).get(album_id, [])
+        return tracks, row["tracks_loaded_at"]
+
+    def get_tracks_by_albums(self, album_ids: list[int]) -> dict[int, list[Track]]:
+        if not album_ids:
+            return {}
+        rows = (
+            self.connection()
+            .execute(
+                f"SELECT {', '.join(TRACK_COLUMNS)} FROM track "
+                f"WHERE album_id IN ({', '.join('?' * len(album_ids))}) "
+                "ORDER BY disc, number",
+                album_ids,
+            )
+            .fetchall()
+        )
+        tracks: dict[int, list[Track]] = {}
+        for row in rows:
+            tracks.setdefault(row["album_id"], []).append(Track(**dict(row)))
+        return tracks
+
+    def get_tracks(self, track_ids: list[int]) -> list[Track] | None:
+        """Returns the tracks, or None if any is not cached."""
+        rows = self._select("track", "id", track_ids)
+        if rows is None:
+            return None
+        return [Track(**{c: row[c] for c in TRACK_COLUMNS}) for row in rows]
+
+    def save_search(self, kind: str, term: str, limit: int, ids: list[int]):
+        """Remembers the ordered result ids of a search.
+
+        A search with a smaller limit than the one stored only renews it if
+        it returned the same first results, otherwise the newer one wins.
+        """
+        with self.connection() as conn:
+            row = conn.execute(
+                'SELECT "limit", ids FROM query WHERE kind = ? AND term = ?',
+                (kind, term),
+            ).fetchone()
+            if (
+                row is not None
+                and row["limit"] > limit
+                and json.loads(row["ids"])[:limit] == ids
+            ):
+                conn.execute(
+                    "UPDATE query SET updated_at = ? WHERE kind = ? AND term = ?",
+                    (time.time(), kind, term),
+                )
+                return
+            conn.execute(
+                'INSERT OR REPLACE INTO query (kind, term, "limit", ids, updated_at) '
+                "VALUES (?, ?, ?, ?, ?)",
+                (kind, term, limit, json.dumps(ids), time.time()),
+            )
+
+    def get_search_entry(
+        self, kind: str, term: str, limit: int
+    ) -> tuple[list[int], float] | None:
+        """Returns the result ids of a search (or the first ones of a search
+        with a larger limit) and the time it was made, or None.
+        """
+        row = (
+            self.connection()
+            .execute(
+                "SELECT ids, updated_at FROM query WHERE kind = ? AND term = ? "
+                'AND "limit" >= ?',
+                (kind, term, limit),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        return json.loads(row["ids"])[:limit], row["updated_at"]
+
+    def save_snapshot(self, snapshot_id: str, kind: str, ids: list[int], ttl: float):
+        """Stores the ordered result ids of a paginated response."""
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute("DELETE FROM snapshot WHERE expires_at < ?", (now,))
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshot (id, kind, ids, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (snapshot_id, kind, json.dumps(ids), now + ttl),
+            )
+
+    def get_snapshot(self, snapshot_id: str, kind: str) -> list[int] | None:
+        """Returns the result ids of a snapshot, or None if it has expired."""
+        row = (
+            self.connection()
+            .execute(
+                "SELECT ids FROM snapshot WHERE id = ? AND kind = ? AND expires_at >= ?",
+                (snapshot_id, kind, time.time()),
+            )
+            .fetchone()
+        )
+        return None if row is None else json.loads(row["ids"])
+
+    def save_lyrics(self, key: tuple[str, str], artist: str, song: str, text: str):
+        """Stores the lyrics of a song and indexes them for lyrics searches.
+
+        Args:
+            key (tuple[str, str]): normalized (artist, song) names
+            artist (str): artist name
+            song (str): song title
+            text (str): the lyrics
+        """
+        with self.connection() as conn:
+            seq = next_seq(conn)
+            row = conn.execute(
+                "INSERT INTO lyrics (artist, song, artist_name, song_name, text, "
+                "updated_at, seq) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (artist, song) DO UPDATE SET text = excluded.text, "
+                "updated_at = excluded.updated_at, seq = excluded.seq RETURNING id",
+                (*key, artist, song, text, time.time(), seq),
+            ).fetchone()
+        # Searches in this process find them right away, other workers on sync
+        self.index.lyrics.add(row["id"], text)
+
+    def get_lyrics(self, key: tuple[str, str]) -> str | None:
+        """Returns the stored lyrics of a song given its normalized names, or None."""
+        row = (
+            self.connection()
+            .execute("SELECT text FROM lyrics WHERE artist = ? AND song = ?", key)
+            .fetchone()
+        )
+        return None if row is None else row["text"]
+
+    def search_lyrics(self, query: str, limit: int) -> list[tuple[sqlite3.Row, float]]:
+        """Searches the stored lyrics, without going to lyrics.ovh.
+
+        Args:
+            query (str): words and double quoted phrases
+            limit (int): maximum number of songs
+
+        Returns:
+            list[tuple[sqlite3.Row, float]]: the lyrics rows of the best
+                matching songs with their score, best match first
+        """
+        self.index.sync(self)
+        ranked = self.index.lyrics.search(query, limit)
+        rows = self._select("lyrics", "id", [doc_id for doc_id, _ in ranked]) or []
+        return [(row, score) for row, (_, score) in zip(rows, ranked)]
+
+    def last_seq(self) -> int:
+        """Returns the number of the last write transaction."""
+        return self.connection().execute("SELECT value FROM sequence").fetchone()[0]
+
+    def rows_changed_since(self, table: str, seq: int) -> list[sqlite3.Row]:
+        """Returns the rows written by the transactions after number seq."""
+        return (
+            self.connection()
+            .execute(f"SELECT * FROM {table} WHERE seq > ?", (seq,))
+            .fetchall()
+        )
+
+    def search_local(self, kind: str, term: str, limit: int) -> list:
+        """Searches the names in the catalog, without going to iTunes.
+
+        Args:
+            kind (str): artists, albums or tracks
+            term (str): search terms
+            limit (int): maximum number of results
+
+        Returns:
+            list: the best matching artists (without albums), albums (without
+                tracks) or tracks
+        """
+        self.index.sync(self)
+        ids = getattr(self.index, kind).search(term, limit)
+        if kind == "artists":
+            results = self.get_artists(ids, with_albums=False)
+        elif kind == "albums":
+            results = self.get_albums(ids, with_tracks=False)
+        else:
+            results = self.get_tracks(ids)
+        return results or []
+
+    def _select(self, table: str, column: str, ids: list[int]) -> list | None:
+        # Rows for the given ids in the same order, or None if any is missing
+        if not ids:
+            return []
+        rows = (
+            self.connection()
+            .execute(
+                f"SELECT * FROM {table} WHERE {column} IN ({', '.join('?' * len(ids))})",
+                ids,
+            )
+            .fetchall()
+        )
+        by_id = {row[column]: row for row in rows}
+        if len(by_id) < len(set(ids)):
+            return None
+        return [by_id[x] for x in ids]
+
+
+# Catalog shared by the services, connections are opened on first use
+store = CatalogStore()
@@ -0,0 +1,66 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Maximum number of upstream calls a single fan-out may run at the same time
+MAX_CONCURRENCY = int(os.environ.get("ITUNES_CONCURRENCY", "8"))
+
+
+def in_context(fn: Callable[[T], R]) -> Callable[[T], R]:
+    # Pool threads run fn in a copy of the caller's context (like its upstream
+    # call priority), one copy per call as a context can't be entered twice
+    context = contextvars.copy_context()
+    return lambda item: context.copy().run(fn, item)
+
+
+def fan_out(
+    fn: Callable[[T], R], items: Iterable[T], max_workers: int | None = None
+) -> list[R]:
+    """Runs a blocking function over a list of items on a bounded thread pool.
+
+    Args:
+        fn (Callable[[T], R]): function to call for every item
+        items (Iterable[T]): items to process
+        max_workers (int | None): concurrency limit, defaults to MAX_CONCURRENCY
+
+    Returns:
+        list[R]: the results, in the same order as items
+    """
+    items = list(items)
+    workers = min(max_workers or MAX_CONCURRENCY, len(items))
+    # Not worth spinning up a pool for zero or one item
+    if workers <= 1:
+        return [fn(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fan-out") as pool:
+        return list(pool.map(in_context(fn), items))
+
+
+def fan_out_as_completed(
+    fn: Callable[[T], R], items: Iterable[T], max_workers: int | None = None
+) -> Iterator[tuple[T, R]]:
+    """Like fan_out, but yields (item, result) pairs as soon as each one is done.
+
+    Args:
+        fn (Callable[[T], R]): function to call for every item
+        items (Iterable[T]): items to process
+        max_workers (int | None): concurrency limit, defaults to MAX_CONCURRENCY
+
+    Returns:
+        Iterator[tuple[T, R]]: the items with their results, fastest first
+    """
+    items = list(items)
+    workers = min(max_workers or MAX_CONCURRENCY, len(items))
+    if workers <= 1:
+        for item in items:
+            yield item, fn(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fan-out") as pool:
+        futures = {pool.submit(in_context(fn), item): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
@@ -1,91 +1,209 @@
-import json
 import logging
-from dataclasses import asdict
-from model.artist import Artist
-from pathlib import Path
-from typing import Callable, List
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Generic, Hashable, TypeVar
+from service.memcache import MemoryCache
+from service.ratelimit import BACKGROUND, priority
+from service.singleflight import SingleFlight
+from service.tracing import span
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
 
-def get_artist_path(artist_name: str, limit: int) -> Path:
-    """Gets the path to a cache file for the given artist name and limit.
+# Stale results are refreshed by this many background threads, and at most
+# this many refreshes wait for them, the others are retried on a later hit
+REFRESH_WORKERS = int(os.environ.get("CACHE_REFRESH_WORKERS", "2"))
+REFRESH_MAX_PENDING = int(os.environ.get("CACHE_REFRESH_MAX_PENDING", "100"))
 
-    Args:
-        artist_name (str): artist name
-        limit (int): number of albums to cache
+# In-memory tier shared by every cached service function
+memory_cache = MemoryCache()
+# Counters of the persistent tier, the memory tier keeps its own
+store_stats = {"hits": 0, "misses": 0, "writes": 0, "expired": 0}
+# Counters of the stale results served and of their refreshes
+refresh_stats = {"stale": 0, "scheduled": 0, "refreshed": 0, "failed": 0}
+# Concurrent misses of the same key (in any worker) share one computation
+flight = SingleFlight()
 
-    Returns:
-        Path: file path for the albums cache file
-    """
-    return Path(f"./appcache/{artist_name.replace(' ', '-')}-{limit}.json".lower())
+refresher = ThreadPoolExecutor(REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+_pending: set[Hashable] = set()
+_pending_lock = threading.Lock()
+_refreshing: ContextVar[bool] = ContextVar("cache_refreshing", default=False)
+
+
+@dataclass(slots=True)
+class Stored(Generic[T]):
+    """A cached result with the time it was fetched from upstream."""
+
+    value: T
+    fetched_at: float
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
 
 
-def save_artist(artist: Artist):
-    """Utility function used to cache albums that have been downloaded.
+def refreshing() -> bool:
+    """True while a stale result is refreshed, when services should go upstream."""
+    return _refreshing.get()
+
+
+def refresh_in_background(
+    key: Hashable, refresh: Callable[[], object]
+) -> Future | None:
+    """Refreshes a cached result in a background thread.
+
+    Its upstream calls have BACKGROUND priority, behind interactive requests.
 
     Args:
-        artist_name (str): the artist name
-        albums (List[Album]): the list of albums to cache
-    """
+        key (Hashable): cache key of the result, a key is refreshed once at a time
+        refresh (Callable[[], object]): fetches and stores the result
 
-    n = len(artist.albums)
-    # don't cache if no albums are found
-    if n == 0:
-        return
-    # don't cache if albums with no tracks are found
-    albums_with_tracks = [
-        album for album in artist.albums if album.tracks and len(album.tracks) > 0
-    ]
-    if n != len(albums_with_tracks):
-        return
-
-    path = get_artist_path(artist.name, n)
-    if not path.parent.exists():
-        path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w") as file:
-        json.dump(
-            {
-                "id": artist.id,
-                "name": artist.name,
-                "albums": [asdict(album) for album in artist.albums],
-            },
-            file,
-            indent=2,
-        )
-    logger.info(f"Cached {n} {artist.name} albums")
-
-
-def cache_artist(fn: Callable[[str, int], Artist]) -> Callable[[str, int], Artist]:
-    """Decorator to cache the results of an Artist service.
+    Returns:
+        Future | None: the refresh, None if it is already pending or too
+            many refreshes are
+    """
+    with _pending_lock:
+        if key in _pending or len(_pending) >= REFRESH_MAX_PENDING:
+            return None
+        _pending.add(key)
+    refresh_stats["scheduled"] += 1
+
+    def run():
+        token = _refreshing.set(True)
+        try:
+            with priority(BACKGROUND):
+                refresh()
+            refresh_stats["refreshed"] += 1
+        except Exception as e:
+            refresh_stats["failed"] += 1
+            logger.error(f"Refreshing {key} failed: {e}")
+        finally:
+            _refreshing.reset(token)
+            with _pending_lock:
+                _pending.discard(key)
+
+    return refresher.submit(run)
+
+
+def cached(
+    namespace: str,
+    load: Callable[..., T | Stored[T] | None],
+    save: Callable[..., None],
+    cacheable: Callable[[T], bool] = bool,
+    ttl: float | None = None,
+    normalize: Callable[..., tuple] | None = None,
+    soft_ttl: float | None = None,
+    hard_ttl: float | None = None,
+) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator to cache the results of a service in memory and in a store.
+
+    Results are looked up in the in-memory tier first, then loaded from the
+    persistent store, and only then computed by the service function.
+    Concurrent misses of the same arguments share a single call to the
+    service function. Results older than `soft_ttl` are still served, and
+    refreshed in the background; only results older than `hard_ttl` are
+    computed again while the caller waits. Cached values are shared between
+    callers and must not be modified.
 
     Args:
-        fn (Callable[[str, int], Artist]): service function to cache.
+        namespace (str): kind of cached result, used in the memory cache key
+        load (Callable[..., T | Stored[T] | None]): reads a result from the
+            store given the service arguments, returns None if it is not
+            stored, or a Stored with the time it was fetched (a plain value
+            counts as just fetched)
+        save (Callable[..., None]): writes a result to the store, called with
+            the result followed by the service arguments
+        cacheable (Callable[[T], bool]): whether a result should be cached,
+            by default empty results (usually upstream failures) are not
+        ttl (float | None): seconds to keep results in memory
+        normalize (Callable[..., tuple] | None): maps the service arguments
+            to canonical ones, so equivalent queries share their entries
+        soft_ttl (float | None): age in seconds after which a result is
+            refreshed in the background, None to never refresh
+        hard_ttl (float | None): age in seconds after which a result is no
+            longer served, None to serve it forever
 
     Returns:
-        Callable[[str, int], Artist]: wrapped service function.
+        Callable: decorator for a service function.
     """
 
-    def wrapper(artist_name: str, limit: int) -> Artist:
-        path = get_artist_path(artist_name, limit)
-
-        # Check if the cached file exists
-        if path.exists():
-            with path.open("r") as file:
-                # Load from cache and return a cached Artist instance
-                data = json.load(file)
-                artist = Artist(**data)
-                logger.info(
-                    f"""Loaded {len(artist.albums)} {
-                            artist.name} albums from cache"""
-                )
-                return artist
-        else:
-            # Call the original function if no cache is found
-            artist = fn(artist_name, limit)
-            # Save the artist result to cache
-            save_artist(artist)
-            # Return the fetched Artist
-            return artist
-
-    return wrapper
+    def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+        def read(args: tuple, max_age: float | None) -> Stored[T] | None:
+            with span(f"cache.read.{namespace}"):
+                value = load(*args)
+            if value is None:
+                return None
+            stored = value if isinstance(value, Stored) else Stored(value, time.time())
+            if max_age is not None and stored.age() > max_age:
+                return None
+            return stored
+
+        def remember(key: tuple, stored: Stored[T]):
+            # Results leave the memory tier once they are too old to be served
+            expires = ttl
+            if hard_ttl is not None:
+                left = max(0.0, hard_ttl - stored.age())
+                expires = left if expires is None else min(expires, left)
+            memory_cache.set(key, stored, expires)
+
+        def fetch(key: tuple, args: tuple, max_age: float | None) -> T:
+            # Another worker may have stored a recent enough result while we waited
+            stored = read(args, max_age)
+            if stored is None:
+                value = fn(*args)
+                if not cacheable(value):
+                    return value
+                with span(f"cache.write.{namespace}"):
+                    save(value, *args)
+                store_stats["writes"] += 1
+                stored = Stored(value, time.time())
+            remember(key, stored)
+            return stored.value
+
+        @wraps(fn)
+        def wrapper(*args) -> T:
+            if normalize is not None:
+                args = normalize(*args)
+            key = (namespace, *args)
+
+            stored = memory_cache.get(key)
+            if stored is None:
+                stored = read(args, None)
+                if stored is not None and hard_ttl is not None:
+                    if stored.age() > hard_ttl:
+                        store_stats["expired"] += 1
+                        stored = None
+                if stored is not None:
+                    store_stats["hits"] += 1
+                    remember(key, stored)
+                    logger.info(f"Loaded {namespace} {args} from cache")
+
+            if stored is not None:
+                if soft_ttl is not None and stored.age() > soft_ttl:
+                    refresh_stats["stale"] += 1
+                    refresh_in_background(
+                        key,
+                        lambda: flight.do(key, lambda: fetch(key, args, soft_ttl)),
+                    )
+                return stored.value
+
+            store_stats["misses"] += 1
+            return flight.do(key, lambda: fetch(key, args, hard_ttl))
+
+        return wrapper
+
+    return decorator
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    """Returns the counters of both cache tiers and of the refreshes."""
+    return {
+        "memory": memory_cache.stats(),
+        "store": dict(store_stats),
+        "refresh": {**refresh_stats, "pending": len(_pending)},
+    }
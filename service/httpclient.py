@@ -0,0 +1,74 @@
+import logging
+import os
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a connection to be established / for response data
+CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+# Number of hosts to keep pools for, and keep-alive connections per host
+POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "16"))
+
+
+class HttpClient:
+    """Pooled keep-alive HTTP client shared by the upstream services.
+
+    Connections to each host are reused between calls, at most
+    `pool_maxsize` are opened per host (extra callers wait for a free one)
+    and every request gets a default connect/read timeout.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        read_timeout: float = READ_TIMEOUT,
+        pool_connections: int = POOL_CONNECTIONS,
+        pool_maxsize: int = POOL_MAXSIZE,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_client: HttpClient | None = None
+
+
+def open_client() -> HttpClient:
+    """Creates the shared client, called once at app startup."""
+    global _client
+    if _client is None:
+        _client = HttpClient()
+        logger.info(
+            f"Opened HTTP client (pool size {POOL_MAXSIZE}, timeouts {_client.timeout})"
+        )
+    return _client
+
+
+def get_client() -> HttpClient:
+    """Returns the shared client, opening it on first use outside of the app."""
+    return _client or open_client()
+
+
+def close_client():
+    """Closes the shared client and its pooled connections, called at shutdown."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+        logger.info("Closed HTTP client")
@@ -1,12 +1,54 @@
 import logging
+import os
+import time
 import requests
+from dataclasses import replace
+from typing import Callable, Iterator
 from model.artist import Artist
 from model.album import Album
 from model.track import Track
-from service.filecache import cache_artist
+from model.tracklist import TrackList
+from service import catalog, snapshot
+from service.batching import LookupBatcher
+from service.concurrency import fan_out_as_completed
+from service.filecache import Stored, cached, refresh_in_background, refreshing
+from service.httpclient import get_client
+from service.metrics import observe_upstream
+from service.tracing import span, traced
+from service.ratelimit import RateLimited, RateLimiter, parse_retry_after
 
 logger = logging.getLogger(__name__)
 
+# Base URL of the iTunes Search API, the benchmarks point it to a local stand-in
+ITUNES_URL = os.environ.get("ITUNES_URL", "https://itunes.apple.com")
+# Searches answered from the catalog need this many results (or the whole
+# limit), otherwise iTunes is searched
+LOCAL_SEARCH_MIN_RESULTS = int(os.environ.get("LOCAL_SEARCH_MIN_RESULTS", "10"))
+# Streamed albums are looked up in small batches, so the first ones arrive early
+STREAM_BATCH_SIZE = int(os.environ.get("ITUNES_STREAM_BATCH_SIZE", "5"))
+# Times a throttled call is retried once the rate limiter lets it through
+MAX_RETRIES = int(os.environ.get("ITUNES_MAX_RETRIES", "2"))
+THROTTLED_STATUSES = (403, 429)
+# Cached searches are refreshed in the background after a day, so new
+# releases show up, and no longer served after a month
+SEARCH_SOFT_TTL = float(os.environ.get("SEARCH_SOFT_TTL", str(24 * 3600)))
+SEARCH_HARD_TTL = float(os.environ.get("SEARCH_HARD_TTL", str(30 * 24 * 3600)))
+# Track lists of albums hardly ever change
+ALBUM_TRACKS_SOFT_TTL = float(
+    os.environ.get("ALBUM_TRACKS_SOFT_TTL", str(7 * 24 * 3600))
+)
+ALBUM_TRACKS_HARD_TTL = float(
+    os.environ.get("ALBUM_TRACKS_HARD_TTL", str(180 * 24 * 3600))
+)
+# Album lists of artists grow with new releases, like searches
+ARTIST_ALBUMS_SOFT_TTL = float(os.environ.get("ARTIST_ALBUMS_SOFT_TTL", str(24 * 3600)))
+ARTIST_ALBUMS_HARD_TTL = float(
+    os.environ.get("ARTIST_ALBUMS_HARD_TTL", str(30 * 24 * 3600))
+)
+
+# Every call to iTunes shares this budget
+limiter = RateLimiter()
+
 
 def map_artist(data) -> Artist:
     # Maps iTunes artists to Artist
@@ -47,19 +89,66 @@ def map_track(data) -> Track:
     )
 
 
+def itunes_get(url: str, params: dict, function: str) -> requests.Response:
+    """Calls iTunes within the shared rate limit.
+
+    Throttled (403/429) responses pause the rate limiter, for Retry-After
+    when iTunes sends it, and are retried.
+
+    Args:
+        url (str): iTunes endpoint
+        params (dict): query parameters
+        function (str): name of the calling function, for the metrics
+
+    Raises:
+        RateLimited: if the call can't be made within the rate limit
+
+    Returns:
+        requests.Response: the response
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        with span("itunes.rate_limit_wait"):
+            acquired = limiter.acquire()
+        if not acquired:
+            raise RateLimited(
+                "Too many iTunes requests queued", retry_after=limiter.retry_after()
+            )
+        started = time.perf_counter()
+        try:
+            res = get_client().get(url, params=params)
+        except requests.RequestException:
+            observe_upstream(function, "error", time.perf_counter() - started)
+            raise
+        observe_upstream(function, res.status_code, time.perf_counter() - started)
+        if res.status_code not in THROTTLED_STATUSES:
+            limiter.succeeded()
+            return res
+        retry_after = parse_retry_after(res.headers.get("Retry-After"))
+        logger.warning(
+            f"iTunes throttled attempt {attempt + 1}: {res.status_code}, "
+            f"retry after {retry_after}"
+        )
+        limiter.throttled(retry_after)
+    raise RateLimited(
+        f"Throttled by iTunes: {res.status_code}", retry_after=limiter.retry_after()
+    )
+
+
 # get artist by name
+@traced()
 def get_artists(artist_name: str, limit: int) -> list[Artist]:
     params: dict[str, str | int] = {
         "term": artist_name,
         "entity": "musicArtist",
         "limit": limit,
     }
-    res = requests.get("https://itunes.apple.com/search", params=params)
+    res = itunes_get(f"{ITUNES_URL}/search", params, "get_artists")
     if res.status_code == 200:
         data = res.json()
-        artists = data.get("results", [])
+        artists = [map_artist(x) for x in data.get("results", [])]
         logger.info(f"Loaded {len(artists)} artists from iTunes")
-        return [map_artist(x) for x in artists]
+        catalog.store.upsert_artists(artists)
+        return artists
 
     else:
         logger.error(
@@ -69,131 +158,445 @@ def get_artists(artist_name: str, limit: int) -> list[Artist]:
         return []
 
 
-# get artist by album
-def get_artist_by_album(album: Album) -> Artist:
-    params: dict[str, str | int] = {"id": album.artist_id, "entity": "musicArtist"}
-    res = requests.get("https://itunes.apple.com/lookup", params=params)
+# lookup several iTunes ids in a single request
+@traced()
+def lookup(ids: list[int], entity: str) -> list[dict]:
+    params: dict[str, str | int] = {
+        "id": ",".join(str(x) for x in ids),
+        "entity": entity,
+    }
+    res = itunes_get(f"{ITUNES_URL}/lookup", params, f"lookup_{entity}")
     if res.status_code == 200:
         data = res.json()
-        artists = data.get("results", [])[1:]
-        logger.info(
-            f"""Loaded {len(artists)} artists of {
-            album.artist_id} from iTunes"""
-        )
-        return Artist(
-            album.artist_id,
-            artists[0]["artistName"],
-            artists[0]["artistViewUrl"],
-        )
+        return data.get("results", [])
     else:
-        logger.error(
-            f"""get_artist_by_album failed on {
-            album.artist_id}: {res.status_code}"""
-        )
-        return Artist(
-            0,
-            "",
-        )
+        logger.error(f"lookup of {len(ids)} ids failed: {res.status_code}")
+        return []
+
+
+def group_by_parent(
+    results: list[dict], ids: list[int], wrapper_type: str, key: str
+) -> dict[int, list[dict]]:
+    # A multi-id lookup returns each requested entity followed by its children,
+    # split the flat results list back into one list of children per id
+    groups: dict[int, list[dict]] = {x: [] for x in ids}
+    parent = None
+    for x in results:
+        if x.get("wrapperType") == wrapper_type and x.get(key) in groups:
+            parent = x[key]
+        elif parent is not None:
+            groups[parent].append(x)
+    return groups
+
+
+def fetch_artists(artist_ids: list[int]) -> dict[int, Artist]:
+    results = lookup(artist_ids, "musicArtist")
+    artists = {
+        x["artistId"]: map_artist(x)
+        for x in results
+        if x.get("wrapperType") == "artist" and x.get("artistId") in artist_ids
+    }
+    logger.info(f"Loaded {len(artists)} artists of {len(artist_ids)} ids from iTunes")
+    catalog.store.upsert_artists(artists.values())
+    return artists
+
+
+def fetch_albums_by_artists(artist_ids: list[int]) -> dict[int, list[Album]]:
+    results = lookup(artist_ids, "album")
+    groups = group_by_parent(results, artist_ids, "artist", "artistId")
+    albums = {
+        artist_id: [map_album(x) for x in rows if x.get("wrapperType") == "collection"]
+        for artist_id, rows in groups.items()
+    }
+    logger.info(
+        f"Loaded {sum(map(len, albums.values()))} albums of {len(artist_ids)} artists from iTunes"
+    )
+    for artist_id, artist_albums in albums.items():
+        if artist_albums:
+            catalog.store.set_artist_albums(artist_id, artist_albums)
+    return albums
+
+
+def fetch_tracks_by_albums(album_ids: list[int]) -> dict[int, list[Track]]:
+    results = lookup(album_ids, "song")
+    parents = {
+        x["collectionId"]: map_album(x)
+        for x in results
+        if x.get("wrapperType") == "collection" and x.get("collectionId") in album_ids
+    }
+    groups = group_by_parent(results, album_ids, "collection", "collectionId")
+    tracks = {
+        album_id: [map_track(x) for x in rows if x.get("wrapperType") == "track"]
+        for album_id, rows in groups.items()
+    }
+    logger.info(
+        f"Loaded {sum(map(len, tracks.values()))} tracks of {len(album_ids)} albums from iTunes"
+    )
+    for album_id, album_tracks in tracks.items():
+        if album_id in parents and album_tracks:
+            catalog.store.set_album_tracks(parents[album_id], album_tracks)
+    return tracks
+
+
+# Batchers collect the ids requested by concurrent callers into one lookup
+artists_batcher = LookupBatcher(fetch_artists, lambda: None)
+albums_batcher = LookupBatcher(fetch_albums_by_artists, list)
+tracks_batcher = LookupBatcher(fetch_tracks_by_albums, list)
+
+
+# The snapshot mapped by every worker is read first, then the catalog for
+# what was fetched since it was built
+def read_artist(artist_id: int) -> Artist | None:
+    artist = snapshot.current.get_artist(artist_id)
+    return artist if artist is not None else catalog.store.get_artist(artist_id)
+
+
+def read_entry(
+    loaded_at: float | None,
+    from_snapshot: Callable[[], list | None],
+    from_catalog: Callable[[], list | None],
+) -> Stored | None:
+    # Album lists and track lists come from the snapshot unless the catalog
+    # fetched them again after it was built
+    if loaded_at is None or loaded_at <= snapshot.current.built_at:
+        value = from_snapshot()
+        if value is not None:
+            return Stored(value, loaded_at or snapshot.current.built_at)
+    if loaded_at is None:
+        return None
+    value = from_catalog()
+    return None if value is None else Stored(value, loaded_at)
+
+
+def read_fresh(
+    key: tuple,
+    entry: Stored | None,
+    soft_ttl: float,
+    hard_ttl: float,
+    refresh: Callable[[], object],
+):
+    # Serves a stored value until hard_ttl, refreshing it in the background
+    # once it is older than soft_ttl
+    if entry is None or entry.age() > hard_ttl:
+        return None
+    if entry.age() > soft_ttl:
+        refresh_in_background(key, refresh)
+    return entry.value
+
+
+def read_artist_albums_entry(artist_id: int) -> Stored[list[Album]] | None:
+    return read_entry(
+        catalog.store.loaded_at("artist", artist_id),
+        lambda: snapshot.current.get_artist_albums(artist_id),
+        lambda: catalog.store.get_artist_albums(artist_id),
+    )
+
+
+def read_album_tracks_entry(album_id: int) -> Stored[list[Track]] | None:
+    return read_entry(
+        catalog.store.loaded_at("album", album_id),
+        lambda: snapshot.current.get_album_tracks(album_id),
+        lambda: catalog.store.get_album_tracks(album_id),
+    )
+
+
+def read_artist_albums(artist_id: int) -> list[Album] | None:
+    return read_fresh(
+        ("artist-albums", artist_id),
+        read_artist_albums_entry(artist_id),
+        ARTIST_ALBUMS_SOFT_TTL,
+        ARTIST_ALBUMS_HARD_TTL,
+        lambda: albums_batcher.load(artist_id),
+    )
+
+
+def read_album_tracks(album_id: int) -> list[Track] | None:
+    return read_fresh(
+        ("album-tracks", album_id),
+        read_album_tracks_entry(album_id),
+        ALBUM_TRACKS_SOFT_TTL,
+        ALBUM_TRACKS_HARD_TTL,
+        lambda: tracks_batcher.load(album_id),
+    )
+
+
+def load_through_catalog(ids: list[int], read, batcher: LookupBatcher) -> list:
+    # Serves ids from the catalog and looks up the rest on iTunes in batches
+    found = {x: read(x) for x in ids}
+    missing = [x for x, value in found.items() if value is None]
+    if missing:
+        found.update(zip(missing, batcher.load_many(missing)))
+    return [found[x] for x in ids]
+
+
+# get artist by id
+def get_artist_by_id(artist_id: int) -> Artist:
+    artist = read_artist(int(artist_id))
+    if artist is None:
+        artist = artists_batcher.load(int(artist_id))
+    if artist is None:
+        logger.error(f"get_artist_by_id failed on {artist_id}")
+        return Artist(0, "")
+    return Artist(artist.id, artist.name)
+
+
+# get artist by album
+def get_artist_by_album(album: Album) -> Artist:
+    return get_artist_by_id(album.artist_id)
 
 
 # get artist by track
 def get_artist_by_track(track: Track) -> Artist:
-    params: dict[str, str | int] = {"id": track.artist_id, "entity": "musicArtist"}
-    res = requests.get("https://itunes.apple.com/lookup", params=params)
-    if res.status_code == 200:
-        data = res.json()
-        artists = data.get("results", [])[1:]
-        logger.info(
-            f"""Loaded {len(artists)} artists of {
-            track.artist_id} from iTunes"""
-        )
-        return Artist(
-            track.artist_id,
-            artists[0]["artistName"],
-            artists[0]["artistViewUrl"],
-        )
-    else:
-        logger.error(
-            f"""get_artist_by_track failed on {
-            track.artist_id}: {res.status_code}"""
-        )
-        return Artist(
-            0,
-            "",
-        )
+    return get_artist_by_id(track.artist_id)
 
 
 # get albums by name
+@traced()
 def get_albums(album_name: str, limit: int) -> list[Album]:
     params: dict[str, str | int] = {
         "term": album_name,
         "entity": "album",
         "limit": limit,
     }
-    res = requests.get("https://itunes.apple.com/search", params=params)
+    res = itunes_get(f"{ITUNES_URL}/search", params, "get_albums")
     if res.status_code == 200:
         data = res.json()
-        albums = data.get("results", [])
+        albums = [map_album(x) for x in data.get("results", [])]
         logger.info(f"Loaded {len(albums)} albums from iTunes")
-        return [map_album(x) for x in albums]
+        catalog.store.upsert_albums(albums)
+        return albums
     else:
         logger.error(f"get_album failed on {album_name}: {res.status_code}")
         return []
 
 
 # get albums by artist
+@traced()
 def get_albums_by_artist(artist: Artist) -> None:
-    params: dict[str, str | int] = {"id": artist.id, "entity": "album"}
-    res = requests.get("https://itunes.apple.com/lookup", params=params)
-    if res.status_code == 200:
-        data = res.json()
-        albums = data.get("results", [])[1:]
-        logger.info(f"Loaded {len(albums)} albums of {artist.name} from iTunes")
-        artist.albums = [map_album(x) for x in albums]
-    else:
-        logger.error(f"get_albums_by_artist failed on {artist.name}: {res.status_code}")
-        artist.albums = []
+    albums = read_artist_albums(artist.id)
+    if albums is None:
+        albums = albums_batcher.load(artist.id)
+    artist.albums = list(albums)
+
+
+# get albums for several artists, batched into as few lookups as possible
+@traced()
+def get_albums_by_artists(artists: list[Artist]) -> None:
+    albums = load_through_catalog(
+        [artist.id for artist in artists],
+        read_artist_albums,
+        albums_batcher,
+    )
+    for artist, artist_albums in zip(artists, albums):
+        artist.albums = list(artist_albums)
 
 
 # get tracks by name
+@traced()
 def get_tracks(track_name: str, limit: int) -> list[Track]:
     params: dict[str, str | int] = {
         "term": track_name,
         "entity": "song",
         "limit": limit,
     }
-    res = requests.get("https://itunes.apple.com/search", params=params)
+    res = itunes_get(f"{ITUNES_URL}/search", params, "get_tracks")
     if res.status_code == 200:
         data = res.json()
-        tracks = data.get("results", [])
+        tracks = [map_track(x) for x in data.get("results", [])]
         logger.info(f"Loaded {len(tracks)} tracks from iTunes")
-        return [map_track(x) for x in tracks]
+        catalog.store.upsert_tracks(tracks)
+        return tracks
     else:
         logger.error(f"get_tracks_by_name failed on {track_name}: {res.status_code}")
         return []
 
 
 # get tracks by album
+@traced()
 def get_tracks_by_album(album_id) -> list[Track]:
-    params: dict[str, str | int] = {"id": album_id, "entity": "song"}
-    res = requests.get("https://itunes.apple.com/lookup", params=params)
-    if res.status_code == 200:
-        data = res.json()
-        tracks = data.get("results", [])[1:]
-        logger.info(f"Loaded {len(tracks)} tracks of {album_id} from iTunes")
-        return [map_track(x) for x in tracks]
-    else:
-        logger.error(f"get_tracks_by_album failed on {album_id}: {res.status_code}")
+    try:
+        album_id = int(album_id)
+    except ValueError:
+        logger.error(f"get_tracks_by_album failed on {album_id}: invalid id")
         return []
+    # Refreshes skip the stored tracks
+    tracks = None if refreshing() else read_album_tracks(album_id)
+    if tracks is None:
+        tracks = tracks_batcher.load(album_id)
+    return list(tracks)
+
+
+# get tracks for several albums, batched into as few lookups as possible
+@traced()
+def get_tracks_by_albums(album_ids: list[int]) -> list[list[Track]]:
+    tracks = load_through_catalog(album_ids, read_album_tracks, tracks_batcher)
+    return [list(album_tracks) for album_tracks in tracks]
+
+
+# Searches remember their result ids in the catalog, the entities themselves
+# are stored there by the lookups above
+def load_search(kind: str, read: Callable[[list[int]], list | None]):
+    def load(term: str, limit: int) -> Stored | None:
+        entry = catalog.store.get_search_entry(kind, term, limit)
+        if entry is None:
+            return None
+        results = read(entry[0])
+        return None if results is None else Stored(results, entry[1])
+
+    return load
+
+
+def save_search(kind: str):
+    def save(results: list, term: str, limit: int):
+        catalog.store.save_search(kind, term, limit, [x.id for x in results])
+
+    return save
+
+
+def search_key(term: str, limit: int) -> tuple[str, int]:
+    # iTunes ignores case and extra spaces, so do the cached searches
+    return " ".join(term.casefold().split()), limit
+
+
+# Track lists stay in the memory tier as TrackList columns, a fraction of
+# the memory of the Track objects
+def load_album_tracks(album_id) -> Stored[TrackList] | None:
+    try:
+        album_id = int(album_id)
+    except ValueError:
+        return None
+    stored = read_album_tracks_entry(album_id)
+    if stored is None:
+        return None
+    return Stored(TrackList(stored.value), stored.fetched_at)
+
+
+def load_track_list(track_ids: list[int]) -> TrackList | None:
+    tracks = catalog.store.get_tracks(track_ids)
+    return None if tracks is None else TrackList(tracks)
+
+
+def search_local_first(kind: str, term: str, limit: int, fetch: Callable[[], list]):
+    # Answers a search from the catalog when it has enough matches, and
+    # falls back on them when iTunes fails. Refreshes always ask iTunes.
+    local = [] if refreshing() else catalog.store.search_local(kind, term, limit)
+    if len(local) >= min(limit, LOCAL_SEARCH_MIN_RESULTS):
+        logger.info(f"Found {len(local)} {kind} for {term} in the catalog")
+        return local
+    try:
+        results = fetch()
+    except RateLimited as e:
+        # Without catalog matches, callers answer 503 with Retry-After
+        if not local:
+            raise
+        logger.warning(f"Searching {kind} for {term} throttled: {e}")
+        results = []
+    except requests.RequestException as e:
+        logger.error(f"Searching {kind} for {term} failed: {e}")
+        results = []
+    return results or local
+
+
+# Artists and albums found by a search are cached without their albums and
+# tracks, these are only looked up for the results actually returned
+@cached(
+    "artists",
+    load_search("artists", lambda ids: catalog.store.get_artists(ids, False)),
+    save_search("artists"),
+    normalize=search_key,
+    soft_ttl=SEARCH_SOFT_TTL,
+    hard_ttl=SEARCH_HARD_TTL,
+)
+def find_artists(artist_name: str, limit: int) -> list[Artist]:
+    return search_local_first(
+        "artists", artist_name, limit, lambda: get_artists(artist_name, limit)
+    )
 
 
-# @cache_artist
-def search_artists(artist_name: str, limit: int) -> list[Artist]:
-    artist = get_artists(artist_name, limit)
-    for a in artist:
-        get_albums_by_artist(a)
+@cached(
+    "albums",
+    load_search("albums", lambda ids: catalog.store.get_albums(ids, False)),
+    save_search("albums"),
+    normalize=search_key,
+    soft_ttl=SEARCH_SOFT_TTL,
+    hard_ttl=SEARCH_HARD_TTL,
+)
+def find_albums(album_name: str, limit: int) -> list[Album]:
+    return search_local_first(
+        "albums", album_name, limit, lambda: get_albums(album_name, limit)
+    )
 
-    return artist
+
+@traced()
+def hydrate_artists(artists: list[Artist]) -> list[Artist]:
+    # Copies of the artists with their albums, the originals may be cached
+    copies = [replace(artist, albums=[]) for artist in artists]
+    get_albums_by_artists(copies)
+    return copies
+
+
+@traced()
+def hydrate_albums(albums: list[Album]) -> list[Album]:
+    # Copies of the albums with their tracks, the originals may be cached
+    tracks = get_tracks_by_albums([album.id for album in albums])
+    return [
+        replace(album, tracks=album_tracks)
+        for album, album_tracks in zip(albums, tracks)
+    ]
+
+
+def stream_hydrated_albums(albums: list[Album]) -> Iterator[Album]:
+    """Yields copies of the albums with their tracks, as soon as each is loaded.
+
+    Albums whose tracks are in the catalog come first, in order. The others
+    are looked up in small concurrent batches and yielded as they complete.
+
+    Args:
+        albums (list[Album]): albums to hydrate
+
+    Returns:
+        Iterator[Album]: the albums with their tracks
+    """
+    missing = []
+    for album in albums:
+        tracks = read_album_tracks(album.id)
+        if tracks is None:
+            missing.append(album)
+        else:
+            yield replace(album, tracks=tracks)
+
+    batches = [
+        missing[i : i + STREAM_BATCH_SIZE]
+        for i in range(0, len(missing), STREAM_BATCH_SIZE)
+    ]
+    for batch, tracks in fan_out_as_completed(
+        lambda batch: tracks_batcher.load_many([album.id for album in batch]),
+        batches,
+    ):
+        for album, album_tracks in zip(batch, tracks):
+            yield replace(album, tracks=album_tracks)
+
+
+# Load the artists, albums or tracks of a paginated result set by id
+def load_artists(artist_ids: list[int]) -> list[Artist] | None:
+    artists = catalog.store.get_artists(artist_ids, False)
+    return None if artists is None else hydrate_artists(artists)
+
+
+def load_albums(album_ids: list[int]) -> list[Album] | None:
+    albums = snapshot.current.get_albums(album_ids)
+    if albums is None:
+        albums = catalog.store.get_albums(album_ids, False)
+    return None if albums is None else hydrate_albums(albums)
+
+
+def load_tracks(track_ids: list[int]) -> list[Track] | None:
+    tracks = snapshot.current.get_tracks(track_ids)
+    return tracks if tracks is not None else catalog.store.get_tracks(track_ids)
+
+
+def search_artists(artist_name: str, limit: int) -> list[Artist]:
+    return hydrate_artists(find_artists(artist_name, limit))
 
 
 def search_artist_by_album(album: Album) -> Artist:
@@ -203,22 +606,38 @@ def search_artist_by_album(album: Album) -> Artist:
 
 def search_artist_by_track(track: Track) -> Artist:
     artist = get_artist_by_track(track)
-    for album in artist.albums:
-        get_tracks_by_album(album)
+    tracks = get_tracks_by_albums([album.id for album in artist.albums])
+    for album, album_tracks in zip(artist.albums, tracks):
+        album.tracks = album_tracks
     return artist
 
 
 def search_albums(album_name: str, limit: int) -> list[Album]:
-    albums = get_albums(album_name, limit)
-    for album in albums:
-        album.tracks = get_tracks_by_album(album.id)
-    return albums
-
-
-def search_tracks(track_name: str, limit: int) -> list[Track]:
-    return get_tracks(track_name, limit)
+    return hydrate_albums(find_albums(album_name, limit))
+
+
+@cached(
+    "tracks",
+    load_search("tracks", load_track_list),
+    save_search("tracks"),
+    normalize=search_key,
+    soft_ttl=SEARCH_SOFT_TTL,
+    hard_ttl=SEARCH_HARD_TTL,
+)
+def search_tracks(track_name: str, limit: int) -> TrackList:
+    return TrackList(
+        search_local_first(
+            "tracks", track_name, limit, lambda: get_tracks(track_name, limit)
+        )
+    )
 
 
-def search_tracks_by_album(album_id: str) -> list[Track]:
-    tracks = get_tracks_by_album(album_id)
-    return tracks
+@cached(
+    "album-tracks",
+    load_album_tracks,
+    lambda tracks, album_id: None,
+    soft_ttl=ALBUM_TRACKS_SOFT_TTL,
+    hard_ttl=ALBUM_TRACKS_HARD_TTL,
+)
+def search_tracks_by_album(album_id: str) -> TrackList:
+    return TrackList(get_tracks_by_album(album_id))
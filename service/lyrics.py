@@ -1,51 +1,129 @@
+import os
+import time
 import requests
 import logging
-from fastapi import APIRouter, HTTPException, responses, Request
-from fastapi.templating import Jinja2Templates
+from service import catalog
+from service.httpclient import get_client
+from service.memcache import MemoryCache
+from service.metrics import observe_upstream
+from service.searchindex import parse_query, tokenize
+from service.tracing import span, traced
 import urllib.parse
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
-# Configure FastAPI router and Jinja2Templates
-router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+# Seconds to keep fetched lyrics, and the shorter time to remember
+# that lyrics.ovh has no lyrics for a song
+LYRICS_TTL = float(os.environ.get("LYRICS_TTL", "86400"))
+LYRICS_MISS_TTL = float(os.environ.get("LYRICS_MISS_TTL", "600"))
 
+# Base URL of the lyrics.ovh API, the benchmarks point it to a local stand-in
+LYRICS_URL = os.environ.get("LYRICS_URL", "https://api.lyrics.ovh/v1")
 
-# API route to fetch and display lyrics for a song
-@router.get("/lyrics/{artist}/{song}", response_class=responses.HTMLResponse)
-async def get_lyrics(request: Request, artist: str, song: str):
-    try:
-        # Encode artist and song names to handle special characters
-        artist_encoded = urllib.parse.quote(artist)
-        song_encoded = urllib.parse.quote(song)
+# (found, lyrics) pairs keyed by normalized (artist, song)
+lyrics_cache = MemoryCache(ttl=LYRICS_TTL)
+
+
+def lyrics_key(artist: str, song: str) -> tuple[str, str]:
+    # Case and whitespace don't change the song
+    return (" ".join(artist.lower().split()), " ".join(song.lower().split()))
 
-        # Fetch lyrics using lyrics.ovh API
-        response = requests.get(
-            f"https://api.lyrics.ovh/v1/{artist_encoded}/{song_encoded}"
-        )
-        response.raise_for_status()  # Raise an error if the request failed
-        data = response.json()
-        lyrics = data.get("lyrics", "Lyrics not found for this song.")
 
-        logging.info(f"Lyrics fetched for artist: {artist}, song: {song}")
+def snippet(text: str, query: str) -> str:
+    # First line of the lyrics with the first phrase of the query, or with
+    # any of its words
+    phrases = parse_query(query)
+    words = {token for phrase in phrases for token in phrase}
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for line in lines:
+        tokens = tokenize(line)
+        n = len(phrases[0])
+        if any(tokens[i : i + n] == phrases[0] for i in range(len(tokens))):
+            return line
+    for line in lines:
+        if words.intersection(tokenize(line)):
+            return line
+    return lines[0] if lines else ""
 
-        # Render lyrics in a simple HTML template
-        return templates.TemplateResponse(
-            "lyrics.html",
+
+def search_lyrics(query: str, limit: int) -> list[dict]:
+    """Searches the lyrics fetched so far, without calling lyrics.ovh.
+
+    Args:
+        query (str): words and double quoted phrases
+        limit (int): maximum number of songs
+
+    Returns:
+        list[dict]: the best matching songs, with the line that matched and
+            the routes of their lyrics and of the tracks with their title
+    """
+    results = []
+    for row, score in catalog.store.search_lyrics(query, limit):
+        artist, song = row["artist_name"], row["song_name"]
+        results.append(
             {
-                "request": request,
                 "artist": artist,
                 "song": song,
-                "lyrics": lyrics.replace(
-                    "\n", "<br>"
-                ),  # Replace newlines with HTML line breaks
-            },
+                "score": round(score, 3),
+                "snippet": snippet(row["text"], query),
+                "lyrics_url": f"/lyrics/{urllib.parse.quote(artist)}/"
+                f"{urllib.parse.quote(song)}",
+                "tracks_url": f"/tracks/{urllib.parse.quote(song)}",
+            }
         )
+    return results
+
+
+@traced()
+def fetch_lyrics(artist: str, song: str) -> str | None:
+    """Fetches the lyrics of a song from lyrics.ovh, using the lyrics cache.
+
+    This is a blocking call, run it in a thread pool from async code.
+
+    Args:
+        artist (str): artist name
+        song (str): song title
+
+    Returns:
+        str | None: the lyrics, or None if lyrics.ovh has none for the song
+    """
+    key = lyrics_key(artist, song)
+    if (cached := lyrics_cache.get(key)) is not None:
+        found, lyrics = cached
+        return lyrics if found else None
+    # Lyrics fetched before, possibly by another worker
+    with span("cache.read.lyrics"):
+        lyrics = catalog.store.get_lyrics(key)
+    if lyrics is not None:
+        lyrics_cache.set(key, (True, lyrics))
+        return lyrics
+
+    # Encode artist and song names to handle special characters
+    artist_encoded = urllib.parse.quote(artist)
+    song_encoded = urllib.parse.quote(song)
+
+    # Fetch lyrics using lyrics.ovh API
+    started = time.perf_counter()
+    try:
+        response = get_client().get(f"{LYRICS_URL}/{artist_encoded}/{song_encoded}")
+    except requests.RequestException:
+        observe_upstream("fetch_lyrics", "error", time.perf_counter() - started)
+        raise
+    observe_upstream(
+        "fetch_lyrics", response.status_code, time.perf_counter() - started
+    )
+    if response.status_code == 404:
+        logging.info(f"No lyrics found for artist: {artist}, song: {song}")
+        lyrics_cache.set(key, (False, None), LYRICS_MISS_TTL)
+        return None
+    response.raise_for_status()  # Raise an error if the request failed
+    data = response.json()
+    lyrics = data.get("lyrics", "Lyrics not found for this song.")
 
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error fetching lyrics: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch lyrics.")
-    except Exception as e:
-        logging.error(f"Unexpected error: {e}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred.")
+    logging.info(f"Lyrics fetched for artist: {artist}, song: {song}")
+    if "lyrics" in data:
+        with span("cache.write.lyrics"):
+            catalog.store.save_lyrics(key, artist, song, lyrics)
+    lyrics_cache.set(key, (True, lyrics))
+    return lyrics
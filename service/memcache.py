@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+from typing import Any, Hashable
+
+# Default limits of the in-memory cache tier
+MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "1024"))
+MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TTL = float(os.environ.get("CACHE_TTL", "3600"))
+
+
+def sizeof(obj: Any) -> int:
+    """Estimates the memory used by a value, following lists, dicts and dataclasses.
+
+    Args:
+        obj (Any): value to measure
+
+    Returns:
+        int: approximate size in bytes
+    """
+    size = sys.getsizeof(obj)
+    if is_dataclass(obj):
+        size += sum(sizeof(getattr(obj, f.name)) for f in fields(obj))
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(sizeof(x) for x in obj)
+    elif isinstance(obj, dict):
+        size += sum(sizeof(k) + sizeof(v) for k, v in obj.items())
+    return size
+
+
+class MemoryCache:
+    """Thread safe in-memory cache with LRU eviction and per-entry TTL.
+
+    The cache holds at most `max_entries` values and `max_bytes` of
+    (estimated) memory, the least recently used entries are evicted first.
+    Values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        max_bytes: int = MAX_BYTES,
+        ttl: float = TTL,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, size, expires_at), ordered from least to most recently used
+        self._entries: OrderedDict[Hashable, tuple[Any, int, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        """Returns the cached value for key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """Caches a value, evicting least recently used entries to make room.
+
+        Args:
+            key (Hashable): cache key
+            value (Any): value to cache
+            ttl (float | None): seconds to keep the value, defaults to the cache TTL
+        """
+        size = sizeof(value)
+        # A value larger than the whole cache would evict everything else
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """Returns the hit/miss/eviction counters and current usage."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key: Hashable):
+        # Must be called with the lock held
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
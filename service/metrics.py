@@ -0,0 +1,196 @@
+import threading
+from typing import Callable, Iterable, TypeVar
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# A sample: metric name suffix, label values and value
+Sample = tuple[str, dict[str, str], float]
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """A named metric with labels, rendered in the Prometheus text format."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self) -> list[Sample]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{format_labels(labels)} {format_value(value)}"
+            )
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> list[Sample]:
+        with self._lock:
+            return [
+                ("", dict(zip(self.labelnames, labels)), value)
+                for labels, value in sorted(self._values.items())
+            ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+        # labels -> (count per bucket, sum, count)
+        self._values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, *labels: str, value: float):
+        with self._lock:
+            counts, total, n = self._values.get(
+                labels, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[labels] = (counts, total + value, n + 1)
+
+    def samples(self) -> list[Sample]:
+        samples: list[Sample] = []
+        with self._lock:
+            for labels, (counts, total, n) in sorted(self._values.items()):
+                named = dict(zip(self.labelnames, labels))
+                for bound, count in zip(self.buckets, counts):
+                    samples.append(("_bucket", {**named, "le": repr(bound)}, count))
+                samples.append(("_bucket", {**named, "le": "+Inf"}, n))
+                samples.append(("_sum", named, total))
+                samples.append(("_count", named, n))
+        return samples
+
+
+class CallbackMetric(Metric):
+    """A gauge (or counter kept elsewhere) read from a callback when rendered."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        read: Callable[[], Iterable[tuple[dict[str, str], float]]],
+        type: str = "gauge",
+    ):
+        super().__init__(name, help)
+        self.read = read
+        self.type = type
+
+    def samples(self) -> list[Sample]:
+        return [("", labels, value) for labels, value in self.read()]
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class Registry:
+    """The metrics exposed by the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        # Registering a name again replaces the metric, like on module reloads
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests served, by route template, method and status",
+        ("route", "method", "status"),
+    )
+)
+http_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time to the start of the response, by route template",
+        ("route",),
+    )
+)
+upstream_calls = registry.register(
+    Counter(
+        "upstream_calls_total",
+        "Calls to iTunes and lyrics.ovh, by calling function",
+        ("function",),
+    )
+)
+upstream_errors = registry.register(
+    Counter(
+        "upstream_errors_total",
+        "Upstream calls that did not return 200, by function and status "
+        "(error when no response was received)",
+        ("function", "status"),
+    )
+)
+upstream_duration = registry.register(
+    Histogram(
+        "upstream_call_duration_seconds",
+        "Latency of the upstream calls, by calling function",
+        ("function",),
+    )
+)
+
+
+def observe_upstream(function: str, status: int | str, seconds: float):
+    """Records an upstream call.
+
+    Args:
+        function (str): name of the calling function
+        status (int | str): HTTP status, or "error" if the call failed
+        seconds (float): duration of the call
+    """
+    upstream_calls.inc(function)
+    upstream_duration.observe(function, value=seconds)
+    if status != 200:
+        upstream_errors.inc(function, str(status))
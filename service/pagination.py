@@ -0,0 +1,114 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+from typing import Any, Callable
+from service import catalog
+
+logger = logging.getLogger(__name__)
+
+# Seconds a paginated result set stays available to its cursors
+SNAPSHOT_TTL = float(os.environ.get("SNAPSHOT_TTL", "900"))
+
+
+def snapshot_id_of(kind: str, ids: list[int]) -> str:
+    # The same result set always gets the same snapshot, so rebuilt pages
+    # have the same cursors and ETags
+    digest = hashlib.sha256(f"{kind}:{','.join(map(str, ids))}".encode()).digest()
+    return base64.urlsafe_b64encode(digest[:12]).decode()
+
+
+def encode_cursor(snapshot_id: str, page: int) -> str:
+    return base64.urlsafe_b64encode(f"{snapshot_id}:{page}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, int] | None:
+    try:
+        snapshot_id, page = base64.urlsafe_b64decode(cursor).decode().split(":")
+        page = int(page)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    # Pages start at 1, anything else would slice from the end of the snapshot
+    return (snapshot_id, page) if page >= 1 else None
+
+
+def pagination_info(
+    snapshot_id: str, total_count: int, page: int, page_size: int
+) -> dict[str, Any]:
+    total_pages = -(-total_count // page_size)
+    return {
+        "total": total_count,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": total_pages,
+        "next_cursor": (
+            encode_cursor(snapshot_id, page + 1) if page < total_pages else None
+        ),
+        "prev_cursor": encode_cursor(snapshot_id, page - 1) if page > 1 else None,
+    }
+
+
+def paginate(
+    kind: str, results: list[Any], page: int, page_size: int
+) -> tuple[list[Any], dict[str, Any]]:
+    """Snapshots an ordered result set and returns one page of it.
+
+    The pagination info carries opaque next/prev cursors which serve the
+    other pages of the same result set from the snapshot.
+
+    Args:
+        kind (str): artists, albums or tracks
+        results (list[Any]): the complete ordered result set
+        page (int): page number, starting at 1
+        page_size (int): number of results per page
+
+    Returns:
+        tuple[list[Any], dict[str, Any]]: the page and its pagination info
+    """
+    ids = [x.id for x in results]
+    snapshot_id = snapshot_id_of(kind, ids)
+    # Saving it again keeps an existing snapshot alive for its cursors
+    catalog.store.save_snapshot(snapshot_id, kind, ids, SNAPSHOT_TTL)
+
+    start_idx = (page - 1) * page_size
+    end_idx = start_idx + page_size
+    return results[start_idx:end_idx], pagination_info(
+        snapshot_id, len(results), page, page_size
+    )
+
+
+def paginate_cursor(
+    kind: str,
+    cursor: str,
+    page_size: int,
+    load: Callable[[list[int]], list[Any] | None],
+) -> tuple[list[Any], dict[str, Any]] | None:
+    """Serves a page from the snapshot a cursor points to.
+
+    Args:
+        kind (str): artists, albums or tracks
+        cursor (str): cursor returned with a previous page
+        page_size (int): number of results per page
+        load (Callable): loads the results of a page by id, returns None if
+            any of them is not available
+
+    Returns:
+        tuple | None: the page and its pagination info, or None if the cursor
+            is invalid or its snapshot has expired
+    """
+    decoded = decode_cursor(cursor)
+    if decoded is None:
+        return None
+    snapshot_id, page = decoded
+    ids = catalog.store.get_snapshot(snapshot_id, kind)
+    if ids is None:
+        logger.info(f"Snapshot {snapshot_id} of {kind} has expired")
+        return None
+
+    start_idx = (page - 1) * page_size
+    end_idx = start_idx + page_size
+    items = load(ids[start_idx:end_idx])
+    if items is None:
+        return None
+    return items, pagination_info(snapshot_id, len(ids), page, page_size)
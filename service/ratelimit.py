@@ -0,0 +1,220 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Iterator
+import requests
+
+# iTunes throttles beyond roughly 20 requests per minute per IP, 0 disables the
+# limit. The budget is per process: N workers make up to N times this rate.
+RATE_PER_MINUTE = float(os.environ.get("ITUNES_RATE_PER_MINUTE", "20"))
+BURST = int(os.environ.get("ITUNES_BURST", "5"))
+# Seconds an interactive call waits for its turn before giving up,
+# background work waits as long as it takes
+MAX_WAIT = float(os.environ.get("ITUNES_MAX_WAIT", "10"))
+# Pause after a throttled response without Retry-After, doubled every time
+BASE_BACKOFF = float(os.environ.get("ITUNES_BASE_BACKOFF", "5"))
+MAX_BACKOFF = 300.0
+
+# Priorities of upstream calls, lower goes first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_priority: ContextVar[int] = ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+def current_priority() -> int:
+    """Returns the priority of the upstream calls made by the current context."""
+    return _priority.get()
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Runs the upstream calls of a block with the given priority.
+
+    Background work (prefetch, warm-up, refresh) runs with BACKGROUND so
+    the calls of interactive requests preempt it.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RateLimited(requests.RequestException):
+    """Raised when an upstream call can't be made within the rate limit."""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Token bucket shared by the upstream calls, served in priority order.
+
+    The bucket holds up to `burst` tokens and refills at `rate_per_minute`.
+    It lives in the process, so every worker process has its own budget.
+    Callers queue for a token by priority, then arrival order. A throttled
+    response pauses the bucket (for Retry-After, or an exponential backoff)
+    and halves the rate, which recovers gradually with successful calls.
+    """
+
+    def __init__(self, rate_per_minute: float = RATE_PER_MINUTE, burst: int = BURST):
+        self.max_rate = rate_per_minute / 60
+        self.rate = self.max_rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff = 0.0
+        # (priority, arrival) of the waiting callers, the first one is served next
+        self._queue: list[tuple[int, int]] = []
+        self._arrivals = itertools.count()
+        self._cond = threading.Condition()
+        self.acquired = dict.fromkeys(PRIORITY_NAMES, 0)
+        self.timeouts = dict.fromkeys(PRIORITY_NAMES, 0)
+        self.wait_seconds = dict.fromkeys(PRIORITY_NAMES, 0.0)
+        self.max_wait_seconds = dict.fromkeys(PRIORITY_NAMES, 0.0)
+        self.throttled_count = 0
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """Waits for a token, behind the callers of higher priority.
+
+        Args:
+            timeout (float | None): seconds to wait, defaults to MAX_WAIT for
+                interactive calls and no limit for background calls
+
+        Returns:
+            bool: False if no token was available in time
+        """
+        level = current_priority()
+        # A rate of 0 disables the limit
+        if self.max_rate <= 0:
+            return True
+        if timeout is None:
+            timeout = MAX_WAIT if level == INTERACTIVE else float("inf")
+        started = time.monotonic()
+        deadline = started + timeout
+        entry = (level, next(self._arrivals))
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    # Don't wait out a pause that outlasts the deadline
+                    if self._paused_until > deadline:
+                        self.timeouts[level] += 1
+                        return False
+                    # Only the first caller in the queue may take a token
+                    ready_at = deadline
+                    if self._queue[0] == entry:
+                        ready_at = max(now, self._paused_until)
+                        if self._tokens < 1:
+                            ready_at = max(
+                                ready_at, now + (1 - self._tokens) / self.rate
+                            )
+                        if ready_at <= now:
+                            self._tokens -= 1
+                            self._record(level, now - started)
+                            return True
+                    if now >= deadline:
+                        self.timeouts[level] += 1
+                        return False
+                    wait = min(ready_at, deadline) - now
+                    self._cond.wait(None if wait == float("inf") else wait)
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def throttled(self, retry_after: float | None = None):
+        """Pauses the bucket and slows down after a 403/429 response.
+
+        Args:
+            retry_after (float | None): seconds from the Retry-After header
+        """
+        with self._cond:
+            if retry_after is None:
+                self._backoff = min(MAX_BACKOFF, max(BASE_BACKOFF, self._backoff * 2))
+                retry_after = self._backoff
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + retry_after)
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self._tokens = 0.0
+            self._updated_at = now
+            self.throttled_count += 1
+
+    def succeeded(self):
+        """Recovers the rate after a call that was not throttled."""
+        with self._cond:
+            self._backoff = 0.0
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+    def retry_after(self) -> float:
+        """Seconds until the next token is expected to be available."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            paused_for = max(self._paused_until - now, 0.0)
+            if self.max_rate <= 0:
+                return paused_for
+            queued = len(self._queue) + max(0.0, 1 - self._tokens)
+            return paused_for + queued / self.rate
+
+    def stats(self) -> dict:
+        """Returns the queue depth, wait times and throttling counters."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "rate_per_minute": round(self.rate * 60, 2),
+                "tokens": round(self._tokens, 2),
+                "paused_for": round(max(0.0, self._paused_until - now), 2),
+                "throttled": self.throttled_count,
+                "queues": {
+                    name: {
+                        "depth": sum(1 for p, _ in self._queue if p == level),
+                        "acquired": self.acquired[level],
+                        "timeouts": self.timeouts[level],
+                        "avg_wait": round(
+                            self.wait_seconds[level] / (self.acquired[level] or 1), 3
+                        ),
+                        "max_wait": round(self.max_wait_seconds[level], 3),
+                    }
+                    for level, name in PRIORITY_NAMES.items()
+                },
+            }
+
+    def _refill(self, now: float):
+        # Must be called with the lock held, no tokens are added while paused
+        since = max(self._updated_at, self._paused_until)
+        if now > since:
+            self._tokens = min(self.burst, self._tokens + (now - since) * self.rate)
+        self._updated_at = now
+
+    def _record(self, level: int, waited: float):
+        # Must be called with the lock held
+        self.acquired[level] += 1
+        self.wait_seconds[level] += waited
+        self.max_wait_seconds[level] = max(self.max_wait_seconds[level], waited)
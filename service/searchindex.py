@@ -0,0 +1,312 @@
+import bisect
+import math
+import re
+import threading
+import time
+import unicodedata
+from typing import Iterable
+
+# Scores of a query token matching a name token exactly, as a prefix, or
+# with one typo. Tokens of the main name weigh more than secondary fields.
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+FUZZY_SCORE = 1.0
+# Shorter tokens are not typo-corrected, too many words are one edit apart
+FUZZY_MIN_LENGTH = 4
+# BM25 parameters of the lyrics ranking, and the boost of each adjacent
+# occurrence of the query words in lyrics
+BM25_K1 = 1.2
+BM25_B = 0.75
+PHRASE_BOOST = 2.0
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits text into lowercase ASCII words, dropping accents."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def parse_query(query: str) -> list[list[str]]:
+    """Splits a query into phrases, the words between double quotes make one
+    phrase, every other word is a phrase of its own."""
+    phrases = []
+    for i, part in enumerate(query.split('"')):
+        # Odd parts are quoted
+        if i % 2:
+            phrases.append(tokenize(part))
+        else:
+            phrases.extend([token] for token in tokenize(part))
+    return [phrase for phrase in phrases if phrase]
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    # True if b is a insertion, deletion or substitution away from a
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1 :] == b[i + 1 :]
+    return a[i:] == b[i + 1 :]
+
+
+class SearchIndex:
+    """In-memory inverted index of names, with prefix and typo tolerant matching.
+
+    Documents are added with one or more weighted text fields. A search
+    returns the ids of documents matching every query token, the last one
+    also as a prefix, ranked by the sum of their match scores.
+    """
+
+    def __init__(self):
+        # token -> {doc id -> field weight}
+        self._postings: dict[str, dict[int, float]] = {}
+        # sorted distinct tokens, for prefix lookups
+        self._tokens: list[str] = []
+        # doc id -> its tokens, to update documents
+        self._docs: dict[int, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: int, fields: Iterable[tuple[str, float]]):
+        """Indexes (or re-indexes) a document.
+
+        Args:
+            doc_id (int): id of the artist, album or track
+            fields (Iterable[tuple[str, float]]): (text, weight) pairs
+        """
+        weights: dict[str, float] = {}
+        for text, weight in fields:
+            for token in tokenize(text):
+                weights[token] = max(weights.get(token, 0), weight)
+
+        with self._lock:
+            for token in self._docs.pop(doc_id, set()):
+                self._postings[token].pop(doc_id, None)
+            for token, weight in weights.items():
+                if token not in self._postings:
+                    self._postings[token] = {}
+                    bisect.insort(self._tokens, token)
+                self._postings[token][doc_id] = weight
+            self._docs[doc_id] = set(weights)
+
+    def search(self, query: str, limit: int) -> list[int]:
+        """Returns the ids of the best matching documents.
+
+        Args:
+            query (str): search terms
+            limit (int): maximum number of ids
+
+        Returns:
+            list[int]: document ids, best match first
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            scores: dict[int, float] | None = None
+            for i, token in enumerate(tokens):
+                matches = self._match(token, prefix=i == len(tokens) - 1)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {
+                        d: scores[d] + s for d, s in matches.items() if d in scores
+                    }
+                if not scores:
+                    return []
+            # Best score first, then the documents with the fewest extra words
+            ranked = sorted(scores, key=lambda d: (-scores[d], len(self._docs[d]), d))
+        return ranked[:limit]
+
+    def _match(self, token: str, prefix: bool) -> dict[int, float]:
+        # Must be called with the lock held
+        matches = {d: w * EXACT_SCORE for d, w in self._postings.get(token, {}).items()}
+        if prefix:
+            i = bisect.bisect_right(self._tokens, token)
+            while i < len(self._tokens) and self._tokens[i].startswith(token):
+                for d, w in self._postings[self._tokens[i]].items():
+                    matches[d] = max(matches.get(d, 0), w * PREFIX_SCORE)
+                i += 1
+        # Only fall back to typo tolerant matching when nothing else matched
+        if not matches and len(token) >= FUZZY_MIN_LENGTH:
+            for candidate in self._tokens:
+                if within_one_edit(token, candidate):
+                    for d, w in self._postings[candidate].items():
+                        matches[d] = max(matches.get(d, 0), w * FUZZY_SCORE)
+        return matches
+
+
+class LyricsIndex:
+    """In-memory inverted index of song lyrics, with word positions.
+
+    A search returns the documents containing every query word, and every
+    quoted phrase as consecutive words, ranked by BM25 plus a boost for
+    each occurrence of the query words next to each other.
+    """
+
+    def __init__(self):
+        # token -> {doc id -> positions of the token in the lyrics}
+        self._postings: dict[str, dict[int, list[int]]] = {}
+        # doc id -> its distinct tokens, to update documents
+        self._docs: dict[int, list[str]] = {}
+        # doc id -> number of tokens, to normalize scores
+        self._lengths: dict[int, int] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, doc_id: int, text: str):
+        """Indexes (or re-indexes) the lyrics of a song.
+
+        Args:
+            doc_id (int): id of the lyrics in the catalog
+            text (str): the lyrics
+        """
+        tokens = tokenize(text)
+        positions: dict[str, list[int]] = {}
+        for i, token in enumerate(tokens):
+            positions.setdefault(token, []).append(i)
+
+        with self._lock:
+            if doc_id in self._lengths:
+                self._remove(doc_id)
+            for token, found in positions.items():
+                self._postings.setdefault(token, {})[doc_id] = found
+            self._docs[doc_id] = list(positions)
+            self._lengths[doc_id] = len(tokens)
+            self._total_length += len(tokens)
+
+    def search(self, query: str, limit: int) -> list[tuple[int, float]]:
+        """Returns the best matching documents.
+
+        Args:
+            query (str): words and double quoted phrases
+            limit (int): maximum number of documents
+
+        Returns:
+            list[tuple[int, float]]: (doc id, score) pairs, best match first
+        """
+        phrases = parse_query(query)
+        words = list(dict.fromkeys(token for phrase in phrases for token in phrase))
+        if not words:
+            return []
+        # Unquoted words next to each other rank higher, without being required
+        boosted = [phrase for phrase in phrases if len(phrase) > 1]
+        loose = [phrase[0] for phrase in phrases if len(phrase) == 1]
+        if len(loose) > 1:
+            boosted.append(loose)
+
+        with self._lock:
+            postings = [self._postings.get(token) for token in words]
+            if not all(postings):
+                return []
+            # Intersect from the rarest word
+            candidates = set(min(postings, key=len))
+            for found in postings:
+                candidates.intersection_update(found)
+            for phrase in phrases:
+                if len(phrase) > 1:
+                    candidates = {
+                        d for d in candidates if self._phrase_count(phrase, d)
+                    }
+            if not candidates:
+                return []
+
+            n = len(self._lengths)
+            average = self._total_length / n
+            scores = {}
+            for d in candidates:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[d] / average)
+                score = 0.0
+                for found in postings:
+                    idf = math.log(1 + (n - len(found) + 0.5) / (len(found) + 0.5))
+                    tf = len(found[d])
+                    score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                for phrase in boosted:
+                    score += PHRASE_BOOST * math.log1p(self._phrase_count(phrase, d))
+                scores[d] = score
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+        return ranked[:limit]
+
+    def _phrase_count(self, phrase: list[str], doc_id: int) -> int:
+        # Occurrences of the tokens at consecutive positions, with the lock held
+        starts = set(self._postings[phrase[0]][doc_id])
+        for offset, token in enumerate(phrase[1:], 1):
+            found = self._postings.get(token, {}).get(doc_id)
+            if not found:
+                return 0
+            starts.intersection_update(p - offset for p in found)
+            if not starts:
+                return 0
+        return len(starts)
+
+    def _remove(self, doc_id: int):
+        # Must be called with the lock held
+        for token in self._docs.pop(doc_id):
+            del self._postings[token][doc_id]
+            if not self._postings[token]:
+                del self._postings[token]
+        self._total_length -= self._lengths.pop(doc_id)
+
+
+class CatalogIndex:
+    """Search indexes of the artist, album and track names and of the lyrics
+    in the catalog.
+
+    The indexes are kept up to date incrementally from the rows the catalog
+    updated since the last sync, including rows written by other workers.
+    """
+
+    # Seconds between two checks for catalog updates
+    SYNC_INTERVAL = 1.0
+
+    def __init__(self):
+        self.artists = SearchIndex()
+        self.albums = SearchIndex()
+        self.tracks = SearchIndex()
+        self.lyrics = LyricsIndex()
+        # last write transaction number seen per table
+        self.watermarks = {"artist": 0, "album": 0, "track": 0, "lyrics": 0}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def sync(self, store) -> None:
+        """Indexes the catalog rows updated since the last sync."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.SYNC_INTERVAL:
+                return
+            self._checked_at = now
+            for row in store.rows_changed_since("artist", self.watermarks["artist"]):
+                self.artists.add(row["id"], [(row["name"], 2.0)])
+                self._advance("artist", row["seq"])
+            for row in store.rows_changed_since("album", self.watermarks["album"]):
+                self.albums.add(
+                    row["id"], [(row["title"], 2.0), (row["artist_name"], 1.0)]
+                )
+                self._advance("album", row["seq"])
+            for row in store.rows_changed_since("track", self.watermarks["track"]):
+                self.tracks.add(
+                    row["id"],
+                    [
+                        (row["name"], 2.0),
+                        (row["artist_name"], 1.0),
+                        (row["album_name"], 1.0),
+                    ],
+                )
+                self._advance("track", row["seq"])
+            for row in store.rows_changed_since("lyrics", self.watermarks["lyrics"]):
+                self.lyrics.add(row["id"], row["text"])
+                self._advance("lyrics", row["seq"])
+
+    def _advance(self, table: str, seq: int):
+        self.watermarks[table] = max(self.watermarks[table], seq)
@@ -0,0 +1,101 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Hashable, Iterator, TypeVar
+
+try:
+    import fcntl
+except ImportError:  # Windows, coordinate within the process only
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Directory of the lock files used to coordinate worker processes
+LOCK_DIR = Path(os.environ.get("SINGLEFLIGHT_LOCK_DIR", "./appcache/locks"))
+# Keys are hashed into this many lock files, so the directory stays bounded
+LOCK_STRIPES = int(os.environ.get("SINGLEFLIGHT_LOCK_STRIPES", "256"))
+
+
+class SingleFlight:
+    """Makes concurrent calls with the same key share a single computation.
+
+    The first caller of a key runs the function, callers arriving while it
+    is in flight wait for it and receive the same result (or exception).
+    When `lock_dir` is set the computation also holds a file lock for the
+    key, so only one worker process at a time computes it. Keys share
+    `stripes` lock files, unrelated keys rarely wait for each other.
+    """
+
+    def __init__(self, lock_dir: Path | None = LOCK_DIR, stripes: int = LOCK_STRIPES):
+        self.lock_dir = lock_dir
+        self.stripes = stripes
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        # Stripes locked by the current thread, a nested call doesn't wait on itself
+        self._held = threading.local()
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Runs fn for key, or waits for the call already in flight.
+
+        Args:
+            key (Hashable): identifies the computation, like a normalized query
+            fn (Callable[[], T]): the computation, it should check the shared
+                cache first as another process may have just filled it
+
+        Returns:
+            T: the result of the shared call
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            logger.info(f"Waiting for in-flight {key}")
+            return future.result()
+
+        try:
+            with self.file_lock(key):
+                result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    @contextmanager
+    def file_lock(self, key: Hashable) -> Iterator[None]:
+        # Exclusive lock shared by every worker process on the same host
+        if self.lock_dir is None or fcntl is None:
+            yield
+            return
+        stripe = self.stripe(key)
+        held = self._held.__dict__.setdefault("stripes", set())
+        if stripe in held:
+            yield
+            return
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        with (self.lock_dir / f"{stripe:03d}.lock").open("a") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            held.add(stripe)
+            try:
+                yield
+            finally:
+                held.discard(stripe)
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def stripe(self, key: Hashable) -> int:
+        # Stable across processes, unlike hash()
+        digest = hashlib.sha1(repr(key).encode()).digest()
+        return int.from_bytes(digest[:4], "big") % self.stripes
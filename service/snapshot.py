@@ -0,0 +1,421 @@
+"""Read-only, memory-mapped snapshot of the catalog.
+
+The snapshot compiles the artists, albums and tracks of the SQLite catalog
+into a single file that every worker process maps at startup. Reading it
+needs no parsing: records have a fixed layout, strings live in a shared
+string table and sorted id arrays are binary searched. The pages are
+shared by the processes through the page cache, so a host keeps one copy
+of the catalog whatever the number of workers.
+
+Layout (little endian, sections aligned on 8 bytes):
+
+    header          magic, build time, counts and section offsets
+    strings         UTF-8 strings, referenced as (offset, length)
+    artist ids      sorted int64, the n-th artist record has the n-th id
+    artists         ARTIST records
+    album ids       sorted int64
+    albums          ALBUM records
+    artist albums   uint32 album record numbers, in the order of each artist
+    track ids       sorted int64
+    track records   uint32 record number of each id in track ids
+    tracks          TRACK records, grouped by album in disc and number order
+
+Build with: python -m service.snapshot [--catalog PATH] [--output PATH]
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from model.artist import Artist
+from model.album import Album
+from model.track import Track
+from service.catalog import CATALOG_PATH, TRACK_COLUMNS, CatalogStore
+
+logger = logging.getLogger(__name__)
+
+# Location of the snapshot mapped by the workers, rebuilt with the command above
+SNAPSHOT_PATH = Path(os.environ.get("SNAPSHOT_PATH", "./appcache/catalog.snap"))
+
+MAGIC = b"CATSNAP1"
+# Reference to a string of the string table, MISSING as length for None
+STRING = "II"
+MISSING = 0xFFFFFFFF
+# Record number and count of the albums or tracks of an entity, MISSING as
+# count when they have not been fetched
+RANGE = "II"
+
+HEADER = struct.Struct("<8sd4I9Q")
+ARTIST = struct.Struct("<q" + STRING + RANGE)
+ALBUM = struct.Struct("<qq" + STRING * 5 + RANGE)
+TRACK = struct.Struct(
+    "<q" + STRING + "q" + STRING + "q" + STRING + "ii" + STRING * 2 + "q" + STRING
+)
+SECTIONS = (
+    "strings",
+    "artist_ids",
+    "artists",
+    "album_ids",
+    "albums",
+    "artist_albums",
+    "track_ids",
+    "track_records",
+    "tracks",
+)
+
+
+def align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class StringTable:
+    """Strings written once each, referenced by offset and length."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self._refs: dict[str, tuple[int, int]] = {}
+
+    def ref(self, value: str | None) -> tuple[int, int]:
+        if value is None:
+            return 0, MISSING
+        if value not in self._refs:
+            encoded = value.encode("utf-8")
+            self._refs[value] = (len(self.data), len(encoded))
+            self.data += encoded
+        return self._refs[value]
+
+
+def build(store: CatalogStore, path: Path = SNAPSHOT_PATH) -> dict[str, int]:
+    """Compiles the catalog into a snapshot file.
+
+    The file is written next to the target and renamed over it, workers
+    which mapped the previous snapshot keep reading it until they reopen.
+
+    Args:
+        store (CatalogStore): catalog to compile
+        path (Path): snapshot file
+
+    Returns:
+        dict[str, int]: number of artists, albums and tracks written
+    """
+    conn = store.connection()
+    artists = conn.execute("SELECT * FROM artist ORDER BY id").fetchall()
+    albums = conn.execute("SELECT * FROM album ORDER BY id").fetchall()
+    tracks = conn.execute(
+        f"SELECT {', '.join(TRACK_COLUMNS)} FROM track "
+        "ORDER BY album_id, disc, number, id"
+    ).fetchall()
+
+    strings = StringTable()
+    album_numbers = {row["id"]: n for n, row in enumerate(albums)}
+    # Tracks are grouped by album, each album points to its range
+    track_ranges: dict[int, tuple[int, int]] = {}
+    track_records = bytearray()
+    for n, row in enumerate(tracks):
+        first, count = track_ranges.get(row["album_id"], (n, 0))
+        track_ranges[row["album_id"]] = (first, count + 1)
+        track_records += TRACK.pack(
+            row["id"],
+            *strings.ref(row["name"]),
+            row["artist_id"],
+            *strings.ref(row["artist_name"]),
+            row["album_id"],
+            *strings.ref(row["album_name"]),
+            row["disc"],
+            row["number"],
+            *strings.ref(row["release_date"]),
+            *strings.ref(row["genre"]),
+            row["time_millis"],
+            *strings.ref(row["preview_url"]),
+        )
+
+    album_records = bytearray()
+    for row in albums:
+        first, count = track_ranges.get(row["id"], (0, 0))
+        if row["tracks_loaded_at"] is None:
+            count = MISSING
+        album_records += ALBUM.pack(
+            row["id"],
+            row["artist_id"],
+            *strings.ref(row["artist_name"]),
+            *strings.ref(row["title"]),
+            *strings.ref(row["release_date"]),
+            *strings.ref(row["image_url"]),
+            *strings.ref(row["genre"]),
+            first,
+            count,
+        )
+
+    artist_records = bytearray()
+    artist_albums: list[int] = []
+    for row in artists:
+        ids = None if row["album_ids"] is None else json.loads(row["album_ids"])
+        first, count = len(artist_albums), MISSING
+        # The album list is only complete if every album made it to the table
+        if ids is not None and all(x in album_numbers for x in ids):
+            artist_albums.extend(album_numbers[x] for x in ids)
+            count = len(ids)
+        artist_records += ARTIST.pack(
+            row["id"], *strings.ref(row["name"]), first, count
+        )
+
+    track_order = sorted(range(len(tracks)), key=lambda n: tracks[n]["id"])
+    sections = {
+        "strings": bytes(strings.data),
+        "artist_ids": struct.pack(f"<{len(artists)}q", *(r["id"] for r in artists)),
+        "artists": bytes(artist_records),
+        "album_ids": struct.pack(f"<{len(albums)}q", *(r["id"] for r in albums)),
+        "albums": bytes(album_records),
+        "artist_albums": struct.pack(f"<{len(artist_albums)}I", *artist_albums),
+        "track_ids": struct.pack(
+            f"<{len(tracks)}q", *(tracks[n]["id"] for n in track_order)
+        ),
+        "track_records": struct.pack(f"<{len(tracks)}I", *track_order),
+        "tracks": bytes(track_records),
+    }
+
+    offsets = []
+    offset = align(HEADER.size)
+    for name in SECTIONS:
+        offsets.append(offset)
+        offset = align(offset + len(sections[name]))
+    header = HEADER.pack(
+        MAGIC,
+        time.time(),
+        len(artists),
+        len(albums),
+        len(tracks),
+        len(artist_albums),
+        *offsets,
+    )
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as file:
+        file.write(header)
+        for name, section_offset in zip(SECTIONS, offsets):
+            file.write(b"\0" * (section_offset - file.tell()))
+            file.write(sections[name])
+    os.replace(tmp, path)
+    counts = {"artists": len(artists), "albums": len(albums), "tracks": len(tracks)}
+    logger.info(f"Built snapshot {path} with {counts}")
+    return counts
+
+
+class CatalogSnapshot:
+    """Artists, albums and tracks read from a memory-mapped snapshot file.
+
+    Lookups return None for what the snapshot doesn't have, like the
+    catalog store, so callers fall back on the store then on iTunes. A
+    missing file gives an empty snapshot.
+    """
+
+    def __init__(self, path: Path = SNAPSHOT_PATH):
+        self.path = Path(path)
+        self.built_at = 0.0
+        self.counts = {"artists": 0, "albums": 0, "tracks": 0}
+        self.hits = 0
+        self.misses = 0
+        self._mm: mmap.mmap | None = None
+        self._view = memoryview(b"")
+        self._artist_ids = self._album_ids = self._track_ids = self._view.cast("q")
+        self._artist_albums = self._track_records = self._view.cast("I")
+        self._offsets: dict[str, int] = {}
+        self.open()
+
+    def open(self) -> bool:
+        """Maps the snapshot file, returns False if there is none."""
+        try:
+            with open(self.path, "rb") as file:
+                mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError: the file is empty
+            return False
+        magic, built_at, *counts_offsets = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            mm.close()
+            logger.error(f"{self.path} is not a catalog snapshot")
+            return False
+        n_artists, n_albums, n_tracks, n_artist_albums = counts_offsets[:4]
+        offsets = dict(zip(SECTIONS, counts_offsets[4:]))
+
+        view = memoryview(mm)
+
+        def array(name: str, fmt: str, n: int) -> memoryview:
+            start = offsets[name]
+            return view[start : start + n * struct.calcsize(fmt)].cast(fmt)
+
+        self.close()
+        self._mm, self._view, self._offsets = mm, view, offsets
+        self._artist_ids = array("artist_ids", "q", n_artists)
+        self._album_ids = array("album_ids", "q", n_albums)
+        self._track_ids = array("track_ids", "q", n_tracks)
+        self._artist_albums = array("artist_albums", "I", n_artist_albums)
+        self._track_records = array("track_records", "I", n_tracks)
+        self.built_at = built_at
+        self.counts = {"artists": n_artists, "albums": n_albums, "tracks": n_tracks}
+        logger.info(f"Mapped snapshot {self.path} with {self.counts}")
+        return True
+
+    def close(self):
+        if self._mm is None:
+            return
+        # Views of the map have to be released before it can be closed
+        for view in (
+            self._artist_ids,
+            self._album_ids,
+            self._track_ids,
+            self._artist_albums,
+            self._track_records,
+            self._view,
+        ):
+            view.release()
+        self._mm.close()
+        self._mm = None
+        self._view = memoryview(b"")
+        self._artist_ids = self._album_ids = self._track_ids = self._view.cast("q")
+        self._artist_albums = self._track_records = self._view.cast("I")
+        self.counts = {"artists": 0, "albums": 0, "tracks": 0}
+
+    def get_artist(self, artist_id: int) -> Artist | None:
+        """Returns an artist without albums, or None if it is not in the snapshot."""
+        n = self._find(self._artist_ids, artist_id)
+        if n is None:
+            return self._count(None)
+        self._count(True)
+        _, *name, _, _ = ARTIST.unpack_from(
+            self._view, self._record("artists", ARTIST, n)
+        )
+        return Artist(artist_id, self._string(*name))
+
+    def get_artist_albums(self, artist_id: int) -> list[Album] | None:
+        """Returns the albums (without tracks) of an artist, or None."""
+        n = self._find(self._artist_ids, artist_id)
+        if n is None:
+            return self._count(None)
+        *_, first, count = ARTIST.unpack_from(
+            self._view, self._record("artists", ARTIST, n)
+        )
+        if count == MISSING:
+            return self._count(None)
+        return self._count(
+            [self._album(x) for x in self._artist_albums[first : first + count]]
+        )
+
+    def get_albums(self, album_ids: list[int]) -> list[Album] | None:
+        """Returns the albums (without tracks), or None if any is missing."""
+        numbers = [self._find(self._album_ids, x) for x in album_ids]
+        if None in numbers:
+            return self._count(None)
+        return self._count([self._album(n) for n in numbers])
+
+    def get_album_tracks(self, album_id: int) -> list[Track] | None:
+        """Returns the tracks of an album, or None if they are not in the snapshot."""
+        n = self._find(self._album_ids, album_id)
+        if n is None:
+            return self._count(None)
+        *_, first, count = ALBUM.unpack_from(
+            self._view, self._record("albums", ALBUM, n)
+        )
+        if count == MISSING:
+            return self._count(None)
+        return self._count([self._track(x) for x in range(first, first + count)])
+
+    def get_tracks(self, track_ids: list[int]) -> list[Track] | None:
+        """Returns the tracks, or None if any is missing."""
+        numbers = [self._find(self._track_ids, x) for x in track_ids]
+        if None in numbers:
+            return self._count(None)
+        return self._count([self._track(self._track_records[n]) for n in numbers])
+
+    def stats(self) -> dict:
+        return {
+            **self.counts,
+            "built_at": self.built_at,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _count(self, value):
+        # Counters are approximate, they are not worth a lock on the hot path
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def _find(self, ids: memoryview, value: int) -> int | None:
+        # Record number of an id, by binary search of the sorted ids
+        n = bisect.bisect_left(ids, value)
+        return n if n < len(ids) and ids[n] == value else None
+
+    def _record(self, section: str, layout: struct.Struct, n: int) -> int:
+        return self._offsets[section] + n * layout.size
+
+    def _string(self, offset: int, length: int) -> str | None:
+        if length == MISSING:
+            return None
+        start = self._offsets["strings"] + offset
+        return str(self._view[start : start + length], "utf-8")
+
+    def _album(self, n: int) -> Album:
+        values = ALBUM.unpack_from(self._view, self._record("albums", ALBUM, n))
+        s = self._string
+        return Album(
+            id=values[0],
+            artist_id=values[1],
+            artist_name=s(*values[2:4]),
+            title=s(*values[4:6]),
+            release_date=s(*values[6:8]),
+            image_url=s(*values[8:10]),
+            genre=s(*values[10:12]),
+        )
+
+    def _track(self, n: int) -> Track:
+        values = TRACK.unpack_from(self._view, self._record("tracks", TRACK, n))
+        s = self._string
+        return Track(
+            id=values[0],
+            name=s(*values[1:3]),
+            artist_id=values[3],
+            artist_name=s(*values[4:6]),
+            album_id=values[6],
+            album_name=s(*values[7:9]),
+            disc=values[9],
+            number=values[10],
+            release_date=s(*values[11:13]),
+            genre=s(*values[13:15]),
+            time_millis=values[15],
+            preview_url=s(*values[16:18]),
+        )
+
+
+# Snapshot shared by the services, an empty one until the file is built
+current = CatalogSnapshot()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m service.snapshot",
+        description="Compiles the catalog into a memory-mapped snapshot.",
+    )
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="SQLite catalog")
+    parser.add_argument("--output", default=SNAPSHOT_PATH, help="snapshot file")
+    args = parser.parse_args(argv)
+
+    build(CatalogStore(Path(args.catalog)), Path(args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(levelname)s: %(name)s - %(message)s"
+    )
+    sys.exit(main())
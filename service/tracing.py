@@ -0,0 +1,169 @@
+import functools
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# Traces are collected for every request unless disabled
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "1") != "0"
+# Requests slower than this many milliseconds have their span tree written
+# to SLOW_REQUEST_LOG, 0 disables it
+SLOW_REQUEST_MS = float(os.environ.get("TRACE_SLOW_REQUEST_MS", "0"))
+# Share of the slow requests that are written
+SLOW_REQUEST_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "1"))
+SLOW_REQUEST_LOG = os.environ.get("TRACE_LOG_PATH", "./appcache/slow-requests.log")
+# Server-Timing keeps the slowest span names, headers have to stay small
+MAX_SERVER_TIMING_ENTRIES = 20
+
+
+@dataclass(slots=True)
+class Span:
+    """A timed step of a request, with the steps it made."""
+
+    name: str
+    start: float = field(default_factory=time.perf_counter)
+    end: float | None = None
+    children: list["Span"] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def to_dict(self, origin: float | None = None) -> dict:
+        # Offsets are relative to the start of the request
+        origin = self.start if origin is None else origin
+        return {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "children": [child.to_dict(origin) for child in list(self.children)],
+        }
+
+
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+
+
+@contextmanager
+def trace(name: str) -> Iterator[Span]:
+    """Starts the root span of a request, the spans opened inside it are its children."""
+    root = Span(name)
+    token = _current.set(root)
+    try:
+        yield root
+    finally:
+        root.end = time.perf_counter()
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times a block as a child of the current span, does nothing outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        yield
+        return
+    child = Span(name)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield
+    finally:
+        child.end = time.perf_counter()
+        _current.reset(token)
+
+
+def traced(name: str | None = None) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorates a function to time its calls as spans, named after the function."""
+
+    def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs) -> T:
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def server_timing(root: Span) -> str:
+    """Sums the spans of a request by name into a Server-Timing header value.
+
+    Args:
+        root (Span): root span of the request
+
+    Returns:
+        str: entries like `itunes.lookup;dur=12.5;desc="3 calls"`, slowest first
+    """
+    totals: dict[str, list[float]] = {}
+    stack = list(root.children)
+    while stack:
+        current = stack.pop()
+        total = totals.setdefault(current.name, [0.0, 0])
+        total[0] += current.duration
+        total[1] += 1
+        stack.extend(current.children)
+
+    entries = sorted(totals.items(), key=lambda item: -item[1][0])
+    metrics = []
+    for name, (seconds, calls) in entries[:MAX_SERVER_TIMING_ENTRIES]:
+        # Server-Timing names are HTTP tokens
+        metric = f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)};dur={seconds * 1000:.1f}"
+        if calls > 1:
+            metric += f';desc="{int(calls)} calls"'
+        metrics.append(metric)
+    metrics.append(f"total;dur={root.duration * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+_slow_logger: logging.Logger | None = None
+
+
+def slow_request_logger() -> logging.Logger:
+    # Slow requests go to their own file, not to the console
+    global _slow_logger
+    if _slow_logger is None:
+        os.makedirs(os.path.dirname(SLOW_REQUEST_LOG) or ".", exist_ok=True)
+        handler = logging.FileHandler(SLOW_REQUEST_LOG, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _slow_logger = logging.getLogger(f"{__name__}.slow")
+        _slow_logger.addHandler(handler)
+        _slow_logger.setLevel(logging.INFO)
+        _slow_logger.propagate = False
+    return _slow_logger
+
+
+def record_slow_request(root: Span, request: str) -> bool:
+    """Writes the span tree of a slow request, when the sampling picks it.
+
+    Args:
+        root (Span): root span of the request
+        request (str): method and URL of the request
+
+    Returns:
+        bool: True if the tree was written
+    """
+    if not SLOW_REQUEST_MS or root.duration * 1000 < SLOW_REQUEST_MS:
+        return False
+    if random.random() >= SLOW_REQUEST_SAMPLE_RATE:
+        return False
+    slow_request_logger().info(
+        json.dumps(
+            {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "request": request,
+                **root.to_dict(),
+            }
+        )
+    )
+    return True
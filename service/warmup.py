@@ -0,0 +1,283 @@
+"""Warms up the catalog and caches before traffic arrives.
+
+Reads one entry per line from files (or stdin) and crawls each one through
+the service.itunes functions, which store the results in the catalog:
+
+    artist:john lennon      artist search, with the albums and their tracks
+    album:abbey road        album search, with the tracks
+    album-id:1441164426     tracks of an album
+    track:imagine           track search
+
+Lines without a prefix use the --kind option. Entries crawled successfully
+are appended to a state file, so an interrupted crawl of the same entries
+resumes where it stopped. Once a run is through without failures, the next
+one starts over, as does any run with --fresh.
+
+Run with: python -m service.warmup [-h] [files ...]
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Iterable
+from service import itunes
+from service.concurrency import fan_out_as_completed
+from service.httpclient import close_client, open_client
+from service.ratelimit import BACKGROUND, priority
+
+logger = logging.getLogger(__name__)
+
+# Where crawled entries are recorded, to resume an interrupted crawl
+STATE_PATH = os.environ.get("WARMUP_STATE_PATH", "./appcache/warmup.done")
+
+
+def crawl_artist(name: str, limit: int) -> int:
+    artists = itunes.search_artists(name, limit)
+    album_ids = [album.id for artist in artists for album in artist.albums]
+    itunes.get_tracks_by_albums(album_ids)
+    return len(artists)
+
+
+def crawl_album(name: str, limit: int) -> int:
+    return len(itunes.search_albums(name, limit))
+
+
+def crawl_album_id(album_id: str, limit: int) -> int:
+    return len(itunes.search_tracks_by_album(album_id))
+
+
+def crawl_track(name: str, limit: int) -> int:
+    return len(itunes.search_tracks(name, limit))
+
+
+# Entry kind -> function crawling it, returning the number of results
+CRAWLERS: dict[str, Callable[[str, int], int]] = {
+    "artist": crawl_artist,
+    "album": crawl_album,
+    "album-id": crawl_album_id,
+    "track": crawl_track,
+}
+
+
+def parse_entries(lines: Iterable[str], default_kind: str) -> list[tuple[str, str]]:
+    """Parses input lines into distinct (kind, value) entries.
+
+    Blank lines and lines starting with # are skipped.
+
+    Args:
+        lines (Iterable[str]): input lines
+        default_kind (str): kind of the lines without a kind prefix
+
+    Returns:
+        list[tuple[str, str]]: the entries, in input order
+    """
+    entries: dict[tuple[str, str], None] = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        kind, sep, value = line.partition(":")
+        if not sep or kind.strip().lower() not in CRAWLERS:
+            kind, value = default_kind, line
+        entries[(kind.strip().lower(), " ".join(value.lower().split()))] = None
+    return list(entries)
+
+
+class RateBudget:
+    """Spaces out calls to at most `rate` per minute, across threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 60 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def run_id(entries: list[tuple[str, str]]) -> str:
+    """Identifies a run by its entries, in any order."""
+    lines = sorted(f"{kind}\t{value}" for kind, value in entries)
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()[:16]
+
+
+class CrawlState:
+    """Entries crawled by a run, appended to a file as they complete.
+
+    The file starts with the run id and gets a finished line at the end of
+    the run. Only an unfinished run with the same id is resumed, otherwise
+    the file is overwritten by the first entry done.
+    """
+
+    def __init__(self, path: str, run: str):
+        self.path = path
+        self.run = run
+        self.done: set[tuple[str, str]] = set()
+        lines = []
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                lines = [line.rstrip("\n") for line in file]
+        self.resumed = (
+            bool(lines) and lines[0] == f"run\t{run}" and "finished" not in lines
+        )
+        if self.resumed:
+            for line in lines[1:]:
+                kind, _, value = line.partition("\t")
+                self.done.add((kind, value))
+        self._started = self.resumed
+        self._lock = threading.Lock()
+
+    def _append(self, line: str):
+        # Called with the lock held, a new run replaces the previous file
+        mode = "a" if self._started else "w"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, mode, encoding="utf-8") as file:
+            if not self._started:
+                file.write(f"run\t{self.run}\n")
+            file.write(f"{line}\n")
+        self._started = True
+
+    def mark_done(self, entry: tuple[str, str]):
+        with self._lock:
+            self.done.add(entry)
+            self._append(f"{entry[0]}\t{entry[1]}")
+
+    def finish(self):
+        """Ends the run, the next one starts over."""
+        with self._lock:
+            self._append("finished")
+
+
+def crawl(
+    entries: list[tuple[str, str]],
+    state: CrawlState,
+    limit: int,
+    concurrency: int,
+    rate: float,
+) -> dict[str, int]:
+    """Crawls the entries not done yet, logging progress and throughput.
+
+    Entries that fail or find nothing (usually an upstream failure) are not
+    marked as done. The run is finished only without failures, otherwise the
+    next run of the same entries retries them.
+
+    Args:
+        entries (list[tuple[str, str]]): (kind, value) entries to crawl
+        state (CrawlState): entries crawled by an interrupted run
+        limit (int): search limit
+        concurrency (int): maximum number of entries crawled at the same time
+        rate (float): maximum number of entries started per minute, 0 for no limit
+
+    Returns:
+        dict[str, int]: number of entries done, empty, failed and skipped
+    """
+    todo = [entry for entry in entries if entry not in state.done]
+    counts = {"done": 0, "empty": 0, "failed": 0, "skipped": len(entries) - len(todo)}
+    if counts["skipped"]:
+        logger.info(f"Skipping {counts['skipped']} entries crawled by the last run")
+    budget = RateBudget(rate)
+    started = time.monotonic()
+
+    def run(entry: tuple[str, str]) -> tuple[int | None, float]:
+        budget.wait()
+        t0 = time.monotonic()
+        kind, value = entry
+        try:
+            # Interactive requests served meanwhile go first
+            with priority(BACKGROUND):
+                found = CRAWLERS[kind](value, limit)
+        except Exception as e:
+            logger.error(f"Crawling {kind} {value} failed: {e}")
+            found = None
+        return found, time.monotonic() - t0
+
+    for n, (entry, (found, elapsed)) in enumerate(
+        fan_out_as_completed(run, todo, max_workers=concurrency), start=1
+    ):
+        if found is None:
+            counts["failed"] += 1
+        elif found == 0:
+            counts["empty"] += 1
+        else:
+            counts["done"] += 1
+            state.mark_done(entry)
+        throughput = n / (time.monotonic() - started)
+        logger.info(
+            f"[{n}/{len(todo)}] {entry[0]} {entry[1]}: "
+            f"{'failed' if found is None else f'{found} results'} in {elapsed:.2f}s "
+            f"({throughput:.2f} entries/s)"
+        )
+
+    if not counts["failed"]:
+        state.finish()
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Crawled {len(todo)} entries in {elapsed:.1f}s: {counts['done']} done, "
+        f"{counts['empty']} empty, {counts['failed']} failed, "
+        f"{counts['skipped']} skipped"
+    )
+    return counts
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m service.warmup", description="Warms up the catalog."
+    )
+    parser.add_argument("files", nargs="*", help="input files, stdin by default")
+    parser.add_argument(
+        "--kind",
+        choices=sorted(CRAWLERS),
+        default="artist",
+        help="kind of the lines without a kind prefix",
+    )
+    parser.add_argument("--limit", type=int, default=10, help="search limit")
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="entries crawled at the same time"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=20,
+        help="maximum entries started per minute, 0 for no limit",
+    )
+    parser.add_argument("--state", default=STATE_PATH, help="resume state file")
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="start a new run instead of resuming an interrupted one",
+    )
+    args = parser.parse_args(argv)
+
+    lines: list[str] = []
+    if not args.files:
+        lines = sys.stdin.readlines()
+    for path in args.files:
+        with open(path, encoding="utf-8") as file:
+            lines.extend(file)
+    entries = parse_entries(lines, args.kind)
+
+    if args.fresh and os.path.exists(args.state):
+        os.remove(args.state)
+    state = CrawlState(args.state, run_id(entries))
+
+    open_client()
+    try:
+        counts = crawl(entries, state, args.limit, args.concurrency, args.rate)
+    finally:
+        close_client()
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(levelname)s: %(name)s - %(message)s"
+    )
+    sys.exit(main())
@@ -6,6 +6,7 @@ const state = {
   totalPages: 0,
   currentView: "",
   currentData: null,
+  pagination: null,
 };
 
 let sortOrder = "asc";
@@ -62,7 +63,7 @@ document.addEventListener("DOMContentLoaded", () => {
   searchInput.focus();
 });
 
-async function search() {
+async function search(cursor = null) {
   const searchInput = document.getElementById("search-input");
   const searchButton = document.querySelector("button");
   const searchTypeSelect = document.getElementById("search-type");
@@ -70,6 +71,7 @@ async function search() {
   const releaseYearInput = document.getElementById("release-year");
   const genreInput = document.getElementById("genre");
   const limitInput = document.getElementById("limit");
+  const streamInput = document.getElementById("stream-albums");
 
   const searchType = searchTypeSelect?.value;
   const searchTerm = searchInput?.value.trim();
@@ -83,7 +85,13 @@ async function search() {
     return;
   }
 
-  let queryParams = buildQueryParams(searchTerm, releaseYear, genre, limit);
+  let queryParams = buildQueryParams(
+    searchTerm,
+    releaseYear,
+    genre,
+    limit,
+    cursor
+  );
 
   state.currentArtist = searchTerm;
   state.searchType = searchType;
@@ -106,6 +114,12 @@ async function search() {
         );
         break;
       case "albums":
+        // Opt-in: albums are rendered one by one as the server streams them,
+        // without pages
+        if (streamInput?.checked) {
+          await streamAlbums(queryParams);
+          return;
+        }
         response = await fetch(`/albums/${queryParams}`);
         break;
       case "tracks":
@@ -136,7 +150,7 @@ async function search() {
   }
 }
 
-function buildQueryParams(searchTerm, releaseYear, genre, limit) {
+function buildQueryParams(searchTerm, releaseYear, genre, limit, cursor) {
   let queryParams = `?album_name=${encodeURIComponent(searchTerm)}`;
   if (releaseYear) {
     queryParams += `&release_year=${encodeURIComponent(releaseYear)}`;
@@ -148,6 +162,10 @@ function buildQueryParams(searchTerm, releaseYear, genre, limit) {
     queryParams += `&limit=${encodeURIComponent(limit)}`;
   }
   queryParams += `&page=${state.currentPage}&page_size=${state.pageSize}`;
+  // Cursors let the server page through its snapshot of the first results
+  if (cursor) {
+    queryParams += `&cursor=${encodeURIComponent(cursor)}`;
+  }
   return queryParams;
 }
 
@@ -184,6 +202,7 @@ function handleSearchResults(searchType, data) {
 function updatePagination(pagination) {
   const paginationContainer = document.getElementById("pagination");
   state.totalPages = pagination.total_pages;
+  state.pagination = pagination;
 
   paginationContainer.innerHTML = `
     <button 
@@ -202,8 +221,12 @@ function updatePagination(pagination) {
 
 async function changePage(newPage) {
   if (newPage >= 1 && newPage <= state.totalPages) {
+    const cursor =
+      newPage > state.currentPage
+        ? state.pagination?.next_cursor
+        : state.pagination?.prev_cursor;
     state.currentPage = newPage;
-    await search();
+    await search(cursor);
     window.scrollTo(0, 0);
   }
 }
@@ -218,66 +241,135 @@ function displayAlbums(data) {
   }
 
   data.forEach((album, index) => {
-    const albumElement = document.createElement("div");
-    albumElement.classList.add("album");
-
-    const discs = groupTracksByDisc(album.tracks);
-
-    const discSections = discs
-      .map(
-        (disc) => `
-      <div class="disc-section">
-          <h3>Genre: ${album.genre}</h3>
-          <div class="track-list">
-              ${disc.tracks
-                .map(
-                  (track) => `
-                  <div class="track">
-                      <div class="track-number">${track.number}</div>
-                      <div class="track-name">${track.name}</div>
-                      <div class="track-time"><p class="card-text"><strong>Duration:</strong> ${formatTimeMillis(
-                        track.time_millis
-                      )}</p>
-                      </div>
-                      <div class="track-preview">
-                          ${
-                            track.preview_url
-                              ? `<audio class="audio-player" controls src="${track.preview_url}" />`
-                              : ""
-                          }
-                      </div>
-                  </div>
-              `
-                )
-                .join("")}
-          </div>
-      </div>
-  `
-      )
-      .join("");
-
-    const albumId = `album-${index}`;
-
-    albumElement.innerHTML = `
-              <button class="btn btn-link" type="button" data-bs-toggle="collapse" data-bs-target="#${albumId}" aria-expanded="false" aria-controls="${albumId}">
-                  <img src="${album.image_url.replace(
-                    "100x100",
-                    "600x600"
-                  )}" alt="Album Cover">
-                  <div class="album-info">
-                      <h2>${album.title}</h2>
-                      <p>${album.artist_name}</p>
-                  </div>
-              </button>
-              <div id="${albumId}" class="collapse">
-                  ${discSections}
-              </div>
-          `;
-
-    albumsContainer.appendChild(albumElement);
+    albumsContainer.appendChild(createAlbumElement(album, index));
   });
 }
 
+// Albums are streamed as newline-delimited JSON, each one is rendered as it arrives
+async function streamAlbums(queryParams) {
+  const response = await fetch(`/albums/stream${queryParams}`);
+  if (!response.ok) {
+    const data = await response.json();
+    alert(data.detail ?? "Failed to retrieve albums. Please try again.");
+    return;
+  }
+
+  const albumsContainer = document.getElementById("albums");
+  albumsContainer.innerHTML = "<p>Searching albums...</p>";
+  // Every album found is shown, there are no pages
+  document.getElementById("pagination").innerHTML = "";
+  state.currentView = "albums";
+  state.currentData = { albums: [] };
+  let streamFailed = false;
+
+  const renderLine = (line) => {
+    if (!line.trim()) {
+      return;
+    }
+    const album = JSON.parse(line);
+    if (album.error) {
+      // The albums received so far stay, followed by the error
+      console.error("Error streaming albums:", album.error);
+      if (state.currentData.albums.length === 0) {
+        albumsContainer.innerHTML = "";
+      }
+      const errorElement = document.createElement("p");
+      errorElement.classList.add("text-danger");
+      errorElement.textContent = album.error;
+      albumsContainer.appendChild(errorElement);
+      streamFailed = true;
+      return;
+    }
+    if (state.currentData.albums.length === 0) {
+      albumsContainer.innerHTML = "";
+    }
+    albumsContainer.appendChild(
+      createAlbumElement(album, state.currentData.albums.length)
+    );
+    state.currentData.albums.push(album);
+  };
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) {
+      break;
+    }
+    buffer += decoder.decode(value, { stream: true });
+    // The last line may be incomplete, keep it for the next chunk
+    const lines = buffer.split("\n");
+    buffer = lines.pop();
+    lines.forEach(renderLine);
+  }
+  renderLine(buffer + decoder.decode());
+
+  if (state.currentData.albums.length === 0 && !streamFailed) {
+    albumsContainer.innerHTML = "<p>No albums found.</p>";
+  }
+}
+
+function createAlbumElement(album, index) {
+  const albumElement = document.createElement("div");
+  albumElement.classList.add("album");
+
+  const discs = groupTracksByDisc(album.tracks);
+
+  const discSections = discs
+    .map(
+      (disc) => `
+    <div class="disc-section">
+        <h3>Genre: ${album.genre}</h3>
+        <div class="track-list">
+            ${disc.tracks
+              .map(
+                (track) => `
+                <div class="track">
+                    <div class="track-number">${track.number}</div>
+                    <div class="track-name">${track.name}</div>
+                    <div class="track-time"><p class="card-text"><strong>Duration:</strong> ${formatTimeMillis(
+                      track.time_millis
+                    )}</p>
+                    </div>
+                    <div class="track-preview">
+                        ${
+                          track.preview_url
+                            ? `<audio class="audio-player" controls src="${track.preview_url}" />`
+                            : ""
+                        }
+                    </div>
+                </div>
+            `
+              )
+              .join("")}
+        </div>
+    </div>
+`
+    )
+    .join("");
+
+  const albumId = `album-${index}`;
+
+  albumElement.innerHTML = `
+            <button class="btn btn-link" type="button" data-bs-toggle="collapse" data-bs-target="#${albumId}" aria-expanded="false" aria-controls="${albumId}">
+                <img src="${album.image_url.replace(
+                  "100x100",
+                  "600x600"
+                )}" alt="Album Cover">
+                <div class="album-info">
+                    <h2>${album.title}</h2>
+                    <p>${album.artist_name}</p>
+                </div>
+            </button>
+            <div id="${albumId}" class="collapse">
+                ${discSections}
+            </div>
+        `;
+
+  return albumElement;
+}
+
 function groupTracksByDisc(tracks) {
   const discs = {};
 
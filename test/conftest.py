@@ -0,0 +1,17 @@
+import pytest
+import service.catalog as catalog
+import service.filecache as filecache
+import service.snapshot as snapshot
+from service.catalog import CatalogStore
+from service.memcache import MemoryCache
+from service.singleflight import SingleFlight
+from service.snapshot import CatalogSnapshot
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    # Keep every test away from ./appcache and from other tests' cached results
+    monkeypatch.setattr(catalog, "store", CatalogStore(tmp_path / "catalog.db"))
+    monkeypatch.setattr(snapshot, "current", CatalogSnapshot(tmp_path / "catalog.snap"))
+    monkeypatch.setattr(filecache, "memory_cache", MemoryCache())
+    monkeypatch.setattr(filecache, "flight", SingleFlight(tmp_path / "locks"))
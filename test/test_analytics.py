@@ -0,0 +1,82 @@
+import pytest
+import service.filecache as filecache
+from dataclasses import replace
+from service.catalog import CatalogStore
+from test.test_catalog import make_album, make_track
+
+analytics = pytest.importorskip("service.analytics")
+pytest.importorskip("numpy")
+
+
+def make_columns(tmp_path):
+    store = CatalogStore(tmp_path / "catalog.db")
+    albums = [
+        replace(make_album(1), genre="Rock", release_date="1971-09-09T07:00:00Z"),
+        replace(make_album(2), genre="Rock", release_date="1975-01-01T08:00:00Z"),
+        replace(make_album(3, 2), genre="Jazz", release_date="1959-08-17T07:00:00Z"),
+        replace(make_album(4, 2), genre="rock", release_date=""),
+    ]
+    store.upsert_albums(albums)
+    # Album 4 never had its tracks fetched
+    for album, n_tracks in zip(albums[:3], (2, 3, 1)):
+        tracks = [
+            replace(make_track(album.id, n), time_millis=60000 * n)
+            for n in range(1, n_tracks + 1)
+        ]
+        store.set_album_tracks(album, tracks)
+    # A track of album 4 seen in a search doesn't make its track list
+    store.upsert_tracks([make_track(4, 1)])
+    return analytics.CatalogColumns.build(store)
+
+
+def test_listing_newest_first(tmp_path):
+    view = make_columns(tmp_path)
+    assert view.album_ids_where(view.mask(), 0, 10) == ([2, 1, 3, 4], 4)
+    assert view.album_ids_where(view.mask(genre="ROCK"), 0, 1) == ([2], 3)
+    assert view.album_ids_where(view.mask(decade=1970), 0, 10) == ([2, 1], 2)
+    assert view.album_ids_where(view.mask(year=1959, artist_id=2), 0, 10) == ([3], 1)
+    assert view.album_ids_where(view.mask(genre="Polka"), 0, 10) == ([], 0)
+
+
+def test_genre_decade_counts(tmp_path):
+    view = make_columns(tmp_path)
+    # Albums without a release date are not counted
+    assert view.genre_decade_counts(view.mask()) == {
+        "Jazz": {"1950s": 1},
+        "Rock": {"1970s": 2},
+    }
+
+
+def test_durations(tmp_path):
+    view = make_columns(tmp_path)
+    albums = view.album_durations(view.mask(), 2)
+    assert [(x["album_id"], x["tracks"], x["total_millis"]) for x in albums] == [
+        (2, 3, 360000),
+        (1, 2, 180000),
+    ]
+
+    artists = view.artist_durations(view.mask(), 10, by_average=True)
+    assert [(x["artist_id"], x["average_millis"]) for x in artists] == [
+        (1, 108000),
+        (2, 60000),
+    ]
+    assert [x["albums"] for x in artists] == [2, 1]
+    assert view.track_counts[view.album_ids == 4].tolist() == [0]
+
+
+def test_stale_view_is_rebuilt_apart_from_cache_refreshes(tmp_path, monkeypatch):
+    view = make_columns(tmp_path)
+    monkeypatch.setattr(analytics, "_view", replace(view, built_at=0.0))
+    scheduled = filecache.refresh_stats["scheduled"]
+    # The stale view is served while a rebuild runs
+    assert analytics.columns().built_at == 0.0
+    analytics.rebuild_in_background().result(timeout=5)
+    assert analytics.columns().built_at > 0
+    assert filecache.refresh_stats["scheduled"] == scheduled
+
+
+def test_unchanged_catalog_is_not_rebuilt(monkeypatch):
+    view = analytics.CatalogColumns.build(analytics.catalog.store)
+    monkeypatch.setattr(analytics, "_view", replace(view, built_at=0.0))
+    monkeypatch.setattr(analytics.CatalogColumns, "build", None)
+    assert analytics.rebuild().built_at > 0
@@ -0,0 +1,81 @@
+import requests
+import service.itunes as itunes
+from model.artist import Artist
+from service.batch import resolve_albums, resolve_artists, resolve_tracks
+from service.ratelimit import RateLimited
+from test.test_itunes import fake_lookup, make_album, make_track
+
+
+def test_albums_are_looked_up_together(monkeypatch):
+    calls = []
+    monkeypatch.setattr(itunes, "lookup", fake_lookup(calls))
+
+    results = resolve_albums({"1": 1, "2": 2, "002": 2})
+    assert [track.album_id for track in results["1"]["tracks"]] == [1, 1]
+    assert results["002"] == results["2"]
+    assert len(calls) == 1
+    assert sorted(calls[0]) == [1, 2]
+
+
+def test_album_errors_are_per_item(monkeypatch):
+    def get_tracks_by_albums(ids):
+        # The batch fails because of album 3, album 9 doesn't exist
+        if 3 in ids:
+            raise requests.ConnectionError("connection reset")
+        return [[make_track(x, 1)] if x != 9 else [] for x in ids]
+
+    monkeypatch.setattr(itunes, "get_tracks_by_albums", get_tracks_by_albums)
+
+    results = resolve_albums({"1": 1, "3": 3, "9": 9})
+    assert results["1"] == {"tracks": [make_track(1, 1)]}
+    assert results["3"] == {"error": "Error searching iTunes API: connection reset"}
+    assert results["9"] == {"error": "Album not found: 9"}
+
+
+def test_artist_errors_are_per_item(monkeypatch):
+    def find_artists(name, limit):
+        if name == "busy":
+            raise RateLimited("Too many iTunes requests queued", retry_after=2.0)
+        return [Artist(len(name), name)]
+
+    hydrated = []
+
+    def hydrate_artists(artists):
+        hydrated.append([artist.id for artist in artists])
+        return [Artist(x.id, x.name, [make_album(x.id)]) for x in artists]
+
+    monkeypatch.setattr(itunes, "find_artists", find_artists)
+    monkeypatch.setattr(itunes, "hydrate_artists", hydrate_artists)
+
+    results = resolve_artists({"Busy": "busy", "Queen": "queen", "abba": "abba"}, 3)
+    assert results["Busy"] == {
+        "error": "Error searching iTunes API: Too many iTunes requests queued",
+        "retry_after": 2.0,
+    }
+    assert results["Queen"]["artists"][0].albums == [make_album(5)]
+    # The albums of every artist found are looked up at once
+    assert [sorted(ids) for ids in hydrated] == [[4, 5]]
+
+
+def test_track_searches(monkeypatch):
+    def search_tracks(name, limit):
+        if name == "down":
+            raise requests.ConnectionError("connection refused")
+        return [make_track(1, n) for n in range(1, limit + 1)]
+
+    monkeypatch.setattr(itunes, "search_tracks", search_tracks)
+
+    results = resolve_tracks({"Imagine": "imagine", "down": "down"}, 2)
+    assert len(results["Imagine"]["tracks"]) == 2
+    assert "error" in results["down"]
+
+
+def test_artists_without_albums_when_their_lookup_fails(monkeypatch):
+    def hydrate_artists(artists):
+        raise requests.ConnectionError("connection reset")
+
+    monkeypatch.setattr(itunes, "find_artists", lambda name, limit: [Artist(1, name)])
+    monkeypatch.setattr(itunes, "hydrate_artists", hydrate_artists)
+
+    results = resolve_artists({"Queen": "queen"}, 3)
+    assert results["Queen"] == {"artists": [Artist(1, "queen")]}
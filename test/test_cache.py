@@ -0,0 +1,114 @@
+import threading
+import time
+import service.filecache as filecache
+from service.filecache import Stored, cached, refreshing
+from service.memcache import MemoryCache
+
+
+def test_lru_eviction():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_max_bytes_eviction():
+    cache = MemoryCache(max_bytes=3000)
+    for i in range(10):
+        cache.set(i, "x" * 1000)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 3000
+    assert stats["entries"] < 10
+    assert cache.get(9) is not None
+
+
+def test_ttl_expiration():
+    cache = MemoryCache()
+    cache.set("a", 1, ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cached_uses_memory_then_store():
+    calls = []
+    store = {}
+
+    @cached("numbers", store.get, lambda value, n: store.__setitem__(n, value))
+    def numbers(n):
+        calls.append(n)
+        return list(range(n))
+
+    assert numbers(3) == [0, 1, 2]
+    assert numbers(3) == [0, 1, 2]
+    assert calls == [3]
+    assert filecache.memory_cache.stats()["hits"] == 1
+
+    # With the memory tier gone the value is read back from the store
+    filecache.memory_cache.clear()
+    assert numbers(3) == [0, 1, 2]
+    assert calls == [3]
+
+
+def test_cached_skips_empty_results():
+    calls = []
+    store = {}
+
+    @cached("empty", store.get, lambda value, n: store.__setitem__(n, value))
+    def empty(n):
+        calls.append(n)
+        return []
+
+    empty(1)
+    empty(1)
+    assert calls == [1, 1]
+    assert store == {}
+
+
+def test_stale_results_are_refreshed_in_background():
+    store = {1: Stored("old", time.time() - 100)}
+    refreshed = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def save(value, n):
+        store[n] = Stored(value, time.time())
+        refreshed.set()
+
+    @cached("swr", store.get, save, soft_ttl=10, hard_ttl=1000)
+    def value(n):
+        calls.append(refreshing())
+        release.wait(5)
+        return "new"
+
+    # The stale value is served at once, a single refresh runs meanwhile
+    assert value(1) == "old"
+    assert value(1) == "old"
+    release.set()
+    assert refreshed.wait(5)
+    deadline = time.monotonic() + 5
+    while filecache.cache_stats()["refresh"]["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert calls == [True]
+    assert value(1) == "new"
+    assert filecache.refresh_stats["stale"] >= 2
+
+
+def test_expired_results_are_fetched():
+    store = {1: Stored("old", time.time() - 100)}
+
+    @cached("expired", store.get, lambda value, n: None, soft_ttl=1, hard_ttl=10)
+    def value(n):
+        return "new"
+
+    assert value(1) == "new"
+    assert filecache.store_stats["expired"] >= 1
@@ -0,0 +1,94 @@
+from model.album import Album
+from model.artist import Artist
+from model.track import Track
+from service.catalog import CatalogStore
+
+
+def make_album(album_id, artist_id=1):
+    return Album(
+        id=album_id,
+        artist_id=artist_id,
+        artist_name="Artist",
+        title=f"Album {album_id}",
+        release_date="2000-01-01T00:00:00Z",
+        image_url="http://example.com/album.jpg",
+        genre="Rock",
+    )
+
+
+def make_track(album_id, number):
+    return Track(
+        id=album_id * 100 + number,
+        name=f"Track {number}",
+        artist_id=1,
+        artist_name="Artist",
+        album_id=album_id,
+        album_name=f"Album {album_id}",
+        disc=1,
+        number=number,
+        release_date="2000-01-01T00:00:00Z",
+        genre="Rock",
+        time_millis=180000,
+    )
+
+
+def test_album_tracks(tmp_path):
+    store = CatalogStore(tmp_path / "catalog.db")
+    album = make_album(1)
+    # Albums seen in a search have no track list yet
+    store.upsert_albums([album])
+    assert store.get_album_tracks(1) is None
+
+    tracks = [make_track(1, n) for n in (2, 1)]
+    store.set_album_tracks(album, tracks)
+    assert [track.number for track in store.get_album_tracks(1)] == [1, 2]
+    # The album, its tracks and its loaded marker are one write
+    conn = store.connection()
+    seqs = {row[0] for row in conn.execute("SELECT seq FROM track WHERE album_id = 1")}
+    assert seqs == {conn.execute("SELECT seq FROM album WHERE id = 1").fetchone()[0]}
+
+
+def test_artist_albums_keep_order(tmp_path):
+    store = CatalogStore(tmp_path / "catalog.db")
+    store.upsert_artists([Artist(1, "Artist")])
+    assert store.get_artists([1]) is None
+
+    store.set_artist_albums(1, [make_album(3), make_album(2)])
+    artists = store.get_artists([1])
+    assert artists[0].name == "Artist"
+    assert [album.id for album in artists[0].albums] == [3, 2]
+
+
+def search_ids(store, kind, term, limit):
+    entry = store.get_search_entry(kind, term, limit)
+    return None if entry is None else entry[0]
+
+
+def test_search_ids(tmp_path):
+    store = CatalogStore(tmp_path / "catalog.db")
+    assert search_ids(store, "albums", "imagine", 3) is None
+    store.save_search("albums", "imagine", 3, [3, 1, 2])
+    assert search_ids(store, "albums", "imagine", 3) == [3, 1, 2]
+
+
+def test_search_smaller_limit_is_a_prefix(tmp_path):
+    store = CatalogStore(tmp_path / "catalog.db")
+    store.save_search("albums", "imagine", 5, [3, 1, 2, 5, 4])
+    assert search_ids(store, "albums", "imagine", 2) == [3, 1]
+    assert search_ids(store, "albums", "imagine", 10) is None
+
+    # A smaller search with the same first results keeps the larger one
+    store.save_search("albums", "imagine", 2, [3, 1])
+    assert search_ids(store, "albums", "imagine", 5) == [3, 1, 2, 5, 4]
+    # Different results replace it
+    store.save_search("albums", "imagine", 2, [6, 3])
+    assert search_ids(store, "albums", "imagine", 5) is None
+    assert search_ids(store, "albums", "imagine", 2) == [6, 3]
+    store.save_search("albums", "imagine", 10, [1, 2])
+    assert search_ids(store, "albums", "imagine", 5) == [1, 2]
+
+    # Albums missing from the catalog can't be served
+    store.upsert_albums([make_album(1), make_album(2)])
+    assert store.get_albums([3, 1, 2], with_tracks=False) is None
+    store.upsert_albums([make_album(3)])
+    assert [a.id for a in store.get_albums([3, 1, 2], with_tracks=False)] == [3, 1, 2]
@@ -0,0 +1,87 @@
+import gzip
+from starlette.requests import Request
+from api import httpcache
+from api.response_cache import cache_response, cached_response, response_cache
+from api.httpcache import SEARCH_CACHE_CONTROL, http_response, make_body, negotiate
+
+
+def make_request(**headers) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [
+                (k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()
+            ],
+        }
+    )
+
+
+def test_etag_depends_on_content():
+    assert make_body(b'{"a":1}').etag == make_body(b'{"a":1}').etag
+    assert make_body(b'{"a":1}').etag != make_body(b'{"a":2}').etag
+
+
+def test_matching_etag_gets_304():
+    body = make_body(b'{"a":1}')
+    response = http_response(make_request(), body, SEARCH_CACHE_CONTROL)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == SEARCH_CACHE_CONTROL
+
+    etag = response.headers["etag"]
+    response = http_response(
+        make_request(if_none_match=etag), body, SEARCH_CACHE_CONTROL
+    )
+    assert response.status_code == 304
+    assert response.body == b""
+
+
+def test_large_bodies_are_compressed(monkeypatch):
+    monkeypatch.setattr(httpcache, "brotli", None)
+    body = make_body(b"[" + b"1," * 1000 + b"1]")
+    response = http_response(
+        make_request(accept_encoding="gzip, deflate"), body, SEARCH_CACHE_CONTROL
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == body.body
+    # The compressed representation has its own ETag, which also validates
+    etag = response.headers["etag"]
+    assert etag != body.etag
+    response = http_response(
+        make_request(if_none_match=etag), body, SEARCH_CACHE_CONTROL
+    )
+    assert response.status_code == 304
+
+
+def test_small_bodies_are_not_compressed():
+    response = http_response(
+        make_request(accept_encoding="gzip"), make_body(b"[]"), SEARCH_CACHE_CONTROL
+    )
+    assert "content-encoding" not in response.headers
+
+
+def test_negotiate_honors_q_zero(monkeypatch):
+    monkeypatch.setattr(httpcache, "brotli", None)
+    assert negotiate("gzip;q=0, identity") is None
+    assert negotiate("br, gzip;q=0.5") == "gzip"
+    assert negotiate("") is None
+
+
+def test_cached_response_answers_304_from_the_cache():
+    response_cache.clear()
+    request = make_request()
+    key = ("test", "etag")
+    etag = cache_response(request, key, [1, 2], SEARCH_CACHE_CONTROL).headers["etag"]
+    response = cached_response(
+        make_request(if_none_match=etag), key, SEARCH_CACHE_CONTROL
+    )
+    assert response.status_code == 304
+
+
+def test_empty_results_are_not_cached():
+    response_cache.clear()
+    key = ("test", "empty")
+    response = cache_response(make_request(), key, [], SEARCH_CACHE_CONTROL)
+    assert response.headers["cache-control"] == httpcache.NO_CACHE
+    assert cached_response(make_request(), key, SEARCH_CACHE_CONTROL) is None
@@ -0,0 +1,229 @@
+import threading
+import time
+import pytest
+import requests
+import service.filecache as filecache
+import service.itunes as itunes
+from model.album import Album
+from model.track import Track
+from model.tracklist import TrackList
+from service.concurrency import fan_out
+from service.memcache import MemoryCache
+from service.ratelimit import RateLimited
+
+
+def make_album(album_id):
+    return Album(
+        id=album_id,
+        artist_id=1,
+        artist_name="Artist",
+        title=f"Album {album_id}",
+        release_date="2000-01-01T00:00:00Z",
+        image_url="http://example.com/album.jpg",
+        genre="Rock",
+    )
+
+
+def make_track(album_id, number):
+    return Track(
+        id=album_id * 100 + number,
+        name=f"Track {number}",
+        artist_id=1,
+        artist_name="Artist",
+        album_id=album_id,
+        album_name=f"Album {album_id}",
+        disc=1,
+        number=number,
+        release_date="2000-01-01T00:00:00Z",
+        genre="Rock",
+        time_millis=180000,
+    )
+
+
+def test_fan_out_keeps_order():
+    # Later items finish first, results must still come back in input order
+    def slow(x):
+        time.sleep((10 - x) / 1000)
+        return x * 2
+
+    assert fan_out(slow, range(10), max_workers=5) == [x * 2 for x in range(10)]
+
+
+def test_fan_out_respects_limit():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def work(x):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return x
+
+    fan_out(work, range(20), max_workers=3)
+    assert 1 < peak <= 3
+
+
+def fake_lookup(calls):
+    # Builds iTunes-like lookup rows: each album followed by its tracks
+    def lookup(ids, entity):
+        calls.append(list(ids))
+        rows = []
+        for album_id in ids:
+            rows.append(
+                {
+                    "wrapperType": "collection",
+                    "collectionId": album_id,
+                    "artistId": 1,
+                    "artistName": "Artist",
+                    "collectionName": f"Album {album_id}",
+                    "artworkUrl100": "http://example.com/album.jpg",
+                    "primaryGenreName": "Rock",
+                    "releaseDate": "2000-01-01T00:00:00Z",
+                }
+            )
+            for n in range(1, 3):
+                rows.append(
+                    {
+                        "wrapperType": "track",
+                        "trackId": album_id * 100 + n,
+                        "trackName": f"Track {n}",
+                        "primaryGenreName": "Rock",
+                        "artistId": 1,
+                        "artistName": "Artist",
+                        "collectionId": album_id,
+                        "collectionName": f"Album {album_id}",
+                        "discNumber": 1,
+                        "trackNumber": n,
+                        "releaseDate": "2000-01-01T00:00:00Z",
+                        "trackTimeMillis": 180000,
+                    }
+                )
+        return rows
+
+    return lookup
+
+
+def test_search_albums_hydrates_tracks(monkeypatch):
+    # Stub the upstream calls so the test runs offline
+    calls = []
+    monkeypatch.setattr(
+        itunes, "get_albums", lambda name, limit: [make_album(i) for i in range(limit)]
+    )
+    monkeypatch.setattr(itunes, "lookup", fake_lookup(calls))
+
+    albums = itunes.search_albums("album", 5)
+    assert [album.id for album in albums] == list(range(5))
+    for album in albums:
+        assert [track.album_id for track in album.tracks] == [album.id, album.id]
+    # All five albums are resolved by a single lookup
+    assert calls == [[0, 1, 2, 3, 4]]
+
+
+def test_concurrent_lookups_are_batched(monkeypatch):
+    calls = []
+    monkeypatch.setattr(itunes, "lookup", fake_lookup(calls))
+    # Leave the callers plenty of time to join the same batch
+    monkeypatch.setattr(itunes.tracks_batcher, "window", 0.1)
+
+    results = fan_out(itunes.get_tracks_by_album, [10, 11, 12, 10], max_workers=4)
+    assert [[track.album_id for track in tracks] for tracks in results] == [
+        [10, 10],
+        [11, 11],
+        [12, 12],
+        [10, 10],
+    ]
+    assert len(calls) == 1
+    assert sorted(calls[0]) == [10, 11, 12]
+
+
+def test_search_albums_served_from_catalog(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        itunes, "get_albums", lambda name, limit: [make_album(i) for i in range(limit)]
+    )
+    monkeypatch.setattr(itunes, "lookup", fake_lookup(calls))
+    albums = itunes.search_albums("album", 3)
+
+    # A fresh worker has an empty memory tier but shares the catalog
+    monkeypatch.setattr(filecache, "memory_cache", MemoryCache())
+    monkeypatch.setattr(itunes, "get_albums", None)
+    assert itunes.search_albums("album", 3) == albums
+    tracks = itunes.search_tracks_by_album("1")
+    assert isinstance(tracks, TrackList)
+    assert list(tracks) == albums[1].tracks
+    assert len(calls) == 1
+
+
+def test_search_shared_across_limits_and_case(monkeypatch):
+    searches = []
+
+    def get_albums(name, limit):
+        searches.append((name, limit))
+        albums = [make_album(i) for i in range(limit)]
+        itunes.catalog.store.upsert_albums(albums)
+        return albums
+
+    monkeypatch.setattr(itunes, "get_albums", get_albums)
+    monkeypatch.setattr(itunes, "lookup", fake_lookup([]))
+    albums = itunes.find_albums("Album  Name", 5)
+
+    assert itunes.find_albums("album name", 3) == albums[:3]
+    assert searches == [("album name", 5)]
+    # A larger limit needs a new search
+    itunes.find_albums("album name", 8)
+    assert searches == [("album name", 5), ("album name", 8)]
+
+
+def test_throttled_searches_are_not_empty_results(monkeypatch):
+    def get_albums(name, limit):
+        if name in ("busy", "album"):
+            raise RateLimited("Too many iTunes requests queued", retry_after=2.0)
+        raise requests.ConnectionError("connection refused")
+
+    monkeypatch.setattr(itunes, "get_albums", get_albums)
+    with pytest.raises(RateLimited):
+        itunes.find_albums("busy", 3)
+    # Other upstream failures still fall back on the catalog
+    assert itunes.find_albums("down", 3) == []
+
+    # Throttled searches with catalog matches serve them
+    itunes.catalog.store.upsert_albums([make_album(1)])
+    itunes.catalog.store.index._checked_at = 0.0
+    monkeypatch.setattr(itunes, "LOCAL_SEARCH_MIN_RESULTS", 10)
+    assert [album.id for album in itunes.find_albums("album", 3)] == [1]
+
+
+def test_hydrate_only_requested_albums(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        itunes, "get_albums", lambda name, limit: [make_album(i) for i in range(limit)]
+    )
+    monkeypatch.setattr(itunes, "lookup", fake_lookup(calls))
+
+    albums = itunes.find_albums("album", 10)
+    assert calls == []
+    page = itunes.hydrate_albums(albums[:3])
+    assert calls == [[0, 1, 2]]
+    assert all(album.tracks for album in page)
+    # The cached search results are left untouched
+    assert all(not album.tracks for album in itunes.find_albums("album", 10))
+
+
+def test_stream_hydrated_albums(monkeypatch):
+    calls = []
+    monkeypatch.setattr(itunes, "lookup", fake_lookup(calls))
+    monkeypatch.setattr(itunes, "STREAM_BATCH_SIZE", 2)
+    itunes.hydrate_albums([make_album(3)])
+    calls.clear()
+
+    albums = list(itunes.stream_hydrated_albums([make_album(i) for i in range(5)]))
+    # The album already in the catalog comes first, without a lookup
+    assert albums[0].id == 3
+    assert sorted(album.id for album in albums) == list(range(5))
+    assert all(album.tracks for album in albums)
+    assert sorted(i for call in calls for i in call) == [0, 1, 2, 4]
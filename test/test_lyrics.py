@@ -0,0 +1,65 @@
+import pytest
+import service.lyrics as lyrics
+from service.memcache import MemoryCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = responses
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return self.responses[url.rsplit("/", 1)[-1]]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient(
+        {
+            "Imagine": FakeResponse(200, {"lyrics": "Imagine there's no heaven"}),
+            "Unknown": FakeResponse(404, {"error": "No lyrics found"}),
+        }
+    )
+    monkeypatch.setattr(lyrics, "get_client", lambda: client)
+    monkeypatch.setattr(lyrics, "lyrics_cache", MemoryCache())
+    return client
+
+
+def test_lyrics_are_cached(client):
+    assert lyrics.fetch_lyrics("John Lennon", "Imagine") == "Imagine there's no heaven"
+    # Case and spacing differences hit the same cache entry
+    assert lyrics.fetch_lyrics("john  lennon", "Imagine") == "Imagine there's no heaven"
+    assert len(client.urls) == 1
+
+
+def test_missing_lyrics_are_cached(client):
+    assert lyrics.fetch_lyrics("John Lennon", "Unknown") is None
+    assert lyrics.fetch_lyrics("John Lennon", "Unknown") is None
+    assert len(client.urls) == 1
+
+
+def test_lyrics_are_persisted_and_searchable(client, monkeypatch):
+    assert lyrics.fetch_lyrics("John Lennon", "Imagine") == "Imagine there's no heaven"
+    # Another worker finds them in the catalog
+    monkeypatch.setattr(lyrics, "lyrics_cache", MemoryCache())
+    assert lyrics.fetch_lyrics("JOHN LENNON", "imagine") == "Imagine there's no heaven"
+    assert len(client.urls) == 1
+
+    results = lyrics.search_lyrics('"no heaven"', 10)
+    assert [(x["artist"], x["song"]) for x in results] == [("John Lennon", "Imagine")]
+    assert results[0]["snippet"] == "Imagine there's no heaven"
+    assert results[0]["tracks_url"] == "/tracks/Imagine"
+    assert lyrics.search_lyrics('"heaven no"', 10) == []
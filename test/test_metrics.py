@@ -0,0 +1,31 @@
+from service.metrics import CallbackMetric, Counter, Histogram, Registry
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    calls = registry.register(Counter("calls_total", "Calls", ("function",)))
+    latency = registry.register(
+        Histogram("latency_seconds", "Latency", ("function",), buckets=(0.1, 1.0))
+    )
+    registry.register(CallbackMetric("depth", "Queue depth", lambda: [({}, 3)]))
+
+    calls.inc("lookup")
+    calls.inc("lookup")
+    latency.observe("lookup", value=0.5)
+    latency.observe("lookup", value=2.0)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE calls_total counter" in lines
+    assert 'calls_total{function="lookup"} 2' in lines
+    assert 'latency_seconds_bucket{function="lookup",le="0.1"} 0' in lines
+    assert 'latency_seconds_bucket{function="lookup",le="1.0"} 1' in lines
+    assert 'latency_seconds_bucket{function="lookup",le="+Inf"} 2' in lines
+    assert 'latency_seconds_sum{function="lookup"} 2.5' in lines
+    assert 'latency_seconds_count{function="lookup"} 2' in lines
+    assert "depth 3" in lines
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errors", ("detail",))
+    counter.inc('say "hi"\n')
+    assert counter.render()[-1] == 'errors_total{detail="say \\"hi\\"\\n"} 1'
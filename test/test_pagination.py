@@ -0,0 +1,75 @@
+import service.catalog as catalog
+from model.track import Track
+from service.itunes import load_tracks
+from service.pagination import decode_cursor, encode_cursor, paginate, paginate_cursor
+
+
+def make_track(number):
+    return Track(
+        id=number,
+        name=f"Track {number}",
+        artist_id=1,
+        artist_name="Artist",
+        album_id=1,
+        album_name="Album",
+        disc=1,
+        number=number,
+        release_date="2000-01-01T00:00:00Z",
+        genre="Rock",
+        time_millis=180000,
+    )
+
+
+def test_cursor_pages_come_from_snapshot():
+    tracks = [make_track(n) for n in range(1, 8)]
+    catalog.store.upsert_tracks(tracks)
+
+    first, pagination = paginate("tracks", tracks, 1, 3)
+    assert [t.id for t in first] == [1, 2, 3]
+    assert pagination["total_pages"] == 3
+    assert pagination["prev_cursor"] is None
+
+    second, pagination = paginate_cursor(
+        "tracks", pagination["next_cursor"], 3, load_tracks
+    )
+    assert [t.id for t in second] == [4, 5, 6]
+    assert pagination["page"] == 2
+
+    last, pagination = paginate_cursor(
+        "tracks", pagination["next_cursor"], 3, load_tracks
+    )
+    assert [t.id for t in last] == [7]
+    assert pagination["next_cursor"] is None
+
+    again, _ = paginate_cursor("tracks", pagination["prev_cursor"], 3, load_tracks)
+    assert again == second
+
+
+def test_invalid_cursor():
+    assert paginate_cursor("tracks", "not a cursor", 3, load_tracks) is None
+    # A cursor of another kind of results doesn't match its snapshot
+    tracks = [make_track(1)]
+    catalog.store.upsert_tracks(tracks)
+    _, pagination = paginate("tracks", tracks + tracks, 1, 1)
+    assert paginate_cursor("albums", pagination["next_cursor"], 1, load_tracks) is None
+
+
+def test_cursor_pages_start_at_one():
+    tracks = [make_track(n) for n in range(1, 5)]
+    catalog.store.upsert_tracks(tracks)
+    _, pagination = paginate("tracks", tracks, 1, 2)
+    snapshot_id, _ = decode_cursor(pagination["next_cursor"])
+    for page in (0, -1):
+        cursor = encode_cursor(snapshot_id, page)
+        assert paginate_cursor("tracks", cursor, 2, load_tracks) is None
+
+
+def test_same_results_get_same_cursors():
+    tracks = [make_track(n) for n in range(1, 5)]
+    catalog.store.upsert_tracks(tracks)
+    _, first = paginate("tracks", tracks, 1, 2)
+    # A rebuilt response keeps its cursors, and so its ETag
+    _, again = paginate("tracks", tracks, 1, 2)
+    assert again == first
+    _, reordered = paginate("tracks", tracks[::-1], 1, 2)
+    assert reordered["next_cursor"] != first["next_cursor"]
@@ -0,0 +1,88 @@
+import threading
+import time
+import service.itunes as itunes
+from service.ratelimit import (
+    BACKGROUND,
+    INTERACTIVE,
+    RateLimiter,
+    parse_retry_after,
+    priority,
+)
+
+
+def test_burst_then_rate():
+    limiter = RateLimiter(rate_per_minute=600, burst=2)
+    start = time.monotonic()
+    for _ in range(3):
+        assert limiter.acquire()
+    # The third token takes 0.1s to refill
+    assert time.monotonic() - start >= 0.09
+
+
+def test_acquire_times_out():
+    limiter = RateLimiter(rate_per_minute=1, burst=1)
+    assert limiter.acquire()
+    assert not limiter.acquire(timeout=0.01)
+    assert limiter.stats()["queues"]["interactive"]["timeouts"] == 1
+
+
+def test_long_pause_fails_at_once():
+    limiter = RateLimiter(rate_per_minute=600, burst=1)
+    limiter.throttled(retry_after=60)
+    start = time.monotonic()
+    assert not limiter.acquire(timeout=5)
+    assert time.monotonic() - start < 1
+
+
+def test_interactive_calls_go_first():
+    limiter = RateLimiter(rate_per_minute=600, burst=1)
+    assert limiter.acquire()
+    order = []
+
+    def call(level):
+        with priority(level):
+            limiter.acquire()
+        order.append(level)
+
+    background = threading.Thread(target=call, args=(BACKGROUND,))
+    background.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=call, args=(INTERACTIVE,))
+    interactive.start()
+    background.join()
+    interactive.join()
+    assert order == [INTERACTIVE, BACKGROUND]
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("30") == 30
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_throttled_calls_are_retried(monkeypatch):
+    responses = [FakeResponse(429, {"Retry-After": "0"}), FakeResponse(200)]
+
+    class FakeClient:
+        def get(self, url, **kwargs):
+            return responses.pop(0)
+
+    limiter = RateLimiter(rate_per_minute=6000, burst=5)
+    monkeypatch.setattr(itunes, "limiter", limiter)
+    monkeypatch.setattr(itunes, "get_client", FakeClient)
+
+    assert (
+        itunes.itunes_get("https://itunes.apple.com/search", {}, "test").status_code
+        == 200
+    )
+    stats = limiter.stats()
+    assert stats["throttled"] == 1
+    # The rate is halved after the throttled response
+    assert stats["rate_per_minute"] < 6000
@@ -0,0 +1,90 @@
+import time
+import service.catalog as catalog
+from model.artist import Artist
+from service.searchindex import LyricsIndex, SearchIndex, tokenize, within_one_edit
+
+
+def make_index():
+    index = SearchIndex()
+    index.add(1, [("John Lennon", 2.0)])
+    index.add(2, [("John Lennon & Yoko Ono", 2.0)])
+    index.add(3, [("Elton John", 2.0)])
+    index.add(4, [("Lenny Kravitz", 2.0)])
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Beyoncé & JAY-Z") == ["beyonce", "jay", "z"]
+
+
+def test_within_one_edit():
+    assert within_one_edit("lennon", "lenon")
+    assert within_one_edit("lennon", "lennen")
+    assert not within_one_edit("lennon", "lenin")
+
+
+def test_exact_matches_rank_first():
+    index = make_index()
+    # Every token must match, shorter names rank higher
+    assert index.search("john lennon", 10) == [1, 2]
+    assert index.search("john", 10) == [1, 3, 2]
+    assert index.search("john", 2) == [1, 3]
+
+
+def test_prefix_and_typo_matches():
+    index = make_index()
+    assert index.search("len", 10) == [1, 4, 2]
+    assert index.search("jon lenon", 10) == []
+    assert index.search("john lenon", 10) == [1, 2]
+
+
+def test_reindexing_replaces_document():
+    index = make_index()
+    index.add(4, [("Ringo Starr", 2.0)])
+    assert index.search("kravitz", 10) == []
+    assert index.search("ringo", 10) == [4]
+
+
+def test_catalog_search_local():
+    catalog.store.upsert_artists([Artist(1, "John Lennon"), Artist(2, "The Beatles")])
+    assert [a.name for a in catalog.store.search_local("artists", "beat", 10)] == [
+        "The Beatles"
+    ]
+
+
+def test_late_commits_with_older_timestamps_are_indexed(monkeypatch):
+    store = catalog.store
+    store.upsert_artists([Artist(1, "John Lennon")])
+    store.search_local("artists", "john", 10)
+    # A writer that took its timestamp earlier commits after the last sync
+    now = time.time()
+    monkeypatch.setattr(catalog.time, "time", lambda: now - 60)
+    store.upsert_artists([Artist(2, "Elton John")])
+    store.index._checked_at = 0.0
+    assert [a.id for a in store.search_local("artists", "john", 10)] == [1, 2]
+
+
+def make_lyrics_index():
+    index = LyricsIndex()
+    index.add(1, "Imagine there's no heaven\nIt's easy if you try")
+    index.add(2, "Heaven, I'm in heaven\nAnd my heart beats so that I can hardly speak")
+    index.add(3, "Heaven is no place")
+    return index
+
+
+def test_lyrics_phrase_search():
+    index = make_lyrics_index()
+    assert [d for d, _ in index.search('"no heaven"', 10)] == [1]
+    assert [d for d, _ in index.search('"Heaven, is"', 10)] == [3]
+    # Unquoted words are all required, next to each other they rank higher
+    assert [d for d, _ in index.search("no heaven", 10)] == [1, 3]
+    assert [d for d, _ in index.search("heaven no", 10)] == [3, 1]
+    assert [d for d, _ in index.search("heaven", 2)] == [3, 2]
+    assert index.search("hell", 10) == []
+
+
+def test_lyrics_reindexing_replaces_document():
+    index = make_lyrics_index()
+    index.add(2, "Cheek to cheek")
+    assert [d for d, _ in index.search("heaven", 10)] == [3, 1]
+    assert len(index) == 3
@@ -0,0 +1,56 @@
+import json
+from dataclasses import asdict
+import model.serialization as serialization
+from model.album import Album
+from model.artist import Artist
+from model.track import Track
+from model.tracklist import TrackList
+
+
+def make_artist():
+    track = Track(
+        id=1,
+        name='Say "Hello" — Ünïcode',
+        artist_id=1,
+        artist_name="Artist",
+        album_id=2,
+        album_name="Album",
+        disc=1,
+        number=1,
+        release_date="2000-01-01T00:00:00Z",
+        genre="Rock",
+        time_millis=180000,
+    )
+    album = Album(
+        id=2,
+        artist_id=1,
+        artist_name="Artist",
+        title="Album",
+        release_date="2000-01-01T00:00:00Z",
+        image_url="http://example.com/album.jpg",
+        genre="Rock",
+        tracks=[track],
+    )
+    return Artist(id=1, name="Artist", albums=[album])
+
+
+def test_dumps_matches_asdict():
+    artist = make_artist()
+    body = {"artist": [artist], "pagination": {"total": 1, "next_cursor": None}}
+    expected = {"artist": [asdict(artist)], "pagination": body["pagination"]}
+    assert json.loads(serialization.dumps(body)) == expected
+
+
+def test_pure_python_writer(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    artist = make_artist()
+    data = serialization.dumps(artist)
+    assert json.loads(data) == asdict(artist)
+    # Compact output, no whitespace between items
+    assert b", " not in data and b": " not in data
+
+
+def test_tracklist_is_a_list():
+    tracks = make_artist().albums[0].tracks
+    data = serialization.dumps(TrackList(tracks))
+    assert json.loads(data) == [asdict(track) for track in tracks]
@@ -1,10 +1,38 @@
+from pathlib import Path
 import pytest
 import service.itunes as itunes
+import service.lyrics as lyrics
+from bench.fakes import FakeCatalog, FakeUpstream
+from service.memcache import MemoryCache
+from service.ratelimit import RateLimiter
 
+FIXTURES = Path(__file__).parent.parent / "bench" / "fixtures" / "catalog.json"
 
-@pytest.mark.asyncio
-async def test_service():
-    artist = await itunes.search_artist("The Beatles", 3)
-    desc = str(artist)
-    # logging.info(artist)
+
+@pytest.fixture
+def upstream(monkeypatch):
+    # A local stand-in of iTunes and lyrics.ovh, so the test runs offline
+    with FakeUpstream(FakeCatalog.load(FIXTURES)) as upstream:
+        monkeypatch.setattr(itunes, "ITUNES_URL", upstream.url)
+        monkeypatch.setattr(itunes, "limiter", RateLimiter(rate_per_minute=0))
+        monkeypatch.setattr(lyrics, "LYRICS_URL", f"{upstream.url}/v1")
+        monkeypatch.setattr(lyrics, "lyrics_cache", MemoryCache())
+        yield upstream
+
+
+def test_service(upstream):
+    artists = itunes.search_artists("The Beatles", 3)
+    desc = str(artists[0])
     assert len(desc) > 0
+    assert [album.title for album in artists[0].albums][:1] == [
+        "Abbey Road (Remastered)"
+    ]
+    # One search, then one lookup for the albums
+    assert upstream.call_counts() == {"search": 1, "lookup": 1}
+
+
+def test_album_tracks_and_lyrics(upstream):
+    tracks = itunes.search_tracks_by_album("1441164426")
+    assert [track.name for track in tracks][:2] == ["Come Together", "Something"]
+    assert lyrics.fetch_lyrics("The Beatles", "Come Together")
+    assert lyrics.fetch_lyrics("The Beatles", "Unknown Song") is None
@@ -0,0 +1,52 @@
+import time
+import pytest
+from service.concurrency import fan_out
+from service.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call(tmp_path):
+    flight = SingleFlight(tmp_path / "locks")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return ["result"]
+
+    def call(_):
+        return flight.do(("artists", "john lennon", 3), compute)
+
+    results = fan_out(call, range(8), max_workers=8)
+    assert calls == [1]
+    assert all(result is results[0] for result in results)
+
+
+def test_errors_reach_every_caller(tmp_path):
+    flight = SingleFlight(tmp_path / "locks")
+
+    def fail():
+        time.sleep(0.02)
+        raise ValueError("upstream failed")
+
+    def call(_):
+        with pytest.raises(ValueError):
+            flight.do("key", fail)
+
+    fan_out(call, range(4), max_workers=4)
+    # Nothing is left in flight, the next call runs again
+    assert flight.do("key", lambda: 1) == 1
+
+
+def test_lock_files_are_striped(tmp_path):
+    flight = SingleFlight(tmp_path / "locks", stripes=4)
+    for n in range(50):
+        flight.do(("albums", f"term {n}", 10), lambda: n)
+    assert len(list((tmp_path / "locks").iterdir())) <= 4
+    # A call nested in one holding the same stripe doesn't wait on itself
+    key = ("tracks", "outer")
+    inner = next(
+        ("tracks", n)
+        for n in range(100)
+        if flight.stripe(("tracks", n)) == flight.stripe(key)
+    )
+    assert flight.do(key, lambda: flight.do(inner, lambda: "done")) == "done"
@@ -0,0 +1,96 @@
+import threading
+import time
+from dataclasses import replace
+import service.itunes as itunes
+import service.snapshot as snapshot
+from model.artist import Artist
+from service.catalog import CatalogStore
+from service.snapshot import CatalogSnapshot, build
+from test.test_catalog import make_album, make_track
+
+
+def make_snapshot(tmp_path) -> CatalogSnapshot:
+    store = CatalogStore(tmp_path / "source.db")
+    store.upsert_artists([Artist(1, "Artist"), Artist(2, "Other")])
+    store.set_artist_albums(1, [make_album(3), make_album(2)])
+    tracks = [make_track(2, n) for n in (2, 1)]
+    tracks[0] = replace(tracks[0], preview_url="http://example.com/2.m4a")
+    store.set_album_tracks(make_album(2), tracks)
+    # Albums seen in a search have no track list
+    store.upsert_albums([make_album(5, artist_id=2)])
+    counts = build(store, tmp_path / "catalog.snap")
+    assert counts == {"artists": 2, "albums": 3, "tracks": 2}
+    return CatalogSnapshot(tmp_path / "catalog.snap")
+
+
+def test_snapshot_lookups(tmp_path):
+    mapped = make_snapshot(tmp_path)
+
+    assert mapped.get_artist(1) == Artist(1, "Artist")
+    assert mapped.get_artist(4) is None
+    assert [album.id for album in mapped.get_artist_albums(1)] == [3, 2]
+    # The albums of artist 2 were never fetched
+    assert mapped.get_artist_albums(2) is None
+
+    assert mapped.get_albums([5, 3]) == [make_album(5, artist_id=2), make_album(3)]
+    assert mapped.get_albums([3, 4]) is None
+
+    tracks = mapped.get_album_tracks(2)
+    assert [track.number for track in tracks] == [1, 2]
+    assert tracks[0] == make_track(2, 1)
+    assert tracks[1].preview_url == "http://example.com/2.m4a"
+    assert mapped.get_album_tracks(5) is None
+    assert mapped.get_tracks([202, 201]) == [tracks[1], tracks[0]]
+    assert mapped.get_tracks([999]) is None
+    mapped.close()
+
+
+def test_missing_snapshot_is_empty(tmp_path):
+    mapped = CatalogSnapshot(tmp_path / "missing.snap")
+    assert mapped.get_artist(1) is None
+    assert mapped.get_album_tracks(1) is None
+    assert mapped.stats()["albums"] == 0
+
+
+def test_itunes_reads_the_snapshot_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "current", make_snapshot(tmp_path))
+
+    def fail(ids):
+        raise AssertionError(f"looked up {ids} on iTunes")
+
+    monkeypatch.setattr(itunes.tracks_batcher, "fetch", fail)
+    tracks = itunes.get_tracks_by_album("2")
+    assert [track.id for track in tracks] == [201, 202]
+    assert itunes.get_artist_by_id(1).name == "Artist"
+    snapshot.current.close()
+
+
+def test_catalog_rows_newer_than_the_snapshot_win(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "current", make_snapshot(tmp_path))
+    # The albums of artist 1 were fetched again after the snapshot was built
+    itunes.catalog.store.set_artist_albums(1, [make_album(4), make_album(3)])
+    assert [album.id for album in itunes.read_artist_albums(1)] == [4, 3]
+    snapshot.current.close()
+
+
+def test_stale_artist_albums_are_refreshed(monkeypatch):
+    store = itunes.catalog.store
+    store.set_artist_albums(1, [make_album(2)])
+    with store.connection() as conn:
+        conn.execute(
+            "UPDATE artist SET albums_loaded_at = ?",
+            (time.time() - itunes.ARTIST_ALBUMS_SOFT_TTL - 60,),
+        )
+    fetched = threading.Event()
+
+    def fetch(ids):
+        albums = [make_album(3), make_album(2)]
+        store.set_artist_albums(1, albums)
+        fetched.set()
+        return {1: albums}
+
+    monkeypatch.setattr(itunes.albums_batcher, "fetch", fetch)
+    # The stale list is served at once, and refreshed in the background
+    assert [album.id for album in itunes.read_artist_albums(1)] == [2]
+    assert fetched.wait(5)
+    assert [album.id for album in itunes.read_artist_albums(1)] == [3, 2]
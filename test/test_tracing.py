@@ -0,0 +1,73 @@
+import json
+import time
+from service import tracing
+from service.tracing import record_slow_request, server_timing, span, trace, traced
+
+
+@traced()
+def step():
+    with span("inner"):
+        time.sleep(0.001)
+
+
+def test_spans_nest_under_the_request():
+    with trace("/albums/") as root:
+        step()
+        step()
+
+    assert [child.name for child in root.children] == ["test_tracing.step"] * 2
+    assert root.children[0].children[0].name == "inner"
+    assert root.end is not None
+    assert root.duration >= sum(child.duration for child in root.children)
+
+
+def test_span_outside_a_trace_does_nothing():
+    with span("orphan"):
+        pass
+    assert tracing._current.get() is None
+
+
+def test_server_timing_sums_spans_by_name():
+    with trace("/albums/") as root:
+        step()
+        step()
+        with span("cache.write.albums"):
+            pass
+
+    header = server_timing(root)
+    entries = header.split(", ")
+    assert entries[-1].startswith("total;dur=")
+    step_entry = next(e for e in entries if e.startswith("test_tracing.step;"))
+    assert step_entry.endswith('desc="2 calls"')
+    inner_entry = next(e for e in entries if e.startswith("inner;"))
+    assert 'desc="2 calls"' in inner_entry
+    assert any(e.startswith("cache.write.albums;dur=") for e in entries)
+
+
+def test_slow_requests_are_dumped(tmp_path, monkeypatch):
+    log_path = tmp_path / "slow.log"
+    monkeypatch.setattr(tracing, "SLOW_REQUEST_LOG", str(log_path))
+    monkeypatch.setattr(tracing, "_slow_logger", None)
+    monkeypatch.setattr(tracing, "SLOW_REQUEST_MS", 1.0)
+
+    with trace("/fast") as fast:
+        pass
+    assert not record_slow_request(fast, "GET /fast")
+
+    with trace("/slow") as slow:
+        step()
+        time.sleep(0.002)
+    assert record_slow_request(slow, "GET /slow")
+
+    for handler in tracing._slow_logger.handlers:
+        handler.flush()
+    lines = log_path.read_text().splitlines()
+    assert len(lines) == 1
+    dumped = json.loads(lines[0])
+    assert dumped["request"] == "GET /slow"
+    assert dumped["children"][0]["name"] == "test_tracing.step"
+    assert dumped["children"][0]["children"][0]["name"] == "inner"
+
+    for handler in tracing._slow_logger.handlers:
+        handler.close()
+    tracing._slow_logger.handlers.clear()
@@ -0,0 +1,39 @@
+from model.track import Track
+from model.tracklist import TrackList
+
+
+def make_track(number, preview_url=None):
+    return Track(
+        id=number,
+        name=f"Träck {number}",
+        artist_id=1,
+        artist_name="".join(["Art", "ist"]),
+        album_id=1,
+        album_name="Album",
+        disc=1,
+        number=number,
+        release_date="2000-01-01T00:00:00Z",
+        genre="Rock",
+        time_millis=61000 * number,
+        preview_url=preview_url,
+    )
+
+
+def test_tracks_are_slotted_and_interned():
+    track1, track2 = make_track(1), make_track(2)
+    assert not hasattr(track1, "__dict__")
+    assert track1.artist_name is track2.artist_name
+    assert track1.formatted_time() == "1:01"
+
+
+def test_tracklist_round_trip():
+    tracks = [make_track(1, "http://example.com/1"), make_track(2), make_track(3)]
+    track_list = TrackList(tracks)
+
+    assert len(track_list) == 3
+    assert list(track_list) == tracks
+    assert track_list[-1] == tracks[-1]
+    assert track_list[1:] == tracks[1:]
+    assert track_list[1].preview_url is None
+    assert track_list[2].formatted_time() == "3:03"
+    assert track_list.total_millis() == 6 * 61000
@@ -0,0 +1,76 @@
+import service.warmup as warmup
+
+
+def test_parse_entries():
+    lines = [
+        "artist:John  Lennon\n",
+        "# comment\n",
+        "\n",
+        "album-id:123\n",
+        "Abbey Road\n",
+        "john lennon\n",
+        "unknown:thing\n",
+    ]
+    assert warmup.parse_entries(lines, "album") == [
+        ("artist", "john lennon"),
+        ("album-id", "123"),
+        ("album", "abbey road"),
+        ("album", "john lennon"),
+        ("album", "unknown:thing"),
+    ]
+
+
+def test_crawl_resumes(monkeypatch, tmp_path):
+    crawled = []
+
+    def crawl_artist(name, limit):
+        crawled.append(name)
+        if name == "broken":
+            raise RuntimeError("upstream failed")
+        return 0 if name == "nobody" else 1
+
+    monkeypatch.setitem(warmup.CRAWLERS, "artist", crawl_artist)
+    entries = [("artist", name) for name in ("a", "b", "broken", "nobody")]
+    path = str(tmp_path / "state")
+
+    run = warmup.run_id(entries)
+
+    counts = warmup.crawl(entries, warmup.CrawlState(path, run), 10, 2, 0)
+    assert counts == {"done": 2, "empty": 1, "failed": 1, "skipped": 0}
+
+    # Only the entries that failed or found nothing are crawled again
+    crawled.clear()
+    counts = warmup.crawl(entries, warmup.CrawlState(path, run), 10, 2, 0)
+    assert sorted(crawled) == ["broken", "nobody"]
+    assert counts["skipped"] == 2
+
+
+def test_crawl_starts_over(monkeypatch, tmp_path):
+    crawled = []
+
+    def crawl_artist(name, limit):
+        crawled.append(name)
+        return 1
+
+    monkeypatch.setitem(warmup.CRAWLERS, "artist", crawl_artist)
+    entries = [("artist", name) for name in ("a", "b")]
+    path = str(tmp_path / "state")
+    run = warmup.run_id(entries)
+    assert run == warmup.run_id(entries[::-1])
+
+    # An interrupted run is resumed
+    warmup.CrawlState(path, run).mark_done(("artist", "a"))
+    counts = warmup.crawl(entries, warmup.CrawlState(path, run), 10, 2, 0)
+    assert crawled == ["b"]
+    assert counts["skipped"] == 1
+
+    # A finished run isn't, nor is the run of other entries
+    crawled.clear()
+    warmup.crawl(entries, warmup.CrawlState(path, run), 10, 1, 0)
+    assert crawled == ["a", "b"]
+    warmup.CrawlState(path, run).mark_done(("artist", "a"))
+    crawled.clear()
+    warmup.crawl(
+        entries[:1], warmup.CrawlState(path, warmup.run_id(entries[:1])), 10, 1, 0
+    )
+    assert crawled == ["a"]